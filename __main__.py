@@ -1,19 +1,18 @@
 import queue
 import threading
 import logging
-import itertools
 import time
 
 from catan import game
 import game_setup
-from game_events import GameUpdateEvent
+from game_feed import GameFeed
 from gui import gui
 from agents.agents import RandomAgent, InformedRandomAgent
 
 
 class GameManager:
-    def __init__(self, game_queue: queue.Queue, command_queue: queue.Queue):
-        self.game_queue = game_queue
+    def __init__(self, game_feed: GameFeed, command_queue: queue.Queue):
+        self.game_feed = game_feed
         self.command_queue = command_queue
         self.current_game_thread = None
         self.game_control_queue = None
@@ -28,7 +27,7 @@ class GameManager:
             elif command == 'end':
                 self.end()
 
-            elif command in ['play', 'pause', 'step']:
+            elif command in ['play', 'pause', 'step', 'turbo', 'skip_to_end', 'run_turns']:
                 if self.current_game_thread:
                     self.game_control_queue.put((command, config))
 
@@ -39,7 +38,7 @@ class GameManager:
         logging.info('Starting game')
         self.game_control_queue = queue.Queue()
         self.current_game_thread = threading.Thread(
-            target=lambda: game_thread(self.game_queue, self.game_control_queue),
+            target=lambda: game_thread(self.game_feed, self.game_control_queue),
             daemon=True
         )
         self.current_game_thread.start()
@@ -52,7 +51,27 @@ class GameManager:
             self.current_game_thread = None
 
 
-def game_thread(game_queue, game_control_queue):
+# How fast the game thread plays
+PAUSED = 'paused'
+# One turn every MS_PER_TURN, for watching
+PLAYING = 'playing'
+# As fast as possible
+TURBO = 'turbo'
+
+MS_PER_TURN = 10
+# Waiting is only worth it once the game is this far ahead of schedule, so short waits are saved up into longer ones
+MIN_WAIT_SECONDS = 0.02
+
+
+def game_thread(game_feed: GameFeed, game_control_queue):
+    """Plays a game, following the commands on the control queue:
+
+    - play, pause and end
+    - step: play one turn, then pause
+    - turbo: play without waiting between turns. The GUI still gets frames at the rate the feed allows.
+    - skip_to_end: play the rest of the game as fast as possible, only showing the end of it
+    - run_turns: play the given number of turns as fast as possible, then pause
+    """
     board = game_setup.new_board_started()
 
     agents = {
@@ -62,64 +81,93 @@ def game_thread(game_queue, game_control_queue):
         3: InformedRandomAgent(),
     }
 
-    the_game = game.Game(board, agents, lambda event: game_queue.put(event))
+    the_game = game.Game(board, agents, game_feed.event)
 
     # Send the initial board state
-    game_queue.put(GameUpdateEvent(the_game))
-
-    ms_per_turn = 10
-    paused = True
-    for i in itertools.count():
-        is_stepping = False
+    game_feed.publish(the_game, force=True)
+
+    mode = PAUSED
+    # How many more turns to play before pausing, or None to keep going
+    turns_left = None
+    # Whether the GUI should see the turns as they are played, or only where the game stops
+    show_turns = True
+    next_turn_at = time.monotonic()
+    while True:
+        # If we're paused there's no sense in looping constantly, so wait for the next command. If we're ahead of
+        # schedule, wait for a command until the next turn is due.
+        wait = None
+        if mode == PLAYING:
+            wait = next_turn_at - time.monotonic()
         while True:
             try:
-                # If we're paused, there's no sense in looping constantly.
-                # We'll wait for our next command if we're paused, otherwise
-                # it'd be better to be running the game
-                should_wait = paused
-                (cmd, params) = game_control_queue.get(block=should_wait)
-
-                if cmd == 'pause':
-                    paused = True
-                elif cmd == 'play':
-                    paused = False
-                elif cmd == 'step':
-                    is_stepping = True
-                elif cmd == 'end':
-                    return
+                if mode == PAUSED:
+                    (cmd, params) = game_control_queue.get()
+                elif wait is not None and wait >= MIN_WAIT_SECONDS:
+                    (cmd, params) = game_control_queue.get(timeout=wait)
+                else:
+                    (cmd, params) = game_control_queue.get_nowait()
             except queue.Empty:
-                pass
-
-            if not paused:
                 break
 
-            if paused and is_stepping:
-                # We're being given special permission to run a single step, but the game is still "paused"
-                break
+            turns_left = None
+            show_turns = True
+            if cmd == 'pause':
+                mode = PAUSED
+                # Make sure the GUI shows where the game paused
+                game_feed.publish(the_game, force=True)
+            elif cmd == 'play':
+                mode = PLAYING
+                next_turn_at = time.monotonic()
+            elif cmd == 'turbo':
+                mode = TURBO
+            elif cmd == 'step':
+                mode = TURBO
+                turns_left = 1
+            elif cmd == 'run_turns':
+                mode = TURBO
+                turns_left = params
+            elif cmd == 'skip_to_end':
+                mode = TURBO
+                show_turns = False
+            elif cmd == 'end':
+                return
+            wait = next_turn_at - time.monotonic() if mode == PLAYING else None
+
+        if mode == PAUSED:
+            continue
 
         ongoing = the_game.tick(agents)
-        game_queue.put(GameUpdateEvent(the_game))
+        if turns_left is not None:
+            turns_left -= 1
+            if turns_left <= 0:
+                mode = PAUSED
+                turns_left = None
+
+        # The feed decides how many of the turns the GUI gets to see
+        stopping = mode == PAUSED or not ongoing
+        if show_turns or stopping:
+            game_feed.publish(the_game, force=stopping)
 
         if not ongoing:
             # Someone won!
             return
 
-        # Slow down the execution for a better viewing experience
-        # There's no sense in waiting if we're paused anyway
-        if not paused:
-            # TODO don't sleep every time, aggregate sleeps into blocks
-            time.sleep(ms_per_turn/1000)
+        if mode == PLAYING:
+            # Slow down the execution for a better viewing experience. If the game has fallen behind, don't try to
+            # catch up.
+            next_turn_at = max(next_turn_at + MS_PER_TURN / 1000, time.monotonic() - MIN_WAIT_SECONDS)
 
 
 def main():
     logging.basicConfig(level=logging.WARNING)
-    game_queue = queue.Queue()
+    # There's no use publishing frames faster than the GUI draws them
+    game_feed = GameFeed(snapshots_per_second=1000 / gui.REFRESH_MS)
     command_queue = queue.Queue()
 
-    thread = threading.Thread(target=lambda: GameManager(game_queue, command_queue).run_loop(), daemon=True)
+    thread = threading.Thread(target=lambda: GameManager(game_feed, command_queue).run_loop(), daemon=True)
     thread.start()
 
-    gui.start(game_queue, command_queue)
+    gui.start(game_feed, command_queue)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
-from typing import Set
+from typing import Set, AbstractSet
 
-from catan.board import Board, Settlement, Road
+from catan.board import Board
 from hexagons.hexagons import VertexCoord, EdgeCoord
 
 
@@ -20,10 +20,12 @@ def all_edges(board: Board) -> Set[EdgeCoord]:
     return set(all_edges_with_dups())
 
 
-def vertices_where_settlement_can_be_built(board: Board, player_id: int) -> Set[VertexCoord]:
-    return set(vertex for vertex in all_vertices(board) if board.can_build_settlement(Settlement(player_id, vertex)))
+def vertices_where_settlement_can_be_built(board: Board, player_id: int) -> AbstractSet[VertexCoord]:
+    """The result is kept up to date as the board changes, and must not be modified."""
+    return board.legal_builds.settlement_vertices(player_id)
 
 
-def edges_where_road_can_be_built(board: Board, player_id: int) -> Set[EdgeCoord]:
-    return set(edge for edge in all_edges(board) if board.can_build_road(Road(player_id, edge)))
+def edges_where_road_can_be_built(board: Board, player_id: int) -> AbstractSet[EdgeCoord]:
+    """The result is kept up to date as the board changes, and must not be modified."""
+    return board.legal_builds.road_edges(player_id)
 
@@ -1,6 +1,9 @@
+import logging
 import random
+import time
 from abc import abstractmethod, ABC
-from typing import Generator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Generator, List, Optional
 from catan.moves import *
 
 from catan import game
@@ -11,15 +14,26 @@ from agents import agent_utils
 class Agent(ABC):
     player_id: int
     game: 'game.Game'
+    # Where the agent's random choices come from: the global RNG, unless it's given a random.Random of its own
+    rng = random
 
     @abstractmethod
     def play_turn(self) -> Generator[Move, MoveResult, None]:
+        """Plays a turn by yielding Moves, each of which is sent back its MoveResult.
+
+        A MovePlan can be yielded instead of a single Move, to have several moves played in one go. It is sent back
+        a list of MoveResults."""
         pass
 
     @abstractmethod
     def would_accept_trade(self, offering, wants):
         pass
 
+    def expect_trade_offer(self, offering, wants):
+        """Called on every agent before any of them are asked `would_accept_trade` about a proposed trade, so that
+        agents that take a while to answer can all start thinking about it at once."""
+        pass
+
     def join_game(self, game, player_id):
         self.game = game
         self.player_id = player_id
@@ -31,40 +45,40 @@ class Agent(ABC):
 
 class RandomAgent(Agent):
     def play_turn(self) -> Generator[Move, MoveResult, None]:
-        rand_tile = random.choice(list(self.game.board.tiles.keys()))
-        rand_vertex = random.choice(list(rand_tile.vertices()))
+        rand_tile = self.rng.choice(list(self.game.board.tiles.keys()))
+        rand_vertex = self.rng.choice(list(rand_tile.vertices()))
         result = yield BuildSettlementMove(rand_vertex)
 
-        rand_vertex = random.choice(list(rand_tile.vertices()))
+        rand_vertex = self.rng.choice(list(rand_tile.vertices()))
         result = yield UpgradeSettlementMove(rand_vertex)
 
-        rand_tile: HexCoord = random.choice(list(self.game.board.tiles.keys()))
-        rand_edge: EdgeCoord = random.choice(list(rand_tile.edges()))
+        rand_tile: HexCoord = self.rng.choice(list(self.game.board.tiles.keys()))
+        rand_edge: EdgeCoord = self.rng.choice(list(rand_tile.edges()))
         result = yield BuildRoadMove(rand_edge)
 
-        rand_resource_want = random.choice(list(Resource))
-        rand_resource_offering = random.choice(list(Resource))
+        rand_resource_want = self.rng.choice(list(Resource))
+        rand_resource_offering = self.rng.choice(list(Resource))
 
         result = yield ProposeTradeMove({rand_resource_offering: 1}, {rand_resource_want: 1})
 
-        rand_resource_want = random.choice(list(Resource))
-        rand_resource_offering = random.choice(list(Resource))
+        rand_resource_want = self.rng.choice(list(Resource))
+        rand_resource_offering = self.rng.choice(list(Resource))
         result = yield ExchangeMove({rand_resource_offering: 4}, rand_resource_want)
 
     def would_accept_trade(self, offering, wants):
-        return random.choice([True, False])
+        return self.rng.choice([True, False])
 
 
 class InformedRandomAgent(Agent):
     def play_turn(self) -> Generator[Move, MoveResult, None]:
-        if self.player.hand.has_resources(BuildSettlementMove.cost):
+        if self.player.hand.has_resources(BuildSettlementMove.cost_vector):
             buildable_settlements = agent_utils.vertices_where_settlement_can_be_built(self.game.board, self.player_id)
             if buildable_settlements:
                 yield BuildSettlementMove(
-                    random.choice(list(buildable_settlements))
+                    self.rng.choice(list(buildable_settlements))
                 )
 
-        if self.player.hand.has_resources(UpgradeSettlementMove.cost):
+        if self.player.hand.has_resources(UpgradeSettlementMove.cost_vector):
             upgradable_settlements = [
                 settlement.coords for settlement in self.game.board.settlements.values()
                 if settlement.owner == self.player_id
@@ -72,21 +86,104 @@ class InformedRandomAgent(Agent):
             ]
 
             if upgradable_settlements:
-                yield UpgradeSettlementMove(random.choice(upgradable_settlements))
+                yield UpgradeSettlementMove(self.rng.choice(upgradable_settlements))
 
-        if self.player.hand.has_resources(BuildRoadMove.cost):
+        if self.player.hand.has_resources(BuildRoadMove.cost_vector):
             buildable_roads = agent_utils.edges_where_road_can_be_built(self.game.board, self.player_id)
             if buildable_roads:
-                yield BuildRoadMove(random.choice(list(buildable_roads)))
+                yield BuildRoadMove(self.rng.choice(list(buildable_roads)))
 
-        rand_resource_want = random.choice(list(Resource))
-        rand_resource_offering = random.choice(list(Resource))
+        rand_resource_want = self.rng.choice(list(Resource))
+        rand_resource_offering = self.rng.choice(list(Resource))
 
         yield ProposeTradeMove({rand_resource_offering: 1}, {rand_resource_want: 1})
 
-        rand_resource_want = random.choice(list(Resource))
-        rand_resource_offering = random.choice(list(Resource))
+        rand_resource_want = self.rng.choice(list(Resource))
+        rand_resource_offering = self.rng.choice(list(Resource))
         yield ExchangeMove({rand_resource_offering: 4}, rand_resource_want)
 
     def would_accept_trade(self, offering, wants):
-        return random.choice([True, False])
+        return self.rng.choice([True, False])
+
+
+class MCTSAgent(Agent):
+    """Plans each turn with Monte Carlo tree search, using InformedRandomAgents to play out the rest of the game.
+
+    Each turn is given a budget of `rollouts` rollouts and/or `seconds` of wall-clock time, shared between `workers`
+    processes (see agents.mcts). With a single worker the search runs in this process."""
+
+    def __init__(
+            self,
+            rollouts: Optional[int] = 200,
+            seconds: Optional[float] = None,
+            workers: int = 1,
+            max_rollout_turns: int = 200,
+            exploration: float = 2 ** 0.5):
+        if rollouts is None and seconds is None:
+            raise ValueError('MCTSAgent needs a rollout budget, a time budget, or both')
+        self.rollouts = rollouts
+        self.seconds = seconds
+        self.workers = workers
+        self.max_rollout_turns = max_rollout_turns
+        self.exploration = exploration
+        self._executor = None
+        # Rollouts played and seconds spent searching, for the last turn and over the whole game
+        self.last_rollouts = 0
+        self.last_seconds = 0.0
+        self.total_rollouts = 0
+        self.total_seconds = 0.0
+
+    @property
+    def rollouts_per_second(self) -> float:
+        """Across the whole game so far"""
+        if not self.total_seconds:
+            return 0.0
+        return self.total_rollouts / self.total_seconds
+
+    def play_turn(self) -> Generator[MovePlan, List[MoveResult], None]:
+        plan = self.plan_turn()
+        if plan:
+            yield MovePlan(plan)
+
+    def plan_turn(self) -> List[Move]:
+        from agents import mcts
+
+        start = time.perf_counter()
+        position = mcts.Position.of(self.game, self.player_id)
+        deadline = time.monotonic() + self.seconds if self.seconds is not None else None
+        tasks = []
+        for worker in range(self.workers):
+            # Split the rollouts between the workers as evenly as possible
+            rollouts = None
+            if self.rollouts is not None:
+                rollouts = self.rollouts // self.workers + (worker < self.rollouts % self.workers)
+            tasks.append((position, self.rng.getrandbits(32), rollouts, deadline,
+                          self.max_rollout_turns, self.exploration))
+
+        if self.workers == 1:
+            results = [mcts.search(*tasks[0])]
+        else:
+            results = list(self._pool().map(mcts._search_task, tasks))
+
+        self.last_rollouts = sum(result.rollouts for result in results)
+        self.last_seconds = time.perf_counter() - start
+        self.total_rollouts += self.last_rollouts
+        self.total_seconds += self.last_seconds
+        logging.info(f'Player {self.player_id} searched {self.last_rollouts} rollouts in {self.last_seconds:.2f}s '
+                     f'({self.last_rollouts / self.last_seconds:.0f} rollouts/sec)')
+
+        return [mcts.move_for(key) for key in mcts.best_sequence(mcts.merge(results))]
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        """Shuts down the agent's worker processes, if it started any"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def would_accept_trade(self, offering, wants):
+        return self.rng.choice([True, False])
@@ -0,0 +1,201 @@
+"""The search behind MCTSAgent.
+
+Each search looks for the best sequence of moves for the rest of one turn. It grows a UCT tree whose nodes are
+sequences of the searching player's moves, plays every sequence out to the end of the game with
+InformedRandomAgents in every seat, and scores the sequence by how the playout went.
+
+Searches are root-parallel: every worker process grows its own tree from the same position with its own random
+seed, and only the statistics of the trees are sent back and merged. Workers never talk to each other, so adding
+cores adds rollouts almost one for one.
+"""
+# catan.game has to be imported before the agents (see agents.agents), including in freshly spawned workers
+from catan import game
+from catan import moves
+from catan.board import Board
+from catan.resources import ResourceVector
+from agents.agents import InformedRandomAgent
+
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# Moves are identified by picklable keys, so that trees grown in different processes can be merged
+MoveKey = Tuple
+END_TURN: MoveKey = ('end',)
+
+
+@dataclass
+class Position:
+    """A picklable copy of everything a rollout needs to carry on a game"""
+    board: Board
+    hands: Dict[int, ResourceVector]
+    player_id: int
+    turn_number: int
+    # Who holds the Longest Road, which the board alone can't say when two players' roads are tied
+    longest_road: Optional[int] = None
+
+    @classmethod
+    def of(cls, the_game: 'game.Game', player_id: int) -> 'Position':
+        hands = {pid: player.hand.vector for pid, player in the_game.players.items()}
+        return cls(the_game.board.clone(), hands, player_id, the_game.turn_number, the_game.longest_road.holder)
+
+    def new_game(self, rng: Optional[random.Random] = None) -> 'game.Game':
+        """A game carrying on from this position. Given an RNG, the game and its agents draw from it alone."""
+        agents = {pid: InformedRandomAgent() for pid in self.hands}
+        if rng is not None:
+            for agent in agents.values():
+                agent.rng = rng
+        the_game = game.Game(self.board.clone(), agents, rng=rng)
+        for pid, hand in self.hands.items():
+            the_game.players[pid].hand.vector = hand
+        the_game.next_to_play = self.player_id
+        the_game.turn_number = self.turn_number
+        the_game.longest_road.holder = self.longest_road
+        return the_game
+
+
+@dataclass
+class SearchResult:
+    # (visits, total reward) for each sequence of moves the tree expanded
+    stats: Dict[Tuple[MoveKey, ...], List[float]]
+    rollouts: int
+    seconds: float
+
+
+def move_for(key: MoveKey) -> moves.Move:
+    kind = key[0]
+    if kind == 'settlement':
+        return moves.BuildSettlementMove(key[1])
+    if kind == 'upgrade':
+        return moves.UpgradeSettlementMove(key[1])
+    if kind == 'road':
+        return moves.BuildRoadMove(key[1])
+    if kind == 'exchange':
+        return moves.ExchangeMove({key[1]: moves.ExchangeMove.rate}, key[2])
+    raise ValueError(f'Unknown move {key}')
+
+
+def key_for(move: moves.Move) -> MoveKey:
+    if isinstance(move, moves.BuildSettlementMove):
+        return 'settlement', move.vertex
+    if isinstance(move, moves.UpgradeSettlementMove):
+        return 'upgrade', move.vertex
+    if isinstance(move, moves.BuildRoadMove):
+        return 'road', move.edge
+    if isinstance(move, moves.ExchangeMove):
+        [offered] = move.offering
+        return 'exchange', offered, move.wants
+    raise ValueError(f'No key for {move}')
+
+
+def candidate_moves(the_game: 'game.Game', player_id: int) -> List[MoveKey]:
+    """Every move the player could make right now, by key: ending the turn and each of `Game.legal_moves`"""
+    candidates = [END_TURN] + [key_for(move) for move in the_game.legal_moves(player_id)]
+    # Sets don't iterate in the same order in every process, so sort to keep seeded searches reproducible
+    candidates.sort(key=repr)
+    return candidates
+
+
+def _rollout(the_game: 'game.Game', player_id: int, max_turns: int) -> float:
+    """Ends the player's turn and plays the game out. Returns 1 for a win, 0 for a loss, and the player's share of
+    the victory points if nobody won within `max_turns` turns."""
+    if the_game.get_victory_points(player_id) >= game.WINNING_VICTORY_POINTS:
+        return 1.0
+
+    the_game.next_to_play = (the_game.next_to_play + 1) % the_game.num_players
+    the_game.turn_number += 1
+    for _ in range(max_turns):
+        if not the_game.tick(the_game.agents):
+            return 1.0 if the_game.next_to_play == player_id else 0.0
+
+    points = [the_game.get_victory_points(pid) for pid in the_game.players]
+    return points[player_id] / sum(points) if sum(points) else 0.0
+
+
+def search(
+        position: Position,
+        seed: int,
+        rollouts: Optional[int] = None,
+        deadline: Optional[float] = None,
+        max_rollout_turns: int = 200,
+        exploration: float = math.sqrt(2)) -> SearchResult:
+    """Grows a tree from `position` until `rollouts` rollouts have been played or `time.monotonic()` passes
+    `deadline`, whichever comes first.
+
+    The search and its rollouts draw from an RNG of their own, so the global RNG is left alone even while other
+    threads are using it."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+
+    stats: Dict[Tuple[MoveKey, ...], List[float]] = {(): [0, 0.0]}
+    children: Dict[Tuple[MoveKey, ...], List[MoveKey]] = {}
+    played = 0
+    while (rollouts is None or played < rollouts) and (deadline is None or time.monotonic() < deadline):
+        the_game = position.new_game(rng)
+        path: Tuple[MoveKey, ...] = ()
+
+        # Selection, then expansion of one new node
+        while True:
+            if path not in children:
+                children[path] = candidate_moves(the_game, position.player_id)
+            parent_visits = stats[path][0]
+            unvisited = [key for key in children[path] if path + (key,) not in stats]
+            if unvisited:
+                key = rng.choice(unvisited)
+            else:
+                key = max(children[path], key=lambda k: _uct(stats[path + (k,)], parent_visits, exploration))
+
+            path = path + (key,)
+            expanded = path not in stats
+            if expanded:
+                stats[path] = [0, 0.0]
+            if key == END_TURN:
+                break
+            the_game.do_move(position.player_id, move_for(key))
+            if expanded:
+                break
+
+        reward = _rollout(the_game, position.player_id, max_rollout_turns)
+        for depth in range(len(path) + 1):
+            node = stats[path[:depth]]
+            node[0] += 1
+            node[1] += reward
+        played += 1
+
+    return SearchResult(stats, played, time.perf_counter() - start)
+
+
+def _uct(node: List[float], parent_visits: int, exploration: float) -> float:
+    visits, total = node
+    return total / visits + exploration * math.sqrt(math.log(parent_visits) / visits)
+
+
+def _search_task(args) -> SearchResult:
+    return search(*args)
+
+
+def merge(results: List[SearchResult]) -> Dict[Tuple[MoveKey, ...], List[float]]:
+    merged: Dict[Tuple[MoveKey, ...], List[float]] = {}
+    for result in results:
+        for path, (visits, total) in result.stats.items():
+            node = merged.setdefault(path, [0, 0.0])
+            node[0] += visits
+            node[1] += total
+    return merged
+
+
+def best_sequence(stats: Dict[Tuple[MoveKey, ...], List[float]]) -> List[MoveKey]:
+    """Follows the most visited child from the root until the turn ends or the tree runs out"""
+    by_parent: Dict[Tuple[MoveKey, ...], List[Tuple[MoveKey, ...]]] = {}
+    for path in stats:
+        if path:
+            by_parent.setdefault(path[:-1], []).append(path)
+
+    path: Tuple[MoveKey, ...] = ()
+    while path in by_parent:
+        path = max(by_parent[path], key=lambda child: (stats[child][0], repr(child)))
+        if path[-1] == END_TURN:
+            return list(path[:-1])
+    return list(path)
@@ -0,0 +1,515 @@
+"""Agents that play from another process.
+
+RemoteAgent stands in for an agent running elsewhere, talking to it over a persistent connection: a unix socket,
+or the stdin and stdout of a child process. AgentServer is the other end, and plays any in-process Agent against
+a mirror of the game it keeps up to date from what RemoteAgent sends. Run it with
+
+    python -m agents.remote informed --unix /tmp/agent.sock
+    python -m agents.remote informed --stdio
+
+The protocol is newline-delimited JSON. The game's side sends:
+
+- hello: once, before anything else. The player's seat, the number of players, the tiles, and (as a delta) the
+  pieces on the board and every hand.
+- turn: it's the agent's turn. The agent replies with any number of `move`s, each answered with a `result`, and
+  `plan`s (see MovePlan), each answered with `results`, then `end_turn`. A plan takes a single round trip however
+  many moves it has.
+- result: whether the agent's last move succeeded.
+- results: how each move of the agent's last plan went.
+- trade: asks whether the agent would accept a trade, answered with a `trade_answer` carrying the same id. Trades
+  are asked about before they are needed (see Agent.expect_trade_offer), so the agent can answer while the game
+  gets on with asking everyone else.
+- bye: the game is over.
+
+A RemoteAgent made with `send_legal_moves` also sends a `legal` list with every `turn`, `result` and `results`: each
+move that Game.legal_moves says the agent could make next, encoded like the agent's own moves. Agents that don't
+know the rules of the game can simply pick from it.
+
+Every message from the game carries a delta: the settlements, roads and hands that changed since the last
+message, so the full state only ever crosses the connection once.
+"""
+# catan.game has to be imported before the agents (see agents.agents)
+from catan import game
+from catan import board, moves
+from catan.resources import Resource, ResourceVector
+from agents.agents import Agent, RandomAgent, InformedRandomAgent, MCTSAgent
+from game_events import (
+    SettlementBuiltEvent, CityUpgradedEvent, RoadBuiltEvent, SettlementRemovedEvent, CityDowngradedEvent,
+    RoadRemovedEvent, ResourcesChangedEvent)
+from hexagons.hexagons import HexCoord, VertexCoord, EdgeCoord
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+from typing import BinaryIO, Dict, List, Optional, Sequence, Set
+
+RESOURCES = list(Resource)
+TILE_TYPES = list(board.TileType)
+
+AGENT_TYPES = {
+    'random': RandomAgent,
+    'informed': InformedRandomAgent,
+    'mcts': MCTSAgent,
+}
+
+_BOARD_EVENTS = (SettlementBuiltEvent, CityUpgradedEvent, SettlementRemovedEvent, CityDowngradedEvent)
+_ROAD_EVENTS = (RoadBuiltEvent, RoadRemovedEvent)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Connection:
+    """Newline-delimited JSON messages over a pair of byte streams"""
+
+    def __init__(self, reader: BinaryIO, writer: BinaryIO):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, message: dict):
+        self.writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+        self.writer.flush()
+
+    def receive(self) -> Optional[dict]:
+        """The next message, or None if the other end has gone away"""
+        line = self.reader.readline()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise ProtocolError(f'Malformed message {line!r}') from e
+
+    def close(self):
+        for stream in (self.writer, self.reader):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def _socket_connection(sock: socket.socket) -> Connection:
+    connection = Connection(sock.makefile('rb'), sock.makefile('wb'))
+    # The socket stays open until both streams are closed too, and then closes, so the other end sees it go
+    sock.close()
+    return connection
+
+
+def _vertex(vertex: VertexCoord) -> list:
+    return [vertex.tile.q, vertex.tile.r, vertex.vertex]
+
+
+def _to_vertex(data) -> VertexCoord:
+    return VertexCoord(HexCoord(data[0], data[1]), data[2])
+
+
+def _edge(edge: EdgeCoord) -> list:
+    return [edge.tile.q, edge.tile.r, edge.edge]
+
+
+def _to_edge(data) -> EdgeCoord:
+    return EdgeCoord(HexCoord(data[0], data[1]), data[2])
+
+
+def _counts(resources) -> list:
+    return [resources.get(resource, 0) for resource in RESOURCES]
+
+
+def _to_resources(counts) -> dict:
+    return {resource: count for resource, count in zip(RESOURCES, counts) if count}
+
+
+def _result(result: moves.MoveResult) -> dict:
+    return {'successful': result.successful, 'reason': str(result.results or '')}
+
+
+def _to_result(data: dict) -> moves.MoveResult:
+    return moves.MoveResult(data['successful'], data['reason'] or None)
+
+
+def encode_move(move: moves.Move) -> dict:
+    if isinstance(move, moves.BuildSettlementMove):
+        return {'kind': 'settlement', 'vertex': _vertex(move.vertex)}
+    if isinstance(move, moves.UpgradeSettlementMove):
+        return {'kind': 'upgrade', 'vertex': _vertex(move.vertex)}
+    if isinstance(move, moves.BuildRoadMove):
+        return {'kind': 'road', 'edge': _edge(move.edge)}
+    if isinstance(move, moves.ProposeTradeMove):
+        return {'kind': 'trade', 'offering': _counts(move.offering), 'wants': _counts(move.wants)}
+    if isinstance(move, moves.ExchangeMove):
+        return {'kind': 'exchange', 'offering': _counts(move.offering), 'wants': RESOURCES.index(move.wants)}
+    raise ProtocolError(f'Cannot send move {move}')
+
+
+def decode_move(data: dict) -> moves.Move:
+    try:
+        kind = data['kind']
+        if kind == 'settlement':
+            return moves.BuildSettlementMove(_to_vertex(data['vertex']))
+        if kind == 'upgrade':
+            return moves.UpgradeSettlementMove(_to_vertex(data['vertex']))
+        if kind == 'road':
+            return moves.BuildRoadMove(_to_edge(data['edge']))
+        if kind == 'trade':
+            return moves.ProposeTradeMove(_to_resources(data['offering']), _to_resources(data['wants']))
+        if kind == 'exchange':
+            return moves.ExchangeMove(_to_resources(data['offering']), RESOURCES[data['wants']])
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise ProtocolError(f'Malformed move {data}') from e
+    raise ProtocolError(f'Unknown move {data}')
+
+
+class _DeltaTracker:
+    """Remembers which parts of a game changed, and describes their current state on request"""
+
+    def __init__(self, the_game: 'game.Game'):
+        self.game = the_game
+        self.vertices: Set[VertexCoord] = set()
+        self.edges: Set[EdgeCoord] = set()
+        self.hands: Set[int] = set()
+        self._unsubscribe = [
+            the_game.events.subscribe(lambda event: self.vertices.add(event.vertex), *_BOARD_EVENTS),
+            the_game.events.subscribe(lambda event: self.edges.add(event.edge), *_ROAD_EVENTS),
+            the_game.events.subscribe(lambda event: self.hands.add(event.player_id), ResourcesChangedEvent),
+        ]
+
+    def everything(self):
+        self.vertices.update(self.game.board.settlements)
+        self.edges.update(self.game.board.roads)
+        self.hands.update(self.game.players)
+
+    def take(self) -> dict:
+        the_board = self.game.board
+        delta = {}
+        settlements, removed_settlements, roads, removed_roads = [], [], [], []
+        for vertex in self.vertices:
+            settlement = the_board.settlements.get(vertex)
+            if settlement:
+                settlements.append([settlement.owner, *_vertex(vertex), settlement.is_city])
+            else:
+                removed_settlements.append(_vertex(vertex))
+        for edge in self.edges:
+            road = the_board.roads.get(edge)
+            if road:
+                roads.append([road.owner, *_edge(edge)])
+            else:
+                removed_roads.append(_edge(edge))
+
+        for key, values in (('settlements', settlements), ('removed_settlements', removed_settlements),
+                            ('roads', roads), ('removed_roads', removed_roads)):
+            if values:
+                delta[key] = values
+        if self.hands:
+            delta['hands'] = [
+                [player_id, *_counts(self.game.players[player_id].hand.resources)] for player_id in self.hands
+            ]
+        delta['turn'] = self.game.turn_number
+
+        self.vertices.clear()
+        self.edges.clear()
+        self.hands.clear()
+        return delta
+
+    def close(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+
+
+class RemoteAgent(Agent):
+    """Plays through an agent in another process, using the protocol described in this module"""
+
+    def __init__(
+            self, connection: Connection, process: Optional[subprocess.Popen] = None, send_legal_moves: bool = False):
+        self.connection = connection
+        self.process = process
+        self.send_legal_moves = send_legal_moves
+        self._delta: Optional[_DeltaTracker] = None
+        self._said_hello = False
+        self._trade_ids = itertools.count()
+        # The trade question sent ahead of time, as (what was asked, id), and answers that have come back
+        self._pending_trade: Optional[tuple] = None
+        self._trade_answers: Dict[int, bool] = {}
+        # Questions whose answers are no longer needed
+        self._stale_trades: Set[int] = set()
+
+    @classmethod
+    def connect(cls, path: str, send_legal_moves: bool = False) -> 'RemoteAgent':
+        """Connects to an agent server listening on a unix socket"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        return cls(_socket_connection(sock), send_legal_moves=send_legal_moves)
+
+    @classmethod
+    def spawn(
+            cls,
+            command: Sequence[str],
+            env: Optional[Dict[str, str]] = None,
+            send_legal_moves: bool = False) -> 'RemoteAgent':
+        """Starts an agent server that talks over its stdin and stdout, such as `python -m agents.remote --stdio`"""
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        return cls(Connection(process.stdout, process.stdin), process, send_legal_moves)
+
+    def join_game(self, game, player_id):
+        super().join_game(game, player_id)
+        if self._delta:
+            self._delta.close()
+        self._delta = _DeltaTracker(game)
+        self._said_hello = False
+
+    def _send(self, message_type: str, **fields):
+        if not self._said_hello:
+            self._hello()
+        self.connection.send(dict(type=message_type, delta=self._delta.take(), **fields))
+
+    def _hello(self):
+        self._said_hello = True
+        tiles = [[tile.coords.q, tile.coords.r, TILE_TYPES.index(tile.type), tile.number or 0]
+                 for tile in self.game.board.tiles.values()]
+        self._delta.everything()
+        self.connection.send(dict(
+            type='hello', player_id=self.player_id, num_players=self.game.num_players, tiles=tiles,
+            delta=self._delta.take()))
+
+    def _receive(self, *expected: str) -> dict:
+        """The next message of one of the expected types. Trade answers are put aside as they arrive."""
+        while True:
+            message = self.connection.receive()
+            if message is None:
+                raise ProtocolError(f'Agent for player {self.player_id} disconnected')
+            if message.get('type') == 'trade_answer':
+                if message['id'] in self._stale_trades:
+                    self._stale_trades.discard(message['id'])
+                else:
+                    self._trade_answers[message['id']] = bool(message['accept'])
+                if 'trade_answer' not in expected:
+                    continue
+            if message.get('type') in expected:
+                return message
+            raise ProtocolError(f'Expected {" or ".join(expected)}, got {message}')
+
+    def _legal(self) -> dict:
+        if not self.send_legal_moves:
+            return {}
+        return {'legal': [encode_move(move) for move in self.game.legal_moves(self.player_id)]}
+
+    def play_turn(self):
+        self._send('turn', **self._legal())
+        while True:
+            message = self._receive('move', 'plan', 'end_turn')
+            if message['type'] == 'end_turn':
+                return
+            if message['type'] == 'plan':
+                plan = moves.MovePlan([decode_move(move) for move in message['moves']], message['stop_on_failure'])
+                results = yield plan
+                self._send('results', results=[_result(result) for result in results], **self._legal())
+            else:
+                result = yield decode_move(message['move'])
+                self._send('result', **_result(result), **self._legal())
+
+    def expect_trade_offer(self, offering, wants):
+        self._ask_about_trade(offering, wants)
+
+    def _ask_about_trade(self, offering, wants) -> int:
+        self._forget_pending_trade()
+        trade_id = next(self._trade_ids)
+        key = (_counts(offering), _counts(wants))
+        self._pending_trade = (key, trade_id)
+        self._send('trade', id=trade_id, offering=key[0], wants=key[1])
+        return trade_id
+
+    def _forget_pending_trade(self):
+        if self._pending_trade is not None:
+            _, trade_id = self._pending_trade
+            if self._trade_answers.pop(trade_id, None) is None:
+                self._stale_trades.add(trade_id)
+            self._pending_trade = None
+
+    def would_accept_trade(self, offering, wants):
+        if self._pending_trade is not None and self._pending_trade[0] == (_counts(offering), _counts(wants)):
+            # We asked already, so the answer may well be here
+            _, trade_id = self._pending_trade
+        else:
+            trade_id = self._ask_about_trade(offering, wants)
+        self._pending_trade = None
+
+        while trade_id not in self._trade_answers:
+            self._receive('trade_answer')
+        return self._trade_answers.pop(trade_id)
+
+    def close(self):
+        """Says goodbye to the remote agent and closes the connection"""
+        try:
+            self.connection.send({'type': 'bye'})
+            # Let the server finish anything it was still saying, such as answers to trades nobody needs any more,
+            # rather than leave it writing into a closed connection
+            while self.connection.receive() is not None:
+                pass
+        except (OSError, ValueError, ProtocolError):
+            pass
+        self.connection.close()
+        if self._delta:
+            self._delta.close()
+            self._delta = None
+        if self.process:
+            self.process.wait()
+
+
+class _Seat(Agent):
+    """Stands in for the other players in an AgentServer's mirror of the game"""
+
+    def play_turn(self):
+        raise RuntimeError('The mirror game is never played')
+
+    def would_accept_trade(self, offering, wants):
+        return False
+
+
+class AgentServer:
+    """Plays an in-process agent for a RemoteAgent, against a mirror of the real game"""
+
+    def __init__(self, agent: Agent, connection: Connection):
+        self.agent = agent
+        self.connection = connection
+        self.mirror: Optional[game.Game] = None
+
+    def serve(self):
+        """Handles messages until the game says goodbye or the connection closes"""
+        try:
+            while True:
+                message = self.connection.receive()
+                if message is None or message['type'] == 'bye':
+                    return
+                self._handle(message)
+        except ConnectionError:
+            # The game went away without saying goodbye, so there's nobody left to play for
+            pass
+        finally:
+            self.connection.close()
+
+    def _handle(self, message: dict):
+        message_type = message['type']
+        if message_type == 'hello':
+            self._hello(message)
+        elif message_type == 'turn':
+            self._apply(message['delta'])
+            self._play_turn()
+        elif message_type == 'trade':
+            self._apply(message['delta'])
+            accept = self.agent.would_accept_trade(_to_resources(message['offering']), _to_resources(message['wants']))
+            self.connection.send({'type': 'trade_answer', 'id': message['id'], 'accept': bool(accept)})
+        else:
+            raise ProtocolError(f'Unexpected message {message}')
+
+    def _hello(self, message: dict):
+        the_board = board.Board()
+        for q, r, tile_type, number in message['tiles']:
+            the_board.add_tile(board.Tile(HexCoord(q, r), TILE_TYPES[tile_type], number or None))
+
+        player_id = message['player_id']
+        seats = {seat: _Seat() for seat in range(message['num_players'])}
+        seats[player_id] = self.agent
+        self.mirror = game.Game(the_board, seats)
+        self._apply(message['delta'])
+
+    def _apply(self, delta: dict):
+        """Brings the mirror up to date"""
+        the_board = self.mirror.board
+        for owner, q, r, corner, is_city in delta.get('settlements', ()):
+            vertex = VertexCoord(HexCoord(q, r), corner)
+            existing = the_board.settlements.get(vertex)
+            if existing is None:
+                the_board.add_settlement(board.Settlement(owner, vertex), allow_free_placement=True)
+                existing = the_board.settlements[vertex]
+            if is_city and not existing.is_city:
+                the_board.upgrade_settlement(vertex)
+            elif existing.is_city and not is_city:
+                the_board.downgrade_settlement(vertex)
+        for data in delta.get('removed_settlements', ()):
+            if _to_vertex(data) in the_board.settlements:
+                the_board.remove_settlement(_to_vertex(data))
+        for owner, q, r, side in delta.get('roads', ()):
+            edge = EdgeCoord(HexCoord(q, r), side)
+            if edge not in the_board.roads:
+                the_board.add_road(board.Road(owner, edge), free_placement=True)
+        for data in delta.get('removed_roads', ()):
+            if _to_edge(data) in the_board.roads:
+                the_board.remove_road(_to_edge(data))
+        for player_id, *counts in delta.get('hands', ()):
+            self.mirror.players[player_id].hand.vector = ResourceVector.from_dict(_to_resources(counts))
+        self.mirror.turn_number = delta.get('turn', self.mirror.turn_number)
+
+    def _play_turn(self):
+        self.mirror.next_to_play = self.agent.player_id
+        move_generator = self.agent.play_turn()
+        try:
+            move = next(move_generator)
+            while True:
+                if isinstance(move, moves.MovePlan):
+                    self.connection.send({'type': 'plan', 'moves': [encode_move(planned) for planned in move.moves],
+                                          'stop_on_failure': move.stop_on_failure})
+                else:
+                    self.connection.send({'type': 'move', 'move': encode_move(move)})
+                move = move_generator.send(self._wait_for_result())
+        except StopIteration:
+            pass
+        self.connection.send({'type': 'end_turn'})
+
+    def _wait_for_result(self):
+        """The result of the move we just sent, or the results of the plan"""
+        while True:
+            message = self.connection.receive()
+            if message is None or message['type'] == 'bye':
+                raise ConnectionError('The game disconnected in the middle of a turn')
+            if message['type'] == 'result':
+                self._apply(message['delta'])
+                return _to_result(message)
+            if message['type'] == 'results':
+                self._apply(message['delta'])
+                return [_to_result(result) for result in message['results']]
+            # Trades can be asked about at any time, even by our own trade proposals
+            self._handle(message)
+
+
+def serve_unix(path: str, agent_type) -> None:
+    """Serves a new agent of the given type to every connection on a unix socket, each in its own thread"""
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    try:
+        while True:
+            sock, _ = listener.accept()
+            server = AgentServer(agent_type(), _socket_connection(sock))
+            threading.Thread(target=server.serve, daemon=True).start()
+    finally:
+        listener.close()
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve an agent to games in other processes')
+    parser.add_argument('agent', choices=sorted(AGENT_TYPES))
+    transport = parser.add_mutually_exclusive_group(required=True)
+    transport.add_argument('--unix', metavar='PATH', help='Listen on a unix socket')
+    transport.add_argument('--stdio', action='store_true', help='Serve a single game over stdin and stdout')
+    args = parser.parse_args()
+
+    # stdout may be the connection, so logs go to stderr
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    agent_type = AGENT_TYPES[args.agent]
+    if args.stdio:
+        AgentServer(agent_type(), Connection(sys.stdin.buffer, sys.stdout.buffer)).serve()
+    else:
+        serve_unix(args.unix, agent_type)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+"""Benchmarks for the simulation's hot paths.
+
+Run the suite with `python -m benchmarks run`, and check a run against a stored baseline with
+`python -m benchmarks compare baseline.json results.json`. See benchmarks.suite for what is measured.
+"""
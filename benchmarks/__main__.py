@@ -0,0 +1,57 @@
+import argparse
+import logging
+import os
+import sys
+
+from benchmarks import suite
+
+# Inside the package, and ignored by git, so running the suite doesn't leave results lying around the repo
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), 'results.json')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark the simulation')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run the benchmarks and write their results to JSON')
+    run.add_argument('names', nargs='*', help=f'Benchmarks to run (default all: {", ".join(suite.BENCHMARKS)})')
+    run.add_argument('--output', '-o', default=DEFAULT_OUTPUT)
+    run.add_argument('--size', type=int, default=1, help='Multiplies the work done by each benchmark')
+    run.add_argument('--repeat', type=int, default=3, help='Times to run each benchmark, keeping the fastest')
+    run.add_argument('--baseline', help='Also compare the results against this baseline')
+    run.add_argument('--tolerance', type=float, default=suite.DEFAULT_TOLERANCE)
+
+    compare = commands.add_parser('compare', help='Flag benchmarks that got slower than a baseline')
+    compare.add_argument('baseline')
+    compare.add_argument('results')
+    compare.add_argument('--tolerance', type=float, default=suite.DEFAULT_TOLERANCE,
+                         help='The fraction of speed a benchmark may lose before it counts as a regression')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.command == 'run':
+        unknown = set(args.names) - set(suite.BENCHMARKS)
+        if unknown:
+            parser.error(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+        results = suite.run_suite(args.names, args.size, args.repeat)
+        print(suite.format_results(results))
+        suite.save_results(results, args.output)
+        if not args.baseline:
+            return 0
+        current = {result.name: result for result in results}
+        baseline = suite.load_results(args.baseline)
+        if args.names:
+            # Only the benchmarks that were asked for are expected to have run
+            baseline = {name: result for name, result in baseline.items() if name in args.names}
+    else:
+        current = suite.load_results(args.results)
+        baseline = suite.load_results(args.baseline)
+
+    report, regressed = suite.format_comparisons(suite.compare(baseline, current), args.tolerance)
+    print(report)
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
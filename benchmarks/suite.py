@@ -0,0 +1,439 @@
+"""The benchmarks themselves, and reading, writing and comparing their results.
+
+Every benchmark seeds the RNG before it sets up, so the work it times is the same from run to run and any change
+in its speed is down to the code. Each one is timed several times and the fastest run is kept, which is the least
+noisy estimate of what the code costs.
+"""
+# catan.game has to be imported before the agents (see agents.agents)
+from catan import game
+from catan import board
+from catan.bitboard import BitboardBoard
+from catan.longest_road import LongestRoadTracker
+from catan.player import Hand
+from catan.resources import Resource
+from hexagons.hexagons import HexCoord
+from agents import agent_utils
+from agents.agents import RandomAgent, InformedRandomAgent
+import game_setup
+import tournament
+
+import json
+import platform
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+SEED = 1234
+
+# How much slower than the baseline a benchmark may get before `compare` calls it a regression
+DEFAULT_TOLERANCE = 0.2
+
+AGENT_MIXES = {
+    'random': [RandomAgent] * 4,
+    'informed': [InformedRandomAgent] * 4,
+    'mixed': [RandomAgent, RandomAgent, InformedRandomAgent, InformedRandomAgent],
+}
+
+
+class Skipped(Exception):
+    """Raised by a benchmark that can't run here, such as the GUI benchmarks without a display"""
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    # How many operations one run performed, and how long the fastest run took
+    ops: int = 0
+    seconds: float = 0.0
+    skipped: Optional[str] = None
+
+    @property
+    def ops_per_second(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return self.ops / self.seconds
+
+
+# A benchmark takes a size multiplier and returns a function that performs one run, returning how many
+# operations it performed. If that function has a `close` attribute, it is called once the runs are over, to free
+# anything the setup created.
+Benchmark = Callable[[int], Callable[[], int]]
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    def register(setup: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# The Board backends that the board benchmarks are also run against, by the suffix added to their names
+BOARD_TYPES = {
+    'bitboard': BitboardBoard,
+}
+
+
+def board_benchmark(name: str):
+    """Registers a benchmark that takes a board type, once for the dict Board and once for each of BOARD_TYPES"""
+    def register(setup: Callable[[int, type], Callable[[], int]]):
+        benchmark(name)(lambda size: setup(size, board.Board))
+        for suffix, board_type in BOARD_TYPES.items():
+            benchmark(f'{name}/{suffix}')(lambda size, board_type=board_type: setup(size, board_type))
+        return setup
+    return register
+
+
+def _full_games(lineup, games: int, board_type=board.Board) -> Callable[[], int]:
+    def run():
+        return sum(tournament.play_game(lineup, SEED + i, board_type=board_type).turns for i in range(games))
+    return run
+
+
+for _mix, _lineup in AGENT_MIXES.items():
+    benchmark(f'turns/{_mix}')(lambda size, lineup=_lineup: _full_games(lineup, 5 * size))
+for _suffix, _board_type in BOARD_TYPES.items():
+    benchmark(f'turns/informed/{_suffix}')(
+        lambda size, board_type=_board_type: _full_games(AGENT_MIXES['informed'], 5 * size, board_type))
+
+
+def _started_board(board_type=board.Board) -> board.Board:
+    random.seed(SEED)
+    return game_setup.new_board_started(board_type=board_type)
+
+
+@board_benchmark('can_build_settlement')
+def _can_build_settlement(size: int, board_type):
+    the_board = _started_board(board_type)
+    settlements = [board.Settlement(player_id, vertex)
+                   for vertex in agent_utils.all_vertices(the_board) for player_id in range(4)]
+
+    def run():
+        for _ in range(size):
+            for settlement in settlements:
+                the_board.can_build_settlement(settlement)
+        return size * len(settlements)
+    return run
+
+
+@board_benchmark('can_build_road')
+def _can_build_road(size: int, board_type):
+    the_board = _started_board(board_type)
+    roads = [board.Road(player_id, edge) for edge in agent_utils.all_edges(the_board) for player_id in range(4)]
+
+    def run():
+        for _ in range(size):
+            for road in roads:
+                the_board.can_build_road(road)
+        return size * len(roads)
+    return run
+
+
+@board_benchmark('legal_sets')
+def _legal_sets(size: int, board_type):
+    """Enumerates every player's legal builds after each road is built, so includes keeping the sets up to date"""
+    start = _started_board(board_type)
+
+    def run():
+        random.seed(SEED)
+        the_board = start.clone()
+        enumerations = 0
+        for step in range(20 * size):
+            player_id = step % 4
+            edges = sorted(agent_utils.edges_where_road_can_be_built(the_board, player_id), key=repr)
+            if edges:
+                the_board.add_road(board.Road(player_id, random.choice(edges)))
+            for other in range(4):
+                list(agent_utils.vertices_where_settlement_can_be_built(the_board, other))
+                list(agent_utils.edges_where_road_can_be_built(the_board, other))
+                enumerations += 1
+        return enumerations
+    return run
+
+
+@board_benchmark('buildable')
+def _buildable(size: int, board_type):
+    """Lists everywhere each player could build from scratch, without the help of the legal build sets"""
+    the_board = _started_board(board_type)
+
+    def run():
+        for _ in range(20 * size):
+            for player_id in range(4):
+                the_board.buildable_settlement_vertices(player_id)
+                the_board.buildable_road_edges(player_id)
+        return 20 * size * 4
+    return run
+
+
+@benchmark('legal_moves')
+def _legal_moves(size: int):
+    the_game = game.Game(_started_board(), {player_id: InformedRandomAgent() for player_id in range(4)})
+    for player in the_game.players.values():
+        player.hand.add_resources({resource: 5 for resource in Resource})
+
+    def run():
+        for _ in range(50 * size):
+            for player_id in range(4):
+                the_game.legal_moves(player_id)
+        return 50 * size * 4
+    return run
+
+
+def _road_building(roads_each: int):
+    """A started board, and a seeded order for the players to each build that many more roads in, every one
+    carrying on from the player's roads so far"""
+    start = _started_board()
+    the_board = start.clone()
+    roads = []
+    for step in range(4 * roads_each):
+        player_id = step % 4
+        edges = sorted(the_board.buildable_road_edges(player_id), key=repr)
+        if edges:
+            road = board.Road(player_id, random.choice(edges))
+            the_board.add_road(road)
+            roads.append(road)
+    return start, roads
+
+
+# Three hexes meeting at a corner for each player, well apart from each other. Their sides take all of a player's
+# MAX_ROADS roads and close three loops, which is as tangled as a network gets.
+_KNOTS = [(-3, 0), (-2, 2), (0, -2), (1, 0)]
+
+
+def _road_knots():
+    """A board with each player's first road, and an order for them to build the rest of their knot in"""
+    random.seed(SEED)
+    start = game_setup.new_board()
+    topology = start.topology
+    orders = []
+    for player_id, (q, r) in enumerate(_KNOTS):
+        corners = [set(HexCoord(*coords).vertices()) for coords in ((q, r), (q + 1, r), (q, r + 1))]
+        knot = sorted((edge for edge in topology.edges
+                       if any(set(topology.edge_vertices(edge)) <= hex_corners for hex_corners in corners)), key=repr)
+        first = knot.pop(0)
+        start.add_road(board.Road(player_id, first), free_placement=True)
+        # Each road carries on from the ones before it, so the loops close as late as they can
+        reached = set(topology.edge_vertices(first))
+        order = []
+        while knot:
+            edge = next(edge for edge in knot if reached & set(topology.edge_vertices(edge)))
+            knot.remove(edge)
+            reached |= set(topology.edge_vertices(edge))
+            order.append(board.Road(player_id, edge))
+        orders.append(order)
+    # The players take turns
+    return start, [road for turn in zip(*orders) for road in turn]
+
+
+def _longest_road(placements, recount: bool) -> Callable[[int], Callable[[], int]]:
+    def setup(size: int):
+        start, roads = placements()
+
+        def run():
+            for _ in range(size):
+                the_board = start.clone()
+                tracker = LongestRoadTracker(the_board)
+                the_board.add_listener(tracker)
+                for road in roads:
+                    the_board.add_road(road)
+                    if recount:
+                        tracker.recount(road.owner)
+            return size * len(roads)
+        return run
+    return setup
+
+
+# Building roads with Longest Road kept up to date, from the first few roads to as many as a player has, and with
+# every player's roads tied in knots. The cost per road should stay about the same as the networks grow, unlike
+# searching all of a player's roads each time.
+for _name, _placements in [('5_roads', lambda: _road_building(5)), ('15_roads', lambda: _road_building(15)),
+                           ('knots', _road_knots)]:
+    benchmark(f'longest_road/{_name}')(_longest_road(_placements, recount=False))
+    benchmark(f'longest_road/{_name}/recount')(_longest_road(_placements, recount=True))
+
+
+@benchmark('new_board_started')
+def _new_board_started(size: int):
+    def run():
+        random.seed(SEED)
+        for _ in range(5 * size):
+            game_setup.new_board_started()
+        return 5 * size
+    return run
+
+
+@benchmark('hand_arithmetic')
+def _hand_arithmetic(size: int):
+    costs = [{Resource.WOOD: 1, Resource.MUD: 1}, {Resource.WHEAT: 2, Resource.STONE: 3}, {Resource.SHEEP: 1}]
+
+    def run():
+        hand = Hand()
+        for _ in range(2000 * size):
+            for cost in costs:
+                hand.add_resources(cost)
+                if hand.has_resources(cost):
+                    hand.take_resources(cost)
+        return 2000 * size * len(costs)
+    return run
+
+
+def _board_frame():
+    try:
+        from tkinter import Tk, TclError
+    except ImportError:
+        raise Skipped('tkinter is not installed')
+    try:
+        root = Tk()
+    except TclError as e:
+        raise Skipped(f'no display ({e})')
+    root.withdraw()
+
+    from gui.board import BoardFrame
+    return root, BoardFrame(root)
+
+
+@benchmark('draw_board')
+def _draw_board(size: int):
+    """Draws a whole board from scratch"""
+    root, frame = _board_frame()
+    the_board = _started_board()
+
+    def run():
+        for _ in range(5 * size):
+            frame.clear()
+            frame.draw_board(the_board)
+            root.update_idletasks()
+        return 5 * size
+    run.close = root.destroy
+    return run
+
+
+@benchmark('draw_board_incremental')
+def _draw_board_incremental(size: int):
+    """Redraws a board after each road is built, as the GUI does while a game is played"""
+    root, frame = _board_frame()
+    start = _started_board()
+
+    def run():
+        random.seed(SEED)
+        the_board = start.clone()
+        frame.clear()
+        frame.draw_board(the_board)
+        for step in range(20 * size):
+            edges = sorted(agent_utils.edges_where_road_can_be_built(the_board, step % 4), key=repr)
+            if edges:
+                the_board.add_road(board.Road(step % 4, random.choice(edges)))
+            frame.draw_board(the_board)
+            root.update_idletasks()
+        return 20 * size
+    run.close = root.destroy
+    return run
+
+
+def run_benchmark(name: str, size: int = 1, repeat: int = 3) -> BenchmarkResult:
+    try:
+        run = BENCHMARKS[name](size)
+    except Skipped as e:
+        return BenchmarkResult(name, skipped=str(e))
+
+    result = BenchmarkResult(name)
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ops = run()
+            seconds = time.perf_counter() - start
+            if not result.seconds or seconds < result.seconds:
+                result.ops, result.seconds = ops, seconds
+    finally:
+        if hasattr(run, 'close'):
+            run.close()
+    return result
+
+
+def run_suite(names: Optional[List[str]] = None, size: int = 1, repeat: int = 3) -> List[BenchmarkResult]:
+    return [run_benchmark(name, size, repeat) for name in (names or BENCHMARKS)]
+
+
+def save_results(results: List[BenchmarkResult], path: str):
+    document = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': SEED,
+        'benchmarks': {
+            result.name: dict(asdict(result), ops_per_second=result.ops_per_second) for result in results
+        },
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> Dict[str, BenchmarkResult]:
+    with open(path) as f:
+        document = json.load(f)
+    return {
+        name: BenchmarkResult(name, entry['ops'], entry['seconds'], entry.get('skipped'))
+        for name, entry in document['benchmarks'].items()
+    }
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline: float
+    current: float
+    # Why there is no current speed, if the benchmark was skipped or didn't run at all
+    missing: Optional[str] = None
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def is_regression(self, tolerance: float) -> bool:
+        return self.missing is not None or self.ratio < 1 - tolerance
+
+
+def compare(baseline: Dict[str, BenchmarkResult], current: Dict[str, BenchmarkResult]) -> List[Comparison]:
+    """Compares the speed of every benchmark that ran in the baseline with the current results.
+
+    A benchmark that ran in the baseline but was skipped or left out of the current results is reported as missing,
+    which counts as a regression, so that breaking or deleting one can't get past the comparison."""
+    comparisons = []
+    for name, before in baseline.items():
+        if before.skipped or not before.ops_per_second:
+            continue
+        after = current.get(name)
+        if after is None:
+            comparisons.append(Comparison(name, before.ops_per_second, 0.0, 'missing'))
+        elif after.skipped:
+            comparisons.append(Comparison(name, before.ops_per_second, 0.0, f'skipped: {after.skipped}'))
+        else:
+            comparisons.append(Comparison(name, before.ops_per_second, after.ops_per_second))
+    return comparisons
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    lines = []
+    for result in results:
+        if result.skipped:
+            lines.append(f'{result.name:32} skipped: {result.skipped}')
+        else:
+            lines.append(f'{result.name:32} {result.ops_per_second:14,.0f} ops/sec')
+    return '\n'.join(lines)
+
+
+def format_comparisons(comparisons: List[Comparison], tolerance: float) -> Tuple[str, bool]:
+    """Returns the report, and whether anything regressed"""
+    lines = []
+    regressed = False
+    for comparison in comparisons:
+        flag = ''
+        if comparison.is_regression(tolerance):
+            flag = '  MISSING' if comparison.missing else '  REGRESSION'
+            regressed = True
+        if comparison.missing:
+            lines.append(f'{comparison.name:32} {comparison.baseline:14,.0f} -> {comparison.missing}{flag}')
+        else:
+            lines.append(f'{comparison.name:32} {comparison.baseline:14,.0f} -> {comparison.current:14,.0f} ops/sec '
+                         f'({comparison.ratio - 1:+.1%}){flag}')
+    return '\n'.join(lines), regressed
@@ -0,0 +1,589 @@
+"""Lockstep simulation of many games at once, for large strategy sweeps.
+
+Rather than one Python object per tile, settlement and card, the state of every game in the batch lives in NumPy
+arrays indexed by game, and each step of a turn is carried out for all of the games together. Only the policies of
+`RandomAgent` and `InformedRandomAgent` are supported, and they follow the same rules as `catan.game.Game`:
+the same board setup, dice, payouts, legality checks (including the `MAX_ROADS` limit), trades, bank exchanges and
+Longest Road.
+
+Longest Road is the one part that isn't done with array operations, since finding a longest road is a search. It
+stays cheap because these rules never let a settlement cut through another player's roads, so a player's longest
+road only changes when they build a road, and can only take the Longest Road if they have more roads than the
+holder's longest road. Only those players are searched for, one game at a time.
+
+Games are numbered along the first axis of every array. Vertices, edges and hexes are given dense indices by a
+`BatchLayout`, which every game in a batch shares. Each array has one extra "sentinel" column past the real ones
+that is always empty, so that padded adjacency lists can point at it instead of needing a separate mask.
+
+NumPy is only needed for this module; the rest of the engine doesn't depend on it.
+"""
+import time
+from dataclasses import dataclass
+from typing import Sequence, Type, List, Optional, Dict
+
+import numpy as np
+
+from catan.board import Board, Tile, TileType, Settlement, Road, MAX_ROADS
+from catan.game import WINNING_VICTORY_POINTS
+from catan.longest_road import MIN_LENGTH, LONGEST_ROAD_POINTS
+from catan.moves import BuildSettlementMove, UpgradeSettlementMove, BuildRoadMove
+from catan.resources import Resource
+from agents.agents import Agent, RandomAgent, InformedRandomAgent
+from hexagons.hexagons import BoardTopology, HexCoord
+import game_setup
+
+RESOURCES = list(Resource)
+TILE_TYPES = list(TileType)
+
+# Matches tournament.DEFAULT_MAX_TURNS
+DEFAULT_MAX_TURNS = 2000
+
+POLICIES = {
+    RandomAgent: 'random',
+    InformedRandomAgent: 'informed',
+}
+
+
+def _cost(cost: Dict[Resource, int]) -> np.ndarray:
+    return np.array([cost.get(resource, 0) for resource in RESOURCES], dtype=np.int32)
+
+
+SETTLEMENT_COST = _cost(BuildSettlementMove.cost)
+UPGRADE_COST = _cost(UpgradeSettlementMove.cost)
+ROAD_COST = _cost(BuildRoadMove.cost)
+
+# The resource each tile type produces, as an index into RESOURCES, or -1
+_TILE_RESOURCES = np.array(
+    [RESOURCES.index(tile_type.resource()) if tile_type.resource() else -1 for tile_type in TILE_TYPES],
+    dtype=np.int8
+)
+
+
+class BatchLayout:
+    """A dense numbering of the hexes, vertices and edges of a board layout, with its adjacency as index arrays.
+
+    Only edges with land on at least one side are numbered, since roads can't be built anywhere else. Adjacency
+    that leads off the numbered set points at the sentinel index (the count of that kind of element).
+    """
+
+    def __init__(self, hexes):
+        topology = BoardTopology(hexes)
+        self.hexes: List[HexCoord] = sorted(topology.hexes, key=lambda hex: (hex.q, hex.r))
+        self.vertices = sorted(topology.vertices, key=lambda vertex: (vertex.tile.q, vertex.tile.r, vertex.vertex))
+        self.edges = sorted(
+            (edge for edge in topology.edges if topology.edge_hexes(edge)),
+            key=lambda edge: (edge.tile.q, edge.tile.r, edge.edge)
+        )
+
+        self.num_hexes = len(self.hexes)
+        self.num_vertices = len(self.vertices)
+        self.num_edges = len(self.edges)
+
+        self.hex_index = {hex: i for i, hex in enumerate(self.hexes)}
+        self.vertex_index = {vertex: i for i, vertex in enumerate(self.vertices)}
+        self.edge_index = {edge: i for i, edge in enumerate(self.edges)}
+
+        def index_array(rows, index, sentinel, width):
+            return np.array(
+                [[index.get(item, sentinel) for item in row] + [sentinel] * (width - len(row)) for row in rows],
+                dtype=np.intp
+            )
+
+        V, E, T = self.num_vertices, self.num_edges, self.num_hexes
+        self.vertex_edges = index_array([topology.vertex_edges(v) for v in self.vertices], self.edge_index, E, 3)
+        self.vertex_neighbors = index_array(
+            [topology.vertex_neighbors(v) for v in self.vertices], self.vertex_index, V, 3)
+        self.vertex_hexes = index_array([topology.vertex_hexes(v) for v in self.vertices], self.hex_index, T, 3)
+        self.hex_vertices = index_array([topology.hex_vertices(h) for h in self.hexes], self.vertex_index, V, 6)
+        self.hex_edges = index_array([h.edges() for h in self.hexes], self.edge_index, E, 6)
+        # The per-edge arrays get a row for the sentinel edge too, which leads nowhere
+        self.edge_vertices = index_array(
+            [topology.edge_vertices(e) for e in self.edges] + [()], self.vertex_index, V, 2)
+        # Every edge sharing an end with each edge (including itself), for "touches one of my roads" checks
+        self.edge_end_edges = np.vstack([
+            self.vertex_edges[self.edge_vertices[:E]].reshape(E, 6),
+            np.full((1, 6), E, dtype=np.intp)
+        ])
+        # The same adjacency as lists, for searching one game's roads for the longest
+        self.vertex_edge_lists: List[List[int]] = self.vertex_edges.tolist()
+        self.edge_vertex_lists: List[List[int]] = self.edge_vertices.tolist()
+
+
+@dataclass
+class BatchResult:
+    # The seat of each game's winner, or -1 for games that hit the turn limit
+    winners: np.ndarray
+    turns: np.ndarray
+    seconds: float
+
+    @property
+    def games(self) -> int:
+        return len(self.winners)
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    @property
+    def turns_per_second(self) -> float:
+        return float(self.turns.sum()) / self.seconds if self.seconds else 0.0
+
+    def seat_win_rates(self, num_players: int) -> Dict[int, float]:
+        return {seat: float((self.winners == seat).mean()) for seat in range(num_players)}
+
+
+class _RoadSearch:
+    """Walks one player's roads in one game of a batch, as LongestRoadTracker walks a Board's"""
+
+    def __init__(self, batch: 'BatchGames', game: int, player: int):
+        self.vertex_edges = batch.layout.vertex_edge_lists
+        self.edge_vertices = batch.layout.edge_vertex_lists
+        self.player = player
+        self.road_owners = batch.road_owners[game].tolist()
+        self.settlement_owners = batch.settlement_owners[game].tolist()
+        # Every road a trail has been along
+        self.searched = set()
+
+    def is_blocked(self, vertex: int) -> bool:
+        owner = self.settlement_owners[vertex]
+        return owner >= 0 and owner != self.player
+
+    def ends(self, edge: int) -> List[int]:
+        return self.edge_vertices[edge]
+
+    def trail_from(self, vertex: int, used: set) -> int:
+        """The longest trail setting off from a vertex without using any of `used`"""
+        best = 0
+        for edge in self.vertex_edges[vertex]:
+            if self.road_owners[edge] == self.player and edge not in used:
+                best = max(best, self.trail_along(edge, vertex, used))
+        return best
+
+    def trail_along(self, edge: int, vertex: int, used: set) -> int:
+        """The longest trail setting off from a vertex along one of its roads"""
+        first, second = self.edge_vertices[edge]
+        other = second if first == vertex else first
+        self.searched.add(edge)
+        if self.is_blocked(other):
+            return 1
+        used.add(edge)
+        length = 1 + self.trail_from(other, used)
+        used.discard(edge)
+        return length
+
+    def longest(self) -> int:
+        """The longest trail through any of the roads"""
+        # A longest trail that doesn't come back round to where it started must end where it can't carry on, at a
+        # vertex with one or three of the player's roads or someone else's settlement, so only those need setting
+        # off from. One that does come back round is a loop with nothing else joined to it, which none of those reach.
+        self.searched = set()
+        roads = [edge for edge, owner in enumerate(self.road_owners) if owner == self.player]
+        best = 0
+        for vertex in {vertex for edge in roads for vertex in self.edge_vertices[edge]}:
+            edges = [edge for edge in self.vertex_edges[vertex] if self.road_owners[edge] == self.player]
+            if len(edges) != 2 or self.is_blocked(vertex):
+                for edge in edges:
+                    best = max(best, self.trail_along(edge, vertex, set()))
+        for edge in roads:
+            if edge not in self.searched:
+                best = max(best, self.trail_along(edge, self.edge_vertices[edge][0], set()))
+        return best
+
+
+class BatchGames:
+    """The state of a batch of games that are all played in lockstep.
+
+    All games have the same player to move, so a turn is a single pass of array operations over every game that
+    hasn't finished yet.
+    """
+
+    def __init__(
+            self,
+            layout: BatchLayout,
+            tile_types: np.ndarray,
+            tile_numbers: np.ndarray,
+            lineup: Sequence[Type[Agent]],
+            seed: Optional[int] = None):
+        self.layout = layout
+        self.rng = np.random.default_rng(seed)
+        self.num_games = len(tile_types)
+        self.num_players = len(lineup)
+        unsupported = [agent_type.__name__ for agent_type in lineup if agent_type not in POLICIES]
+        if unsupported:
+            raise ValueError(f'The batch engine cannot play {", ".join(unsupported)}')
+        self.policies = [POLICIES[agent_type] for agent_type in lineup]
+
+        N, P = self.num_games, self.num_players
+        V, E, T = layout.num_vertices, layout.num_edges, layout.num_hexes
+
+        self.tile_types = np.asarray(tile_types, dtype=np.int8)
+        # Resource index and roll number of every tile, with an unproductive sentinel tile on the end
+        self.tile_resources = np.full((N, T + 1), -1, dtype=np.int8)
+        self.tile_resources[:, :T] = _TILE_RESOURCES[self.tile_types]
+        self.tile_numbers = np.zeros((N, T + 1), dtype=np.int8)
+        self.tile_numbers[:, :T] = tile_numbers
+
+        self.hands = np.zeros((N, P, len(RESOURCES)), dtype=np.int32)
+        # Owner of the settlement or road at each vertex or edge, or -1
+        self.settlement_owners = np.full((N, V + 1), -1, dtype=np.int8)
+        self.cities = np.zeros((N, V + 1), dtype=bool)
+        self.road_owners = np.full((N, E + 1), -1, dtype=np.int8)
+        self.road_counts = np.zeros((N, P), dtype=np.int16)
+        self.victory_points = np.zeros((N, P), dtype=np.int16)
+        # Who holds the Longest Road, or -1, and each player's longest road when it was last searched for. Roads only
+        # ever get longer here, so a length that is out of date is never more than the real one.
+        self.longest_road = np.full(N, -1, dtype=np.int8)
+        self.road_lengths = np.zeros((N, P), dtype=np.int16)
+        # What each player receives for each roll, kept up to date as settlements are built (like Board's payouts)
+        self.income = np.zeros((N, 13, P, len(RESOURCES)), dtype=np.int32)
+
+        self.finished = np.zeros(N, dtype=bool)
+        self.winners = np.full(N, -1, dtype=np.int8)
+        self.turns = np.zeros(N, dtype=np.int32)
+        self.next_to_play = 0
+        self.turn_number = 0
+
+    @classmethod
+    def new(cls, games: int, lineup: Sequence[Type[Agent]], seed: Optional[int] = None) -> 'BatchGames':
+        """Creates a batch of freshly set up games, like `game_setup.new_board_started` would"""
+        layout = BatchLayout(game_setup.new_board().tiles.keys())
+        rng = np.random.default_rng(seed)
+
+        tile_types = rng.integers(len(TILE_TYPES), size=(games, layout.num_hexes))
+        # Numbers are drawn from 1-11, with 7 pushed up to 8. Deserts have no number.
+        tile_numbers = rng.integers(1, 12, size=(games, layout.num_hexes))
+        tile_numbers[tile_numbers == 7] = 8
+        tile_numbers[tile_types == TILE_TYPES.index(TileType.DESERT)] = 0
+
+        batch = cls(layout, tile_types, tile_numbers, lineup, seed=rng.integers(2 ** 63))
+        batch._place_starting_pieces()
+        return batch
+
+    @classmethod
+    def from_boards(cls, boards: Sequence[Board], lineup: Sequence[Type[Agent]], seed: Optional[int] = None):
+        """Loads existing boards (which must all share one layout) into a batch. Hands start empty."""
+        layout = BatchLayout(boards[0].tiles.keys())
+        tile_types = np.array([[TILE_TYPES.index(board.tiles[hex].type) for hex in layout.hexes] for board in boards])
+        tile_numbers = np.array([[board.tiles[hex].number or 0 for hex in layout.hexes] for board in boards])
+
+        batch = cls(layout, tile_types, tile_numbers, lineup, seed)
+        for game, board in enumerate(boards):
+            rows = np.array([game])
+            for settlement in board.settlements.values():
+                vertex = np.array([layout.vertex_index[settlement.coords]])
+                batch._build_settlements(rows, vertex, settlement.owner)
+                if settlement.is_city:
+                    batch._upgrade_settlements(rows, vertex, settlement.owner)
+            for road in board.roads.values():
+                batch._build_roads(rows, np.array([layout.edge_index[road.coords]]), road.owner)
+
+            # As a Game starting from this board would, award the Longest Road to whoever alone has the longest
+            for player in range(batch.num_players):
+                batch.road_lengths[game, player] = batch._longest_road_in(game, player)
+            batch._award_longest_road(game, player=None)
+        return batch
+
+    def board(self, game: int) -> Board:
+        """Builds a regular Board matching one game of the batch"""
+        layout = self.layout
+        board = Board()
+        for i, hex in enumerate(layout.hexes):
+            board.add_tile(Tile(hex, TILE_TYPES[self.tile_types[game, i]], int(self.tile_numbers[game, i]) or None))
+
+        for i in np.flatnonzero(self.settlement_owners[game, :layout.num_vertices] >= 0):
+            board.add_settlement(
+                Settlement(int(self.settlement_owners[game, i]), layout.vertices[i]), allow_free_placement=True)
+        for i in np.flatnonzero(self.road_owners[game, :layout.num_edges] >= 0):
+            board.add_road(Road(int(self.road_owners[game, i]), layout.edges[i]), free_placement=True)
+        for i in np.flatnonzero(self.cities[game, :layout.num_vertices]):
+            board.upgrade_settlement(layout.vertices[i])
+
+        return board
+
+    # Legality, for the games in `rows`
+
+    def _settlement_legal_at(self, rows, vertices, player: int, free=False) -> np.ndarray:
+        layout = self.layout
+        road_owners = self.road_owners[rows[:, None], layout.vertex_edges[vertices]]
+        legal = self.settlement_owners[rows, vertices] < 0
+        if not free:
+            legal &= (road_owners == player).any(axis=1)
+        legal &= ~((road_owners >= 0) & (road_owners != player)).any(axis=1)
+        legal &= ~(self.settlement_owners[rows[:, None], layout.vertex_neighbors[vertices]] >= 0).any(axis=1)
+        return legal
+
+    def _road_legal_at(self, rows, edges, player: int, free=False) -> np.ndarray:
+        layout = self.layout
+        # Edges off the land (the sentinel) are never buildable
+        legal = (edges < layout.num_edges) & (self.road_owners[rows, edges] < 0)
+        legal &= self.road_counts[rows, player] < MAX_ROADS
+        if not free:
+            legal &= (self.road_owners[rows[:, None], layout.edge_end_edges[edges]] == player).any(axis=1)
+        owners = self.settlement_owners[rows[:, None], layout.edge_vertices[edges]]
+        legal &= ~((owners >= 0) & (owners != player)).any(axis=1)
+        return legal
+
+    def settlement_mask(self, rows, player: int) -> np.ndarray:
+        """Where `player` could build a settlement, as a (games, vertices) boolean array"""
+        layout = self.layout
+        owners = self.settlement_owners[rows]
+        road_owners = self.road_owners[rows][:, layout.vertex_edges]
+
+        mask = owners[:, :layout.num_vertices] < 0
+        mask &= (road_owners == player).any(axis=2)
+        mask &= ~((road_owners >= 0) & (road_owners != player)).any(axis=2)
+        mask &= ~(owners[:, layout.vertex_neighbors] >= 0).any(axis=2)
+        return mask
+
+    def road_mask(self, rows, player: int) -> np.ndarray:
+        """Where `player` could build a road, as a (games, edges) boolean array"""
+        layout = self.layout
+        road_owners = self.road_owners[rows]
+        settlement_owners = self.settlement_owners[rows][:, layout.edge_vertices[:layout.num_edges]]
+
+        mask = road_owners[:, :layout.num_edges] < 0
+        mask &= (self.road_counts[rows, player] < MAX_ROADS)[:, None]
+        mask &= (road_owners[:, layout.edge_end_edges[:layout.num_edges]] == player).any(axis=2)
+        mask &= ~((settlement_owners >= 0) & (settlement_owners != player)).any(axis=2)
+        return mask
+
+    def _choose(self, mask: np.ndarray):
+        """Picks a random True column in each row, and reports which rows had one"""
+        keys = np.where(mask, self.rng.random(mask.shape), -1.0)
+        return keys.argmax(axis=1), mask.any(axis=1)
+
+    def _can_afford(self, rows, player: int, cost: np.ndarray) -> np.ndarray:
+        return (self.hands[rows, player] >= cost).all(axis=1)
+
+    # Changes to the state, for the games in `rows`
+
+    def _add_income(self, rows, vertices, player: int):
+        """Adds one of each tile's resource to `player`'s income, for the tiles around each vertex"""
+        for corner in range(3):
+            hexes = self.layout.vertex_hexes[vertices, corner]
+            numbers = self.tile_numbers[rows, hexes]
+            paying = numbers > 0
+            self.income[rows[paying], numbers[paying], player, self.tile_resources[rows, hexes][paying]] += 1
+
+    def _build_settlements(self, rows, vertices, player: int, cost=None):
+        self.settlement_owners[rows, vertices] = player
+        self.victory_points[rows, player] += 1
+        self._add_income(rows, vertices, player)
+        if cost is not None:
+            self.hands[rows, player] -= cost
+
+    def _upgrade_settlements(self, rows, vertices, player: int):
+        # UpgradeSettlementMove only checks that the player could pay, and doesn't take the cost
+        self.cities[rows, vertices] = True
+        self.victory_points[rows, player] += 1
+        # A city pays out twice
+        self._add_income(rows, vertices, player)
+
+    def _build_roads(self, rows, edges, player: int, cost=None):
+        self.road_owners[rows, edges] = player
+        self.road_counts[rows, player] += 1
+        if cost is not None:
+            self.hands[rows, player] -= cost
+
+    def _longest_road_in(self, game: int, player: int) -> int:
+        """Searches one game for a player's longest road, as `LongestRoadTracker.recount` does"""
+        return _RoadSearch(self, game, player).longest()
+
+    def _longest_road_through(self, game: int, player: int, edge: int) -> int:
+        """A player's longest road, given that it was at least its current `road_lengths` before they built `edge`"""
+        search = _RoadSearch(self, game, player)
+        start, end = search.ends(edge)
+        through = 1
+        if not search.is_blocked(start):
+            through += search.trail_from(start, {edge})
+            if not search.is_blocked(end) and any(end in search.ends(other) for other in search.searched):
+                # The road closes a loop, so trails can come back round through it
+                return search.longest()
+        if not search.is_blocked(end):
+            through += search.trail_from(end, {edge})
+        # Otherwise trails either side of the road can't meet, so the longest through it is the longest each way
+        return max(int(self.road_lengths[game, player]), through)
+
+    def _award_longest_road(self, game: int, player: Optional[int]):
+        """Moves the Longest Road to whoever should have it after `player`'s longest road grew, or after everyone's
+        changed if `player` is None, as `LongestRoadTracker` does"""
+        holder = int(self.longest_road[game])
+        if holder >= 0:
+            # Anyone else was no longer than the holder before, so only the player who built can have overtaken them.
+            # The holder may have built since they were last searched for, though.
+            if self.road_lengths[game, player] <= self.road_lengths[game, holder]:
+                return
+            self.road_lengths[game, holder] = self._longest_road_in(game, holder)
+            if self.road_lengths[game, player] <= self.road_lengths[game, holder]:
+                return
+            new_holder = player
+        else:
+            # Without a holder, nobody but the players who built since was ever at least MIN_LENGTH long, so all of
+            # the lengths that could lead are up to date
+            lengths = self.road_lengths[game]
+            best = lengths.max()
+            if best < MIN_LENGTH or (lengths == best).sum() > 1:
+                return
+            new_holder = int(lengths.argmax())
+
+        if holder >= 0:
+            self.victory_points[game, holder] -= LONGEST_ROAD_POINTS
+        self.victory_points[game, new_holder] += LONGEST_ROAD_POINTS
+        self.longest_road[game] = new_holder
+
+    def _roads_built(self, rows, edges, player: int):
+        """Keeps Longest Road up to date after `player` built a road on each of `edges` in the games in `rows`"""
+        holders = self.longest_road[rows]
+        lengths = np.where(holders >= 0, self.road_lengths[rows, holders], MIN_LENGTH - 1)
+        # A player's longest road is never more than their number of roads, and only matters if it could be longer
+        # than the holder's (or long enough to take the Longest Road if nobody has it)
+        searching = (holders != player) & (self.road_counts[rows, player] > lengths)
+        for game, edge in zip(rows[searching].tolist(), edges[searching].tolist()):
+            self.road_lengths[game, player] = self._longest_road_through(game, player, edge)
+            self._award_longest_road(game, player)
+
+    def _place_starting_pieces(self):
+        layout = self.layout
+        all_rows = np.arange(self.num_games)
+        for player in range(self.num_players):
+            for _ in range(2):
+                # Keep trying random corners (0-6, as new_board_started does) until every game has a settlement
+                placed = np.empty(self.num_games, dtype=np.intp)
+                pending = all_rows
+                while len(pending):
+                    hexes = self.rng.integers(layout.num_hexes, size=len(pending))
+                    vertices = layout.hex_vertices[hexes, self.rng.integers(7, size=len(pending)) % 6]
+                    legal = self._settlement_legal_at(pending, vertices, player, free=True)
+                    self._build_settlements(pending[legal], vertices[legal], player)
+                    placed[pending[legal]] = vertices[legal]
+                    pending = pending[~legal]
+
+                # Then a road on one of its edges, if that edge can take one
+                edges = layout.vertex_edges[placed, self.rng.integers(3, size=self.num_games)]
+                legal = self._road_legal_at(all_rows, edges, player, free=True)
+                self._build_roads(all_rows[legal], edges[legal], player)
+
+    # Playing
+
+    def _roll(self, rows):
+        rolls = self.rng.integers(1, 7, size=len(rows)) + self.rng.integers(1, 7, size=len(rows))
+        # No tile is numbered 7, so it pays out nothing
+        self.hands[rows] += self.income[rows, rolls]
+
+    def _play_random(self, rows, player: int):
+        layout = self.layout
+        n = len(rows)
+
+        hexes = self.rng.integers(layout.num_hexes, size=n)
+        vertices = layout.hex_vertices[hexes, self.rng.integers(6, size=n)]
+        legal = self._can_afford(rows, player, SETTLEMENT_COST)
+        legal &= self._settlement_legal_at(rows, vertices, player)
+        self._build_settlements(rows[legal], vertices[legal], player, SETTLEMENT_COST)
+
+        vertices = layout.hex_vertices[hexes, self.rng.integers(6, size=n)]
+        legal = self._can_afford(rows, player, UPGRADE_COST)
+        legal &= (self.settlement_owners[rows, vertices] == player) & ~self.cities[rows, vertices]
+        self._upgrade_settlements(rows[legal], vertices[legal], player)
+
+        edges = layout.hex_edges[self.rng.integers(layout.num_hexes, size=n), self.rng.integers(6, size=n)]
+        legal = self._can_afford(rows, player, ROAD_COST)
+        legal &= self._road_legal_at(rows, edges, player)
+        self._build_roads(rows[legal], edges[legal], player, ROAD_COST)
+        self._roads_built(rows[legal], edges[legal], player)
+
+        self._trade(rows, player)
+        self._exchange(rows, player)
+
+    def _play_informed(self, rows, player: int):
+        layout = self.layout
+
+        buyers = rows[self._can_afford(rows, player, SETTLEMENT_COST)]
+        vertices, found = self._choose(self.settlement_mask(buyers, player))
+        self._build_settlements(buyers[found], vertices[found], player, SETTLEMENT_COST)
+
+        buyers = rows[self._can_afford(rows, player, UPGRADE_COST)]
+        upgradable = (self.settlement_owners[buyers, :layout.num_vertices] == player)
+        upgradable &= ~self.cities[buyers, :layout.num_vertices]
+        vertices, found = self._choose(upgradable)
+        self._upgrade_settlements(buyers[found], vertices[found], player)
+
+        buyers = rows[self._can_afford(rows, player, ROAD_COST)]
+        edges, found = self._choose(self.road_mask(buyers, player))
+        self._build_roads(buyers[found], edges[found], player, ROAD_COST)
+        self._roads_built(buyers[found], edges[found], player)
+
+        self._trade(rows, player)
+        self._exchange(rows, player)
+
+    def _trade(self, rows, player: int):
+        """A random one-for-one trade offered to every player in seat order (as ProposeTradeMove does)"""
+        n = len(rows)
+        offering = self.rng.integers(len(RESOURCES), size=n)
+        wants = self.rng.integers(len(RESOURCES), size=n)
+
+        # Every agent accepts at random, and the first that accepts and can pay gets the trade
+        accepts = self.rng.random((n, self.num_players)) < 0.5
+        accepts &= self.hands[rows[:, None], np.arange(self.num_players), wants[:, None]] >= 1
+        accepts &= (self.hands[rows, player, offering] >= 1)[:, None]
+        partners, traded = self._choose_first(accepts)
+
+        rows, partners, offering, wants = rows[traded], partners[traded], offering[traded], wants[traded]
+        self.hands[rows, partners, wants] -= 1
+        self.hands[rows, player, wants] += 1
+        self.hands[rows, partners, offering] += 1
+        self.hands[rows, player, offering] -= 1
+
+    @staticmethod
+    def _choose_first(mask: np.ndarray):
+        return mask.argmax(axis=1), mask.any(axis=1)
+
+    def _exchange(self, rows, player: int):
+        """A random four-for-one exchange with the bank"""
+        offering = self.rng.integers(len(RESOURCES), size=len(rows))
+        wants = self.rng.integers(len(RESOURCES), size=len(rows))
+
+        legal = self.hands[rows, player, offering] >= 4
+        rows, offering, wants = rows[legal], offering[legal], wants[legal]
+        self.hands[rows, player, offering] -= 4
+        self.hands[rows, player, wants] += 1
+
+    def tick(self) -> bool:
+        """Plays one turn in every unfinished game. Returns whether any games are still going."""
+        rows = np.flatnonzero(~self.finished)
+        if not len(rows):
+            return False
+
+        player = self.next_to_play
+        self._roll(rows)
+        if self.policies[player] == 'informed':
+            self._play_informed(rows, player)
+        else:
+            self._play_random(rows, player)
+
+        won = rows[self.victory_points[rows, player] >= WINNING_VICTORY_POINTS]
+        self.finished[won] = True
+        self.winners[won] = player
+        self.turns[rows] += 1
+
+        self.next_to_play = (self.next_to_play + 1) % self.num_players
+        self.turn_number += 1
+        return not self.finished.all()
+
+    def run(self, max_turns: int = DEFAULT_MAX_TURNS) -> BatchResult:
+        """Plays every game until it's won or has run for `max_turns` turns"""
+        start = time.perf_counter()
+        while self.turn_number < max_turns and self.tick():
+            pass
+        return BatchResult(self.winners.copy(), self.turns.copy(), time.perf_counter() - start)
+
+
+def run_batch(
+        lineup: Sequence[Type[Agent]],
+        games: int,
+        seed: Optional[int] = None,
+        max_turns: int = DEFAULT_MAX_TURNS) -> BatchResult:
+    """Sets up and plays `games` games between the agent types in `lineup`, all at once."""
+    start = time.perf_counter()
+    result = BatchGames.new(games, lineup, seed).run(max_turns)
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,269 @@
+"""A Board that also keeps its pieces as bitmasks.
+
+BitboardLayout numbers the vertices and edges of a board's layout densely, so that any set of them fits in a single
+Python int, and precomputes the masks that the building rules need. BitboardBoard keeps a mask of each player's
+settlements and roads alongside the usual dicts. With those, `can_build_settlement`, `can_build_road` and the
+"everywhere a player could build" queries come down to a few bitwise operations, rather than dict lookups of
+coordinates allocated on every call.
+
+BitboardBoard can stand in for Board anywhere: the dicts, listeners, clones and payouts all work as before.
+Coordinates outside the layout, such as edges out at sea, are left to Board's own checks.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from catan.board import Board, BoardListener, Settlement, Road, MAX_ROADS
+from hexagons.hexagons import BoardTopology, VertexCoord, EdgeCoord
+
+
+def _bits(mask: int) -> Iterator[int]:
+    """The indices of the set bits of a mask, lowest first"""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def _mask(indices: Iterable[int]) -> int:
+    mask = 0
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+class BitboardLayout:
+    """A dense numbering of a topology's vertices and edges, and masks of the adjacency between them.
+
+    Vertices and edges are numbered in the order the topology lists them, so walking a mask from its lowest bit up
+    visits them in the same order as walking the topology does.
+    """
+
+    def __init__(self, topology: BoardTopology):
+        self.vertices: List[VertexCoord] = list(topology.vertices)
+        self.edges: List[EdgeCoord] = list(topology.edges)
+        self.vertex_index: Dict[VertexCoord, int] = {vertex: i for i, vertex in enumerate(self.vertices)}
+        self.edge_index: Dict[EdgeCoord, int] = {edge: i for i, edge in enumerate(self.edges)}
+
+        def vertex_mask(vertices) -> int:
+            return _mask(self.vertex_index[vertex] for vertex in vertices if vertex in self.vertex_index)
+
+        def edge_mask(edges) -> int:
+            return _mask(self.edge_index[edge] for edge in edges if edge in self.edge_index)
+
+        # Each vertex and its neighbors, all of which must be empty to settle there (the distance rule)
+        self.vertex_block = [
+            (1 << i) | vertex_mask(topology.vertex_neighbors(vertex)) for i, vertex in enumerate(self.vertices)]
+        # The edges leading away from each vertex
+        self.vertex_edges = [edge_mask(topology.vertex_edges(vertex)) for vertex in self.vertices]
+        # The ends of each edge
+        self.edge_ends = [vertex_mask(topology.edge_vertices(edge)) for edge in self.edges]
+
+        # The other edges sharing an end with each edge
+        self.edge_touching = [
+            edge_mask(other for vertex in topology.edge_vertices(edge) for other in topology.vertex_edges(vertex))
+            & ~(1 << i)
+            for i, edge in enumerate(self.edges)
+        ]
+        # Edges with land on at least one side, which are the only ones roads can go on
+        self.land_edges = edge_mask(edge for edge in self.edges if topology.edge_hexes(edge))
+
+    @classmethod
+    def of(cls, topology: BoardTopology) -> 'BitboardLayout':
+        """The layout for a topology, shared with every other topology of the same hexes that lists the vertices and
+        edges in the same order. Games on the standard board all share one."""
+        key = (topology.hexes, tuple(topology.vertices), tuple(topology.edges))
+        layout = _LAYOUTS.get(key)
+        if layout is None:
+            if len(_LAYOUTS) >= MAX_CACHED_LAYOUTS:
+                _LAYOUTS.clear()
+            layout = _LAYOUTS[key] = cls(topology)
+        return layout
+
+    def vertices_of_edges(self, edges: int) -> int:
+        """Every vertex at an end of the given edges"""
+        vertices = 0
+        for edge in _bits(edges):
+            vertices |= self.edge_ends[edge]
+        return vertices
+
+    def edges_of_vertices(self, vertices: int) -> int:
+        """Every edge leading away from the given vertices"""
+        edges = 0
+        for vertex in _bits(vertices):
+            edges |= self.vertex_edges[vertex]
+        return edges
+
+
+MAX_CACHED_LAYOUTS = 8
+_LAYOUTS: Dict[tuple, BitboardLayout] = {}
+
+
+class _Pieces(BoardListener):
+    """The pieces on a BitboardBoard as masks, kept up to date as they come and go.
+
+    It listens to the board ahead of any other listener, so that they see the masks already updated."""
+
+    def __init__(self, board: 'BitboardBoard'):
+        self.board = board
+        # The board topology that the masks were last numbered for
+        self.topology: Optional[BoardTopology] = None
+        self.layout: Optional[BitboardLayout] = None
+        # Each player's settlements (including cities) and roads
+        self.settlements: Dict[int, int] = {}
+        self.roads: Dict[int, int] = {}
+        self.occupied = 0
+        self.all_roads = 0
+        # Pieces placed outside the layout, which the masks can't describe
+        self.strays = 0
+
+    def sync(self, topology: BoardTopology):
+        """Numbers the board's layout the first time, and again whenever the layout changes"""
+        if self.topology is topology:
+            return
+
+        self.topology = topology
+        self.layout = BitboardLayout.of(topology)
+        self.settlements, self.roads = {}, {}
+        self.occupied = self.all_roads = self.strays = 0
+        for settlement in self.board.settlements.values():
+            self.settlement_added(settlement)
+        for road in self.board.roads.values():
+            self.road_added(road)
+
+    def _is_current(self) -> bool:
+        # Pieces placed while the layout is out of date are picked up by the next sync
+        return self.topology is not None and self.topology is self.board._topology
+
+    def copy_for(self, board: 'BitboardBoard') -> '_Pieces':
+        """A copy of these masks for a clone of their board"""
+        copy = _Pieces(board)
+        copy.topology, copy.layout = self.topology, self.layout
+        copy.settlements = dict(self.settlements)
+        copy.roads = dict(self.roads)
+        copy.occupied, copy.all_roads, copy.strays = self.occupied, self.all_roads, self.strays
+        return copy
+
+    def settlement_added(self, settlement: Settlement):
+        if not self._is_current():
+            return
+        index = self.layout.vertex_index.get(settlement.coords)
+        if index is None:
+            self.strays += 1
+            return
+        self.occupied |= 1 << index
+        self.settlements[settlement.owner] = self.settlements.get(settlement.owner, 0) | 1 << index
+
+    def settlement_removed(self, settlement: Settlement):
+        if not self._is_current():
+            return
+        index = self.layout.vertex_index.get(settlement.coords)
+        if index is None:
+            self.strays -= 1
+            return
+        self.occupied &= ~(1 << index)
+        self.settlements[settlement.owner] &= ~(1 << index)
+
+    def road_added(self, road: Road):
+        if not self._is_current():
+            return
+        index = self.layout.edge_index.get(road.coords)
+        if index is None:
+            self.strays += 1
+            return
+        self.all_roads |= 1 << index
+        self.roads[road.owner] = self.roads.get(road.owner, 0) | 1 << index
+
+    def road_removed(self, road: Road):
+        if not self._is_current():
+            return
+        index = self.layout.edge_index.get(road.coords)
+        if index is None:
+            self.strays -= 1
+            return
+        self.all_roads &= ~(1 << index)
+        self.roads[road.owner] &= ~(1 << index)
+
+
+class BitboardBoard(Board):
+    """A Board that answers the building rules from bitmasks of the pieces on it"""
+
+    def __init__(self):
+        super().__init__()
+        self._pieces = _Pieces(self)
+        self.add_listener(self._pieces)
+
+    def clone(self) -> 'BitboardBoard':
+        clone = super().clone()
+        clone._pieces = self._pieces.copy_for(clone)
+        clone._listeners.insert(0, clone._pieces)
+        return clone
+
+    def _masks(self) -> Optional[_Pieces]:
+        """The up to date masks, or None if there are pieces they can't describe"""
+        pieces = self._pieces
+        pieces.sync(self.topology)
+        return None if pieces.strays else pieces
+
+    def can_build_settlement(self, settlement: Settlement, allow_free_placement=False):
+        pieces = self._masks()
+        index = pieces.layout.vertex_index.get(settlement.coords) if pieces else None
+        if index is None:
+            return super().can_build_settlement(settlement, allow_free_placement)
+
+        layout = pieces.layout
+        if pieces.occupied & layout.vertex_block[index]:
+            return False
+
+        touching_roads = pieces.all_roads & layout.vertex_edges[index]
+        own_roads = touching_roads & pieces.roads.get(settlement.owner, 0)
+        # Cannot place a settlement on the end of an enemy road
+        if own_roads != touching_roads:
+            return False
+        return bool(own_roads) or allow_free_placement
+
+    def can_build_road(self, road: Road, free_placement=False):
+        pieces = self._masks()
+        index = pieces.layout.edge_index.get(road.coords) if pieces else None
+        if index is None:
+            return super().can_build_road(road, free_placement)
+
+        layout = pieces.layout
+        bit = 1 << index
+        if pieces.all_roads & bit or not layout.land_edges & bit or self.road_count(road.owner) >= MAX_ROADS:
+            return False
+        if not free_placement and not pieces.roads.get(road.owner, 0) & layout.edge_touching[index]:
+            return False
+
+        enemy_settlements = pieces.occupied & ~pieces.settlements.get(road.owner, 0)
+        return not enemy_settlements & layout.edge_ends[index]
+
+    def buildable_settlement_vertices(self, player_id: int) -> List[VertexCoord]:
+        pieces = self._masks()
+        if pieces is None:
+            return super().buildable_settlement_vertices(player_id)
+
+        layout = pieces.layout
+        own_roads = pieces.roads.get(player_id, 0)
+        blocked = 0
+        for vertex in _bits(pieces.occupied):
+            blocked |= layout.vertex_block[vertex]
+
+        buildable = (layout.vertices_of_edges(own_roads) & ~blocked
+                     & ~layout.vertices_of_edges(pieces.all_roads & ~own_roads))
+        return [layout.vertices[vertex] for vertex in _bits(buildable)]
+
+    def buildable_road_edges(self, player_id: int) -> List[EdgeCoord]:
+        pieces = self._masks()
+        if pieces is None:
+            return super().buildable_road_edges(player_id)
+        if self.road_count(player_id) >= MAX_ROADS:
+            return []
+
+        layout = pieces.layout
+        reachable = 0
+        for edge in _bits(pieces.roads.get(player_id, 0)):
+            reachable |= layout.edge_touching[edge]
+
+        enemy_settlements = pieces.occupied & ~pieces.settlements.get(player_id, 0)
+        buildable = (reachable & layout.land_edges & ~pieces.all_roads
+                     & ~layout.edges_of_vertices(enemy_settlements))
+        return [layout.edges[edge] for edge in _bits(buildable)]
@@ -1,9 +1,13 @@
+from collections import defaultdict
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, Optional, List, NamedTuple, Sequence, Set, AbstractSet, Iterable
 
 from catan.resources import Resource
-from hexagons.hexagons import VertexCoord, EdgeCoord, HexCoord
+from hexagons.hexagons import VertexCoord, EdgeCoord, HexCoord, BoardTopology
+
+# The roads each player has, as in the board game. Once they are all down, the player can't build any more.
+MAX_ROADS = 15
 
 
 class TileType(Enum):
@@ -48,6 +52,35 @@ class Road:
     coords: EdgeCoord
 
 
+class Payout(NamedTuple):
+    """What a single settlement receives when a single tile's number is rolled"""
+    owner: int
+    resource: Resource
+    amount: int
+
+
+class BoardListener:
+    """Receives a notification after every change to the pieces on a Board it has been added to."""
+
+    def settlement_added(self, settlement: Settlement):
+        pass
+
+    def settlement_upgraded(self, settlement: Settlement):
+        pass
+
+    def road_added(self, road: Road):
+        pass
+
+    def settlement_removed(self, settlement: Settlement):
+        pass
+
+    def settlement_downgraded(self, settlement: Settlement):
+        pass
+
+    def road_removed(self, road: Road):
+        pass
+
+
 class Board:
     tiles: Dict[HexCoord, Tile]
     settlements: Dict[VertexCoord, Settlement]
@@ -57,6 +90,75 @@ class Board:
         self.tiles = {}
         self.settlements = {}
         self.roads = {}
+        self._topology = None
+        self._payouts: Dict[int, List[Payout]] = defaultdict(list)
+        self._victory_points: Dict[int, int] = defaultdict(int)
+        self._roads_by_vertex: Dict[VertexCoord, List[Road]] = defaultdict(list)
+        self._road_counts: Dict[int, int] = defaultdict(int)
+        self._listeners: List[BoardListener] = []
+        self._legal_builds = None
+        # Whether the containers above belong to this board alone, or might be shared with a clone
+        self._owns_state = True
+
+    def clone(self) -> 'Board':
+        """A copy of this board that can be changed independently of it.
+
+        The tile layout and its topology are shared outright, since they don't change during a game. The pieces
+        and their indexes are shared too, until either board first changes them (copy-on-write). Listeners are not
+        carried over, except that the clone gets its own copy of any legal build tracking.
+        """
+        clone = type(self).__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone._listeners = []
+        clone._legal_builds = None
+        self._owns_state = False
+        clone._owns_state = False
+
+        if self._legal_builds is not None:
+            clone._legal_builds = self._legal_builds.copy_for(clone)
+            clone.add_listener(clone._legal_builds)
+        return clone
+
+    def _before_change(self):
+        if not self._owns_state:
+            self.settlements = dict(self.settlements)
+            self.roads = dict(self.roads)
+            self._payouts = defaultdict(list, {roll: list(payouts) for roll, payouts in self._payouts.items()})
+            self._victory_points = defaultdict(int, self._victory_points)
+            self._road_counts = defaultdict(int, self._road_counts)
+            self._roads_by_vertex = defaultdict(
+                list, {vertex: list(roads) for vertex, roads in self._roads_by_vertex.items()})
+            self._owns_state = True
+
+    @property
+    def topology(self) -> BoardTopology:
+        """Adjacency information for the tiles on this board, built the first time it's needed."""
+        # The layout is fixed once a game starts, so a changed tile count is enough to notice the board being built
+        if self._topology is None or len(self._topology.hexes) != len(self.tiles):
+            self._topology = BoardTopology(self.tiles.keys())
+            self._rebuild_payouts()
+        return self._topology
+
+    def add_tile(self, tile: Tile) -> None:
+        """Places or replaces a tile. Tiles should not be changed in place once settlements are on the board."""
+        # The tiles might be shared with a clone
+        self.tiles = dict(self.tiles)
+        self.tiles[tile.coords] = tile
+        self._topology = None
+
+    @property
+    def legal_builds(self) -> 'LegalBuildTracker':
+        """Tracks where each player could currently build, created the first time it's needed."""
+        if self._legal_builds is None:
+            self._legal_builds = LegalBuildTracker(self)
+            self.add_listener(self._legal_builds)
+        return self._legal_builds
+
+    def add_listener(self, listener: BoardListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: BoardListener) -> None:
+        self._listeners.remove(listener)
 
     def is_land(self, coord: HexCoord) -> bool:
         return coord in self.tiles
@@ -65,27 +167,112 @@ class Board:
         if not self.can_build_settlement(settlement, allow_free_placement):
             raise IllegalMoveError('Cannot build a settlement here')
 
+        self._before_change()
+        self._add_payouts(settlement)
         self.settlements[settlement.coords] = settlement
+        self._victory_points[settlement.owner] += 2 if settlement.is_city else 1
+        for listener in self._listeners:
+            listener.settlement_added(settlement)
+
+    def remove_settlement(self, vertex: VertexCoord) -> None:
+        """Takes a settlement (not a city) back off the board, undoing add_settlement"""
+        settlement = self.settlements[vertex]
+        if settlement.is_city:
+            raise IllegalMoveError('Cities must be downgraded before they can be removed')
+
+        self._before_change()
+        for tile in self._paying_tiles(vertex):
+            self._payouts[tile.number].remove(Payout(settlement.owner, tile.type.resource(), 1))
+        del self.settlements[vertex]
+        self._victory_points[settlement.owner] -= 2 if settlement.is_city else 1
+        for listener in self._listeners:
+            listener.settlement_removed(settlement)
+
+    def upgrade_settlement(self, vertex: VertexCoord) -> None:
+        """Turns an existing settlement into a city"""
+        self._set_city(vertex, True)
+
+    def downgrade_settlement(self, vertex: VertexCoord) -> None:
+        """Turns a city back into a settlement, undoing upgrade_settlement"""
+        self._set_city(vertex, False)
+
+    def _set_city(self, vertex: VertexCoord, is_city: bool):
+        settlement = self.settlements[vertex]
+        if settlement.is_city == is_city:
+            raise IllegalMoveError('This settlement is already a city' if is_city else 'This is not a city')
+
+        self._before_change()
+        # Settlements are replaced rather than changed, since clones may share them
+        updated = Settlement(settlement.owner, settlement.coords, is_city)
+        self.settlements[vertex] = updated
+        self._victory_points[settlement.owner] += 1 if is_city else -1
+
+        old_amount, new_amount = (1, 2) if is_city else (2, 1)
+        for tile in self._paying_tiles(vertex):
+            payouts = self._payouts[tile.number]
+            index = payouts.index(Payout(settlement.owner, tile.type.resource(), old_amount))
+            payouts[index] = Payout(settlement.owner, tile.type.resource(), new_amount)
+
+        for listener in self._listeners:
+            if is_city:
+                listener.settlement_upgraded(updated)
+            else:
+                listener.settlement_downgraded(updated)
+
+    def victory_points(self, player_id: int) -> int:
+        """The victory points a player has from their settlements and cities"""
+        return self._victory_points.get(player_id, 0)
+
+    def road_count(self, player_id: int) -> int:
+        """How many of their MAX_ROADS roads a player has built"""
+        return self._road_counts.get(player_id, 0)
+
+    def count_victory_points(self, player_id: int) -> int:
+        """Counts a player's victory points from scratch, rather than trusting the running total"""
+        count = 0
+        for settlement in self.settlements.values():
+            if settlement.owner == player_id:
+                count += 2 if settlement.is_city else 1
+
+        return count
+
+    def payouts_for_roll(self, roll: int) -> Sequence[Payout]:
+        """Everything that should be handed out when a number is rolled"""
+        # Make sure the index reflects the current layout
+        self.topology
+        return self._payouts.get(roll, ())
+
+    def _paying_tiles(self, vertex: VertexCoord):
+        for hex in self.topology.vertex_hexes(vertex):
+            tile = self.tiles[hex]
+            if tile.number and tile.type.resource():
+                yield tile
+
+    def _add_payouts(self, settlement: Settlement):
+        amount = 2 if settlement.is_city else 1
+        for tile in self._paying_tiles(settlement.coords):
+            self._payouts[tile.number].append(Payout(settlement.owner, tile.type.resource(), amount))
+
+    def _rebuild_payouts(self):
+        self._payouts = defaultdict(list)
+        for settlement in self.settlements.values():
+            self._add_payouts(settlement)
 
     def can_build_settlement(self, settlement: Settlement, allow_free_placement=False):
         if settlement.coords in self.settlements:
             return False
 
-        if not allow_free_placement and not any(edge in self.roads and self.roads[edge].owner == settlement.owner for edge in settlement.coords.edges()):
+        topology = self.topology
+        touching_roads = [self.roads[edge] for edge in topology.vertex_edges(settlement.coords) if edge in self.roads]
+        if not allow_free_placement and not any(road.owner == settlement.owner for road in touching_roads):
             return False
 
         # Cannot place a settlement on the end of an enemy road
-        if any(edge in self.roads and self.roads[edge].owner != settlement.owner for edge in settlement.coords.edges()):
+        if any(road.owner != settlement.owner for road in touching_roads):
             return False
 
         # Cannot place a settlement one space away from another settlement
-        nearby_vertices = (
-            vertex
-            for edge in settlement.coords.edges()
-            for vertex in edge.vertices()
-            if vertex != settlement.coords
-        )
-        if any(vertex in self.settlements for vertex in nearby_vertices):
+        if any(vertex in self.settlements for vertex in topology.vertex_neighbors(settlement.coords)):
             return False
 
         return True
@@ -94,38 +281,161 @@ class Board:
         if not self.can_build_road(road, free_placement):
             raise IllegalMoveError('Cannot build a road here')
 
+        self._before_change()
         self.roads[road.coords] = road
+        self._road_counts[road.owner] += 1
+        for vertex in self.topology.edge_vertices(road.coords):
+            self._roads_by_vertex[vertex].append(road)
+        for listener in self._listeners:
+            listener.road_added(road)
+
+    def remove_road(self, edge: EdgeCoord) -> None:
+        """Takes a road back off the board, undoing add_road"""
+        road = self.roads[edge]
+        self._before_change()
+        del self.roads[edge]
+        self._road_counts[road.owner] -= 1
+        for vertex in self.topology.edge_vertices(edge):
+            self._roads_by_vertex[vertex].remove(road)
+        for listener in self._listeners:
+            listener.road_removed(road)
 
     def can_build_road(self, road: Road, free_placement=False):
-        if road.coords in self.roads:
+        if road.coords in self.roads or self.road_count(road.owner) >= MAX_ROADS:
             return False
 
+        topology = self.topology
+        vertices = topology.edge_vertices(road.coords)
+
         # Cannot build road that is not touching an existing road
-        touching_roads = (road for vertex in road.coords.vertices() for road in self._roads_touching_vertex(vertex))
+        touching_roads = (road for vertex in vertices for road in self._roads_touching_vertex(vertex))
         if not free_placement and not any(tr.owner == road.owner for tr in touching_roads):
             return False
 
         # Cannot build a road that doesn't have land on at least one side
-        adjacent_hexes = road.coords.between_hexes()
-        if not any(self.is_land(hex) for hex in adjacent_hexes):
+        if not topology.edge_hexes(road.coords):
             return False
 
         # Cannot build a road that touches an enemy settlement
-        vertices = road.coords.vertices()
         if any(vertex in self.settlements and self.settlements[vertex].owner != road.owner for vertex in vertices):
             return False
 
         return True
 
-    def _roads_touching_vertex(self, vertex: VertexCoord):
-        for road in self.roads.values():
-            if vertex in road.coords.vertices():
-                yield road
+    def buildable_settlement_vertices(self, player_id: int) -> List[VertexCoord]:
+        """Every vertex on the board where a player could build a settlement right now, in topology order"""
+        return [vertex for vertex in self.topology.vertices if self.can_build_settlement(Settlement(player_id, vertex))]
+
+    def buildable_road_edges(self, player_id: int) -> List[EdgeCoord]:
+        """Every edge on the board where a player could build a road right now, in topology order"""
+        return [edge for edge in self.topology.edges if self.can_build_road(Road(player_id, edge))]
+
+    def _roads_touching_vertex(self, vertex: VertexCoord) -> Sequence[Road]:
+        return self._roads_by_vertex.get(vertex, ())
 
     def __str__(self):
         return f'{self.tiles}'
 
 
+class LegalBuildTracker(BoardListener):
+    """Keeps, for each player, the set of vertices and edges on the board where they could build right now.
+
+    The sets are computed in full the first time they're asked for. After that, each change to the board only
+    re-checks the handful of vertices and edges near it, since nothing further away can have been affected.
+    Building for free (during setup) isn't considered.
+    """
+
+    def __init__(self, board: Board):
+        self.board = board
+        self._topology = None
+        self._settlement_vertices: Dict[int, Set[VertexCoord]] = {}
+        self._road_edges: Dict[int, Set[EdgeCoord]] = {}
+
+    def _check_layout(self):
+        if self._topology is not self.board.topology:
+            self._topology = self.board.topology
+            self._settlement_vertices = {}
+            self._road_edges = {}
+
+    def settlement_vertices(self, player_id: int) -> AbstractSet[VertexCoord]:
+        """The vertices where a player could build a settlement. This is a live view and must not be modified."""
+        self._check_layout()
+        vertices = self._settlement_vertices.get(player_id)
+        if vertices is None:
+            vertices = set(self.board.buildable_settlement_vertices(player_id))
+            self._settlement_vertices[player_id] = vertices
+        return vertices
+
+    def road_edges(self, player_id: int) -> AbstractSet[EdgeCoord]:
+        """The edges where a player could build a road. This is a live view and must not be modified."""
+        self._check_layout()
+        edges = self._road_edges.get(player_id)
+        if edges is None:
+            edges = set(self.board.buildable_road_edges(player_id))
+            self._road_edges[player_id] = edges
+        return edges
+
+    def _recheck_vertices(self, vertices: Iterable[VertexCoord]):
+        for player_id, buildable in self._settlement_vertices.items():
+            for vertex in vertices:
+                if self.board.can_build_settlement(Settlement(player_id, vertex)):
+                    buildable.add(vertex)
+                else:
+                    buildable.discard(vertex)
+
+    def _recheck_edges(self, edges: Iterable[EdgeCoord]):
+        for player_id, buildable in self._road_edges.items():
+            for edge in edges:
+                if self.board.can_build_road(Road(player_id, edge)):
+                    buildable.add(edge)
+                else:
+                    buildable.discard(edge)
+
+    def copy_for(self, board: Board) -> 'LegalBuildTracker':
+        """A copy of this tracker for a clone of its board"""
+        copy = LegalBuildTracker(board)
+        copy._topology = self._topology
+        copy._settlement_vertices = {player_id: set(v) for player_id, v in self._settlement_vertices.items()}
+        copy._road_edges = {player_id: set(edges) for player_id, edges in self._road_edges.items()}
+        return copy
+
+    def settlement_added(self, settlement: Settlement):
+        if self._topology is not self.board.topology:
+            return
+
+        vertex = settlement.coords
+        # The settlement blocks its own vertex and, by the distance rule, its neighbors
+        self._recheck_vertices((vertex,) + self._topology.vertex_neighbors(vertex))
+        # Enemies can no longer build roads leading into it
+        self._recheck_edges(self._topology.vertex_edges(vertex))
+
+    def road_added(self, road: Road):
+        if self._topology is not self.board.topology:
+            return
+
+        if self.board.road_count(road.owner) >= MAX_ROADS and road.owner in self._road_edges:
+            # That was the player's last road, so they can't build one anywhere
+            self._road_edges[road.owner] = set()
+        self._recheck_near(road)
+
+    def road_removed(self, road: Road):
+        if self._topology is not self.board.topology:
+            return
+
+        if self.board.road_count(road.owner) == MAX_ROADS - 1:
+            # The player has a road to build again, and it could go anywhere their roads reach
+            self._road_edges.pop(road.owner, None)
+        self._recheck_near(road)
+
+    def _recheck_near(self, road: Road):
+        ends = self._topology.edge_vertices(road.coords)
+        self._recheck_vertices(ends)
+        self._recheck_edges(set(edge for vertex in ends for edge in self._topology.vertex_edges(vertex)))
+
+    # Taking a settlement away affects the same neighborhood as placing it did
+    settlement_removed = settlement_added
+
+
 class IllegalMoveError(Exception):
     pass
 
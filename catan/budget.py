@@ -0,0 +1,273 @@
+"""Time limits on agents.
+
+A Game given a TimeBudget runs each agent's `play_turn` in a thread of its own, and only waits so long for each
+move and for each turn. Questions the game asks agents between turns, such as whether they'll accept a trade, go
+through the same thread and get as long as a move. An agent that runs over is dealt with according to the budget's
+OverrunPolicy.
+
+Python can't stop a thread, so an agent that ran over carries on thinking in the background. Whatever it comes up
+with is thrown away, and its next turn waits behind it, so a slow agent keeps paying for its overrun. While it
+carries on, the agent's `game` is a detached copy (see `Game.detached_copy`) and its `rng` a random.Random of its
+own, so it can't see or disturb the game and the global RNG as they move on without it. It gets the real ones back
+when its next turn starts. Anything the agent took from the real game before it ran over, such as a reference to the
+board, is still shared, so an agent that needs to be cut off completely should play out of process through
+agents.remote instead.
+"""
+import functools
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Optional
+
+from catan.moves import MoveResult, MovePlan
+
+
+class OverrunPolicy(Enum):
+    # The agent's turn ends as soon as it runs over
+    FORFEIT_TURN = 'forfeit'
+    # A move that comes in late is not played, but the agent carries on with its turn. This needs a per-turn
+    # budget, since otherwise an agent that never moves would hold up the game forever.
+    SKIP_MOVE = 'skip'
+    # The agent's turn ends, and it plays no more turns for the rest of the game
+    DISQUALIFY = 'disqualify'
+
+
+@dataclass(frozen=True)
+class TimeBudget:
+    # Seconds an agent has to decide on each move, and on its whole turn. None means no limit.
+    per_move: Optional[float] = None
+    per_turn: Optional[float] = None
+    policy: OverrunPolicy = OverrunPolicy.FORFEIT_TURN
+
+    def __post_init__(self):
+        if self.policy == OverrunPolicy.SKIP_MOVE and self.per_turn is None:
+            raise ValueError('Skipping late moves needs a per-turn budget')
+
+
+@dataclass
+class BudgetUsage:
+    """How much of its budget an agent has used"""
+    turns: int = 0
+    moves: int = 0
+    think_seconds: float = 0.0
+    longest_move: float = 0.0
+    longest_turn: float = 0.0
+    move_overruns: int = 0
+    turn_overruns: int = 0
+    disqualified: bool = False
+
+    @property
+    def overruns(self) -> int:
+        return self.move_overruns + self.turn_overruns
+
+    def __str__(self):
+        text = (f'{self.turns} turns, {self.moves} moves, {self.think_seconds:.3f}s thinking '
+                f'(longest move {self.longest_move:.3f}s, longest turn {self.longest_turn:.3f}s), '
+                f'{self.move_overruns} move and {self.turn_overruns} turn overruns')
+        if self.disqualified:
+            text += ', disqualified'
+        return text
+
+
+class AgentRunner:
+    """Runs an agent's turns, and any questions the game asks it between them, in a thread of its own"""
+
+    def __init__(self, agent, name: str):
+        self.agent = agent
+        self._requests = queue.Queue()
+        self._replies = queue.Queue()
+        # Each turn and each question gets a new ticket, so that late replies to ones the game has given up on can be
+        # recognised
+        self._ticket = 0
+        # The tickets the game is still waiting on. The agent's thread drops requests for any others.
+        self._live = set()
+        # The agent's real game and RNG while it's left thinking against copies of them after running over, as
+        # (game, rng), where an rng of None means the agent used the class's default
+        self._detached_from: Optional[tuple] = None
+        # Held while a ticket is given up on or taken up, and while the agent is detached or reattached, so that the
+        # two threads always agree on whether the agent has its real game
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                with self._lock:
+                    self._reattach()
+                return
+
+            ticket, work = request
+            with self._lock:
+                if ticket not in self._live:
+                    # The game gave up on this before the agent got to it
+                    continue
+                # Whatever the agent was still thinking about from an abandoned turn is over, since this thread
+                # was busy with it until now
+                self._reattach()
+            try:
+                reply = (ticket, *work())
+            except Exception as e:
+                reply = (ticket, 'error', e)
+            self._replies.put(reply)
+
+    def _open(self) -> int:
+        with self._lock:
+            self._ticket += 1
+            self._live.add(self._ticket)
+            return self._ticket
+
+    def _close(self, ticket: int, abandoned: bool = False):
+        """Stops waiting on a ticket. If the agent is still working on it, it's left to carry on against copies of
+        the game and RNG."""
+        with self._lock:
+            self._live.discard(ticket)
+            if abandoned:
+                self._detach()
+
+    def _receive(self, ticket: int, timeout: Optional[float]):
+        """The ticket's next reply, or None if it doesn't arrive in time"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                replied, kind, payload = self._replies.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if replied == ticket:
+                return kind, payload
+
+    @staticmethod
+    def _step(generator, value):
+        try:
+            return 'move', next(generator) if value is None else generator.send(value)
+        except StopIteration:
+            return 'done', None
+
+    def play_turn(self, budget: TimeBudget, usage: BudgetUsage):
+        """Plays the agent's turn like `agent.play_turn()`, but within the budget.
+
+        Only the time the agent spends deciding counts against the budget, not the time taken to play its moves."""
+        ticket = self._open()
+        generator = self.agent.play_turn()
+        usage.turns += 1
+
+        turn_seconds = 0.0
+        value = None
+        skipping = False
+        abandoned = False
+        try:
+            while True:
+                move_start = time.monotonic()
+                self._requests.put((ticket, functools.partial(self._step, generator, value)))
+                while True:
+                    deadlines = []
+                    if budget.per_move is not None and not skipping:
+                        deadlines.append(move_start + budget.per_move)
+                    if budget.per_turn is not None:
+                        turn_deadline = move_start + budget.per_turn - turn_seconds
+                        deadlines.append(turn_deadline)
+                    timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+                    reply = self._receive(ticket, timeout)
+                    if reply is not None:
+                        break
+
+                    if budget.per_turn is not None and time.monotonic() >= turn_deadline:
+                        usage.turn_overruns += 1
+                        self._overrun(budget, usage)
+                        abandoned = True
+                        return
+
+                    usage.move_overruns += 1
+                    if budget.policy != OverrunPolicy.SKIP_MOVE:
+                        self._overrun(budget, usage)
+                        abandoned = True
+                        return
+                    # Keep waiting for the late move, so it can be turned down
+                    skipping = True
+
+                seconds = time.monotonic() - move_start
+                turn_seconds += seconds
+                usage.think_seconds += seconds
+                usage.longest_move = max(usage.longest_move, seconds)
+
+                kind, payload = reply
+                if kind == 'done':
+                    return
+                if kind == 'error':
+                    raise payload
+
+                if skipping:
+                    # The move came in too late to be played
+                    if isinstance(payload, MovePlan):
+                        value = payload.failed('Out of time')
+                    else:
+                        value = MoveResult(False, 'Out of time')
+                    skipping = False
+                    continue
+
+                usage.moves += len(payload) if isinstance(payload, MovePlan) else 1
+                value = yield payload
+        finally:
+            # Anything still on its way from this turn is now stale
+            self._close(ticket, abandoned)
+            usage.longest_turn = max(usage.longest_turn, turn_seconds)
+
+    def call(self, method: Callable, args: tuple, budget: TimeBudget, usage: BudgetUsage, default=None):
+        """Calls one of the agent's methods in its thread, such as `would_accept_trade` when another player proposes
+        a trade. If the agent takes longer than it has for a move (or a turn, without a per-move budget), that
+        counts as an overrun and `default` is returned instead."""
+        ticket = self._open()
+        abandoned = False
+        try:
+            self._requests.put((ticket, lambda: ('answer', method(*args))))
+            timeout = budget.per_move if budget.per_move is not None else budget.per_turn
+            reply = self._receive(ticket, timeout)
+            if reply is None:
+                usage.move_overruns += 1
+                self._overrun(budget, usage)
+                abandoned = True
+                return default
+
+            kind, payload = reply
+            if kind == 'error':
+                raise payload
+            return payload
+        finally:
+            self._close(ticket, abandoned)
+
+    def _detach(self):
+        """Leaves the agent thinking against copies of the game and RNG. Called with the lock held, from the game's
+        thread, while the game is still where the agent left it."""
+        agent = self.agent
+        if self._detached_from is None:
+            self._detached_from = (agent.game, vars(agent).get('rng'))
+        real_game, _ = self._detached_from
+        agent.game = real_game.detached_copy()
+        agent.rng = random.Random()
+
+    def _reattach(self):
+        """Gives the agent back its real game and RNG. Called with the lock held, from the agent's thread, once it
+        has stopped thinking about whatever the game gave up on."""
+        if self._detached_from is None:
+            return
+        agent = self.agent
+        agent.game, rng = self._detached_from
+        if rng is None:
+            del agent.rng
+        else:
+            agent.rng = rng
+        self._detached_from = None
+
+    @staticmethod
+    def _overrun(budget: TimeBudget, usage: BudgetUsage):
+        if budget.policy == OverrunPolicy.DISQUALIFY:
+            usage.disqualified = True
+
+    def stop(self):
+        self._requests.put(None)
@@ -1,38 +1,102 @@
 import logging
 import queue
 import random
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, Optional
 
-from catan import board, player, moves
+from catan import board, player, moves, timing
+from catan.longest_road import LongestRoadTracker
+from catan.budget import TimeBudget, BudgetUsage, AgentRunner
 from agents import agents
 from agents.agents import Agent
-from game_events import RollEvent, PlayedMoveEvent
+from game_events import (
+    EventBus, RollEvent, PlayedMoveEvent, SettlementBuiltEvent, CityUpgradedEvent, RoadBuiltEvent,
+    SettlementRemovedEvent, CityDowngradedEvent, RoadRemovedEvent, ResourcesChangedEvent, LongestRoadEvent)
 from hexagons.hexagons import HexCoord
-from catan.resources import Resource
+from catan.resources import Resource, ResourceVector
 
 WINNING_VICTORY_POINTS = 10
 
 
 class Game:
-    def __init__(self, board: board.Board, agents: Dict[int, Agent], game_event_callback = None):
+    # Where the dice rolls and other chances come from: the global RNG, unless the game is given a random.Random of
+    # its own
+    rng = random
+
+    def __init__(
+            self,
+            board: board.Board,
+            agents: Dict[int, Agent],
+            game_event_callback = None,
+            debug: bool = False,
+            timings: Optional[timing.GameTimings] = None,
+            budget: Optional[TimeBudget] = None,
+            rng: Optional[random.Random] = None):
         self.board = board
         self.agents = agents
         self.game_event_callback = game_event_callback
+        # Everything that happens in the game is published here. The callback only gets the roll and move events.
+        self.events = EventBus()
+        if game_event_callback:
+            self.events.subscribe(game_event_callback, RollEvent, PlayedMoveEvent)
+        board.add_listener(_BoardEvents(self.events))
+        self.longest_road = LongestRoadTracker(board)
+        self.longest_road.listener = self._longest_road_changed
+        board.add_listener(self.longest_road)
         self.players = {}
         self.num_players = len(agents)
         self.turn_number = 0
+        # Enables expensive consistency checks of the game's bookkeeping
+        self.debug = debug
+        # Moves made through make_move, most recent last, so they can be taken back by unmake_move
+        self.journal: List[Tuple[int, moves.Move]] = []
+        # When set, how long each part of every turn takes is recorded here
+        self.timings = timings
+        # When set, agents play in threads of their own and must decide on their moves within this budget
+        self.budget = budget
+        self.budget_usage: Dict[int, BudgetUsage] = {}
+        self._agent_runners: Dict[int, AgentRunner] = {}
+        if rng is not None:
+            self.rng = rng
 
         self.next_to_play = 0
 
         for i in range(self.num_players):
             self.players[i] = player.Player(i)
+        # Watching every change to the hands has a cost, so only start once someone wants to know
+        self.events.watch(ResourcesChangedEvent, self._watch_hands)
 
         for (id, agent) in agents.items():
             agent.join_game(self, id)
+            if budget is not None:
+                self.budget_usage[id] = BudgetUsage()
+            if timings is not None:
+                timings.agent_types[id] = type(agent).__name__
 
     def event(self, event: Any):
-        if self.game_event_callback:
-            self.game_event_callback(event)
+        self.events.publish(event)
+
+    def _longest_road_changed(self, old_holder: Optional[int], new_holder: Optional[int]):
+        length = self.longest_road.length(new_holder) if new_holder is not None else 0
+        logging.info(f'Longest road is now held by {new_holder} ({length} roads)')
+        if self.events.wants(LongestRoadEvent):
+            self.events.publish(LongestRoadEvent(new_holder, length))
+
+    def _watch_hands(self):
+        for player_id, game_player in self.players.items():
+            game_player.hand.listener = self._hand_listener(player_id)
+
+    def _hand_listener(self, player_id: int):
+        events = self.events
+
+        def hand_changed(old: ResourceVector, new: ResourceVector):
+            old_counts, new_counts = old.to_dict(), new.to_dict()
+            change = {
+                resource: new_counts.get(resource, 0) - old_counts.get(resource, 0)
+                for resource in Resource
+                if new_counts.get(resource, 0) != old_counts.get(resource, 0)
+            }
+            events.publish(ResourcesChangedEvent(player_id, change))
+        return hand_changed
 
     def give_player_resource(self, player_id: int, resource: Resource, quantity: int = 1):
         self.players[player_id].hand.add_resource(resource, quantity)
@@ -46,7 +110,7 @@ class Game:
             # This tile has no resource to give
             return
 
-        for vertex in tile.coords.vertices():
+        for vertex in self.board.topology.hex_vertices(tile.coords):
             if vertex in self.board.settlements:
                 settlement = self.board.settlements[vertex]
                 self.give_player_resource(settlement.owner, resource, 2 if settlement.is_city else 1)
@@ -58,49 +122,111 @@ class Game:
         if roll == 7:
             self.roll_seven()
         else:
-            for tile in self.board.tiles.values():
-                if tile.number == roll:
-                    self.dispense_resource(tile.coords)
+            for payout in self.board.payouts_for_roll(roll):
+                self.give_player_resource(payout.owner, payout.resource, payout.amount)
 
     def roll_seven(self):
         # TODO
         pass
 
     def get_victory_points(self, player_id: int) -> int:
-        count = 0
-        for settlement in self.board.settlements.values():
-            if settlement.owner == player_id:
-                count += 2 if settlement.is_city else 1
+        count = self.board.victory_points(player_id)
+        if self.debug:
+            recount = self.board.count_victory_points(player_id)
+            if count != recount:
+                raise AssertionError(f'Player {player_id} has {count} victory points, but a recount found {recount}')
+            length, relength = self.longest_road.length(player_id), self.longest_road.recount(player_id)
+            if length != relength:
+                raise AssertionError(
+                    f'Player {player_id} has a longest road of {length}, but a recount found {relength}')
+
+        return count + self.longest_road.points(player_id)
 
-        return count
+    def legal_moves(self, player_id: int) -> List[moves.Move]:
+        """Every building move and bank exchange the player could make right now.
+
+        This is worked out from the board's legal build tracking and the player's hand, rather than by validating
+        every candidate, so it is cheap enough to ask before each move. Trades with other players are left out, since
+        whether they happen is up to the other players, as are exchanges for the resource being given away."""
+        the_board = self.board
+        hand = self.players[player_id].hand.vector
+        legal: List[moves.Move] = []
+
+        if hand.covers(moves.BuildSettlementMove.cost_vector):
+            legal += [moves.BuildSettlementMove(vertex)
+                      for vertex in the_board.legal_builds.settlement_vertices(player_id)]
+        if hand.covers(moves.UpgradeSettlementMove.cost_vector):
+            legal += [moves.UpgradeSettlementMove(settlement.coords) for settlement in the_board.settlements.values()
+                      if settlement.owner == player_id and not settlement.is_city]
+        if hand.covers(moves.BuildRoadMove.cost_vector):
+            legal += [moves.BuildRoadMove(edge) for edge in the_board.legal_builds.road_edges(player_id)]
+
+        rate = moves.ExchangeMove.rate
+        for offered in Resource:
+            if hand[offered] >= rate:
+                legal += [moves.ExchangeMove({offered: rate}, wanted) for wanted in Resource if wanted != offered]
+        return legal
 
     def do_move(self, player_id: int, move: moves.Move) -> moves.MoveResult:
         """Executes a player's Move"""
         move_context = moves.MoveContext(self, player_id)
+        if self.timings is not None:
+            return self._timed_execute(move, move_context)
         return move.execute(move_context)
 
+    def _timed_execute(self, move: moves.Move, move_context: moves.MoveContext) -> moves.MoveResult:
+        """Does what Move.execute does, timing the validation and the performance separately"""
+        move_type = type(move).__name__
+        start = timing.clock()
+        validation = move.validate(move_context)
+        validated = timing.clock()
+        self.timings.validate[move_type].record(validated - start)
+        if not validation.successful:
+            return validation
+
+        result = move.perform(move_context)
+        self.timings.perform[move_type].record(timing.clock() - validated)
+        return result
+
+    def make_move(self, player_id: int, move: moves.Move) -> moves.MoveResult:
+        """Executes a player's Move like do_move, but journals it so that unmake_move can reverse it.
+
+        Together these let a search explore moves in place instead of copying the game for every branch."""
+        result = self.do_move(player_id, move)
+        if result.successful:
+            self.journal.append((player_id, move))
+        return result
+
+    def unmake_move(self) -> None:
+        """Reverses the most recent move made through make_move"""
+        player_id, move = self.journal.pop()
+        move.undo(moves.MoveContext(self, player_id))
+
     def tick(self, player_agents: Dict[int, Agent]) -> bool:
         """Performs one turn of the game"""
-        roll = random.randint(1, 6) + random.randint(1, 6)
+        timings = self.timings
+        if timings is not None:
+            start = timing.clock()
+        roll = self.rng.randint(1, 6) + self.rng.randint(1, 6)
         self.rolled(self.next_to_play, roll)
+        if timings is not None:
+            timings.roll.record(timing.clock() - start)
 
-        move_generator = player_agents[self.next_to_play].play_turn()
+        move_generator = self._turn_moves(self.next_to_play, player_agents[self.next_to_play])
         logging.info(f"PLAYER {self.next_to_play} BEGIN TURN NUMBER {self.turn_number}")
 
-        # Advance to the first yield point
-        move = next(move_generator)
+        if timings is not None:
+            move_generator = self._timed_moves(move_generator, timings.think[self.next_to_play])
+
         try:
+            # Advance to the first yield point. Agents may also end their turn without moving at all.
+            move = next(move_generator)
             while True:
-                logging.info(f'Player {self.next_to_play} is playing move {move}')
-                result_of_move = self.do_move(self.next_to_play, move)
-
-                if not result_of_move.successful:
-                    logging.info(f"Player {self.next_to_play}'s move failed because {result_of_move.results}")
+                if isinstance(move, moves.MovePlan):
+                    result = self.play_plan(self.next_to_play, move)
                 else:
-                    self.event(PlayedMoveEvent(self.next_to_play, move))
-                    logging.info(f"The move was successful")
-
-                move = move_generator.send(result_of_move)
+                    result = self._play_move(self.next_to_play, move)
+                move = move_generator.send(result)
         except StopIteration:
             pass
 
@@ -115,3 +241,129 @@ class Game:
         self.turn_number += 1
 
         return True
+
+    def play_plan(self, player_id: int, plan: moves.MovePlan) -> List[moves.MoveResult]:
+        """Plays a player's MovePlan as their turn would, returning the result of each move that was tried"""
+        results = []
+        for move in plan.moves:
+            result = self._play_move(player_id, move)
+            results.append(result)
+            if plan.stop_on_failure and not result.successful:
+                break
+        return results
+
+    def _play_move(self, player_id: int, move: moves.Move) -> moves.MoveResult:
+        """Plays a move on a player's turn: does it, then logs and announces how it went"""
+        logging.info(f'Player {player_id} is playing move {move}')
+        result = self.do_move(player_id, move)
+
+        if not result.successful:
+            logging.info(f"Player {player_id}'s move failed because {result.results}")
+        else:
+            self.event(PlayedMoveEvent(player_id, move))
+            logging.info(f"The move was successful")
+        return result
+
+    def _turn_moves(self, player_id: int, agent: Agent):
+        if self.budget is None:
+            return agent.play_turn()
+
+        usage = self.budget_usage[player_id]
+        if usage.disqualified:
+            logging.info(f'Player {player_id} is disqualified and skips their turn')
+            return iter(())
+
+        return self._runner(player_id, agent).play_turn(self.budget, usage)
+
+    def _runner(self, player_id: int, agent: Agent) -> AgentRunner:
+        runner = self._agent_runners.get(player_id)
+        if runner is None or runner.agent is not agent:
+            if runner is not None:
+                runner.stop()
+            runner = self._agent_runners[player_id] = AgentRunner(agent, f'agent-{player_id}')
+        return runner
+
+    def ask_agent(self, player_id: int, question: str, *args, default=None):
+        """Calls a method on a player's agent outside of its turn, such as `would_accept_trade`.
+
+        Under a budget, the agent answers in its own thread and has as long as it would for a move. If it runs over,
+        or has been disqualified, `default` is the answer instead."""
+        agent = self.agents[player_id]
+        if self.budget is None:
+            return getattr(agent, question)(*args)
+
+        usage = self.budget_usage[player_id]
+        if usage.disqualified:
+            return default
+        return self._runner(player_id, agent).call(getattr(agent, question), args, self.budget, usage, default)
+
+    def detached_copy(self) -> 'Game':
+        """A copy of the board, the hands and whose turn it is, sharing nothing with this game that changes.
+
+        An agent that runs out of time is left thinking against one of these, so that nothing it does from then on
+        can reach the game carrying on without it."""
+        copy = Game(self.board.clone(), {}, rng=random.Random())
+        copy.agents = dict(self.agents)
+        copy.num_players = self.num_players
+        for player_id, game_player in self.players.items():
+            copy.players[player_id] = player.Player(player_id)
+            copy.players[player_id].hand.vector = game_player.hand.vector
+        copy.turn_number = self.turn_number
+        copy.next_to_play = self.next_to_play
+        copy.longest_road.holder = self.longest_road.holder
+        return copy
+
+    def close(self):
+        """Stops the threads agents play in under a budget, then closes the agents that have anything to close, such
+        as MCTSAgent's worker processes. Agents finish whatever they are thinking about first."""
+        for runner in self._agent_runners.values():
+            runner.stop()
+        self._agent_runners.clear()
+        for agent in self.agents.values():
+            close = getattr(agent, 'close', None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def _timed_moves(move_generator, think: timing.LatencyHistogram):
+        """Passes moves and their results between an agent and the game, timing how long the agent takes to decide
+        on each move"""
+        start = timing.clock()
+        try:
+            move = next(move_generator)
+            while True:
+                think.record(timing.clock() - start)
+                result = yield move
+                start = timing.clock()
+                move = move_generator.send(result)
+        except StopIteration:
+            return
+
+
+class _BoardEvents(board.BoardListener):
+    """Publishes the changes to a game's board as events"""
+
+    def __init__(self, events: EventBus):
+        self.events = events
+
+    def _publish(self, event_type, *args):
+        if self.events.wants(event_type):
+            self.events.publish(event_type(*args))
+
+    def settlement_added(self, settlement: board.Settlement):
+        self._publish(SettlementBuiltEvent, settlement.owner, settlement.coords)
+
+    def settlement_upgraded(self, settlement: board.Settlement):
+        self._publish(CityUpgradedEvent, settlement.owner, settlement.coords)
+
+    def road_added(self, road: board.Road):
+        self._publish(RoadBuiltEvent, road.owner, road.coords)
+
+    def settlement_removed(self, settlement: board.Settlement):
+        self._publish(SettlementRemovedEvent, settlement.owner, settlement.coords)
+
+    def settlement_downgraded(self, settlement: board.Settlement):
+        self._publish(CityDowngradedEvent, settlement.owner, settlement.coords)
+
+    def road_removed(self, road: board.Road):
+        self._publish(RoadRemovedEvent, road.owner, road.coords)
@@ -0,0 +1,240 @@
+"""Longest Road.
+
+A player's longest road is the longest trail through their roads: a route that never uses the same road twice, and
+that can't carry on through a vertex where another player has a settlement. Whoever has the longest road, of at
+least MIN_LENGTH roads, holds the Longest Road and gets LONGEST_ROAD_POINTS victory points for it. It only changes
+hands when someone else's road becomes strictly longer than the holder's, or the holder's road is broken.
+
+Searching every player's roads after every change gets slow as the road networks grow, so LongestRoadTracker
+splits each player's roads into networks (groups of roads joined end to end) and remembers the longest trail in
+each. When a road is built, only trails through the new road can be longer than before. If the road doesn't close
+a loop, the best trail through it is just the best trails away from each of its ends put together, each of which
+only explores the network on that side. Only the rarer changes (closing a loop, a settlement cutting through a
+network, or a piece being taken back) search a whole network again, and then only the networks they touch.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from catan.board import Board, BoardListener, Settlement, Road
+from hexagons.hexagons import VertexCoord, EdgeCoord
+
+MIN_LENGTH = 5
+LONGEST_ROAD_POINTS = 2
+
+
+class _Network:
+    """Roads belonging to one player that are joined end to end"""
+
+    __slots__ = ('owner', 'roads', 'longest')
+
+    def __init__(self, owner: int, roads: Set[EdgeCoord], longest: int = 0):
+        self.owner = owner
+        self.roads = roads
+        self.longest = longest
+
+
+class LongestRoadTracker(BoardListener):
+    """Keeps each player's longest road, and who holds the Longest Road, up to date as a board changes"""
+
+    def __init__(self, board: Board):
+        self.board = board
+        self.holder: Optional[int] = None
+        # Called with the old and new holder whenever the Longest Road changes hands
+        self.listener: Optional[Callable[[Optional[int], Optional[int]], None]] = None
+
+        self._network_of: Dict[EdgeCoord, _Network] = {}
+        self._networks: Dict[int, Set[_Network]] = {}
+        self._lengths: Dict[int, int] = {}
+        # The holder before each piece was placed, so taking pieces back (as Game.unmake_move does) can restore it
+        self._history: List[Optional[int]] = []
+
+        self._rebuild(list(board.roads.values()))
+        self._update_holder()
+
+    def length(self, player_id: int) -> int:
+        """The player's longest road"""
+        return self._lengths.get(player_id, 0)
+
+    def points(self, player_id: int) -> int:
+        return LONGEST_ROAD_POINTS if self.holder == player_id else 0
+
+    def recount(self, player_id: int) -> int:
+        """Searches all of the player's roads for their longest road, rather than trusting the networks"""
+        roads = [road for road in self.board.roads.values() if road.owner == player_id]
+        return max((self._longest_in(player_id, network) for network in self._split(player_id, roads)), default=0)
+
+    # Walking the player's roads
+
+    def _is_blocked(self, owner: int, vertex: VertexCoord) -> bool:
+        """Whether another player's settlement stops the owner's roads carrying on through a vertex"""
+        settlement = self.board.settlements.get(vertex)
+        return settlement is not None and settlement.owner != owner
+
+    def _roads_at(self, owner: int, vertex: VertexCoord) -> List[EdgeCoord]:
+        return [road.coords for road in self.board._roads_touching_vertex(vertex) if road.owner == owner]
+
+    def _other_end(self, edge: EdgeCoord, vertex: VertexCoord) -> VertexCoord:
+        first, second = self.board.topology.edge_vertices(edge)
+        return second if first == vertex else first
+
+    def _trail_from(self, owner: int, vertex: VertexCoord, used: Set[EdgeCoord]) -> int:
+        """The longest trail setting off from a vertex without using any of `used`"""
+        best = 0
+        for edge in self._roads_at(owner, vertex):
+            if edge not in used:
+                best = max(best, self._trail_along(owner, edge, vertex, used))
+        return best
+
+    def _trail_along(self, owner: int, edge: EdgeCoord, vertex: VertexCoord, used: Set[EdgeCoord]) -> int:
+        """The longest trail setting off from a vertex along one of its roads"""
+        other = self._other_end(edge, vertex)
+        if self._is_blocked(owner, other):
+            return 1
+        used.add(edge)
+        length = 1 + self._trail_from(owner, other, used)
+        used.discard(edge)
+        return length
+
+    def _longest_in(self, owner: int, roads: Iterable[EdgeCoord]) -> int:
+        """The longest trail in a network, found by setting off along each of its roads both ways. Setting off from
+        each of its vertices instead could stray into the next network, where a settlement stands between the two."""
+        return max((self._trail_along(owner, edge, vertex, set())
+                    for edge in roads for vertex in self.board.topology.edge_vertices(edge)), default=0)
+
+    def _split(self, owner: int, roads: Iterable[Road]) -> List[Set[EdgeCoord]]:
+        """The networks the given roads form, with every road they are joined to"""
+        seen: Set[EdgeCoord] = set()
+        networks = []
+        for road in roads:
+            if road.coords in seen:
+                continue
+            network = {road.coords}
+            frontier = [road.coords]
+            while frontier:
+                edge = frontier.pop()
+                for vertex in self.board.topology.edge_vertices(edge):
+                    if self._is_blocked(owner, vertex):
+                        continue
+                    for other in self._roads_at(owner, vertex):
+                        if other not in network:
+                            network.add(other)
+                            frontier.append(other)
+            seen |= network
+            networks.append(network)
+        return networks
+
+    # Keeping the networks up to date
+
+    def _add_network(self, owner: int, roads: Set[EdgeCoord], longest: int):
+        network = _Network(owner, roads, longest)
+        self._networks.setdefault(owner, set()).add(network)
+        for edge in roads:
+            self._network_of[edge] = network
+
+    def _drop_network(self, network: _Network):
+        self._networks[network.owner].discard(network)
+        for edge in network.roads:
+            if self._network_of.get(edge) is network:
+                del self._network_of[edge]
+
+    def _rebuild(self, roads: List[Road]):
+        """Works out the networks of the given roads, and their longest trails, from scratch"""
+        by_owner: Dict[int, List[Road]] = {}
+        for road in roads:
+            network = self._network_of.get(road.coords)
+            if network is not None:
+                self._drop_network(network)
+            by_owner.setdefault(road.owner, []).append(road)
+
+        for owner, owned in by_owner.items():
+            for network in self._split(owner, owned):
+                self._add_network(owner, network, self._longest_in(owner, network))
+            self._update_length(owner)
+
+    def _rebuild_at(self, vertex: VertexCoord):
+        """Rebuilds the networks of every road at a vertex"""
+        networks = set(self._network_of[edge] for edge in self.board.topology.vertex_edges(vertex)
+                       if edge in self._network_of)
+        roads = [self.board.roads[edge] for network in networks for edge in network.roads
+                 if edge in self.board.roads]
+        self._rebuild(roads)
+
+    def _update_length(self, owner: int):
+        self._lengths[owner] = max((network.longest for network in self._networks.get(owner, ())), default=0)
+
+    def _update_holder(self):
+        lengths = self._lengths
+        best = max(lengths.values(), default=0)
+        holder = self.holder
+        if holder is None or lengths.get(holder, 0) < max(best, MIN_LENGTH):
+            leaders = [player_id for player_id, length in lengths.items() if length == best]
+            holder = leaders[0] if best >= MIN_LENGTH and len(leaders) == 1 else None
+        self._set_holder(holder)
+
+    def _set_holder(self, holder: Optional[int]):
+        old, self.holder = self.holder, holder
+        if old != holder and self.listener is not None:
+            self.listener(old, holder)
+
+    def _restore_holder(self):
+        if self._history:
+            self._set_holder(self._history.pop())
+        else:
+            self._update_holder()
+
+    def road_added(self, road: Road):
+        self._history.append(self.holder)
+        owner, edge = road.owner, road.coords
+        # The networks already at each end. The road joins them unless a settlement is in the way.
+        ends = []
+        for vertex in self.board.topology.edge_vertices(edge):
+            joined = None
+            if not self._is_blocked(owner, vertex):
+                for other in self._roads_at(owner, vertex):
+                    if other != edge:
+                        joined = self._network_of[other]
+                        break
+            ends.append((vertex, joined))
+
+        (start, start_network), (end, end_network) = ends
+        if start_network is not None and start_network is end_network:
+            # The road closes a loop, so trails can come back round through it
+            self._rebuild([road] + [self.board.roads[other] for other in start_network.roads])
+        else:
+            # Trails either side of the road can't meet, so the longest through it is the longest each way
+            through = 1
+            for vertex, network in ends:
+                if network is not None:
+                    through += self._trail_from(owner, vertex, {edge})
+            roads = {edge}
+            longest = through
+            for network in (start_network, end_network):
+                if network is not None:
+                    self._drop_network(network)
+                    roads |= network.roads
+                    longest = max(longest, network.longest)
+            self._add_network(owner, roads, longest)
+            self._update_length(owner)
+        self._update_holder()
+
+    def settlement_added(self, settlement: Settlement):
+        self._history.append(self.holder)
+        vertex = settlement.coords
+        # Another player's network is only cut if its trails could pass through here
+        cut = [self._network_of[edge] for edge in self.board.topology.vertex_edges(vertex)
+               if edge in self._network_of and self._network_of[edge].owner != settlement.owner]
+        if len(cut) != len(set(cut)):
+            self._rebuild_at(vertex)
+        self._update_holder()
+
+    def road_removed(self, road: Road):
+        network = self._network_of.get(road.coords)
+        if network is not None:
+            self._drop_network(network)
+            self._rebuild([self.board.roads[edge] for edge in network.roads if edge in self.board.roads])
+            self._update_length(road.owner)
+        self._restore_holder()
+
+    def settlement_removed(self, settlement: Settlement):
+        # Networks that the settlement cut apart join up again
+        self._rebuild_at(settlement.coords)
+        self._restore_holder()
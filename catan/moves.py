@@ -1,11 +1,10 @@
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List
 from abc import ABC, abstractmethod
-import random
 
 from catan.board import IllegalMoveError
 from catan.player import Player, NotEnoughResourcesError, ResourceSet
-from catan.resources import Resource
+from catan.resources import Resource, ResourceVector
 from hexagons.hexagons import VertexCoord, EdgeCoord
 from catan import game, board
 
@@ -48,6 +47,35 @@ class Move(ABC):
     def perform(self, ctx: MoveContext):
         pass
 
+    def undo(self, ctx: MoveContext) -> None:
+        """Reverses a successful `perform`, putting the game back exactly as it was before it."""
+        raise NotImplementedError(f'{type(self).__name__} cannot be undone')
+
+
+class MovePlan:
+    """Moves for the game to play one after another, which an agent can yield all at once instead of one at a time.
+
+    The agent is sent back a list with the MoveResult of each move that was tried. With `stop_on_failure`, the rest of
+    the plan is dropped as soon as a move fails, so the list ends with that failure. Otherwise every move is tried.
+    """
+
+    def __init__(self, moves: Iterable[Move], stop_on_failure: bool = True):
+        self.moves: List[Move] = list(moves)
+        self.stop_on_failure = stop_on_failure
+
+    def failed(self, reason: Any) -> List[MoveResult]:
+        """The results for a plan that was not played at all"""
+        if not self.moves:
+            return []
+        tried = 1 if self.stop_on_failure else len(self.moves)
+        return [MoveResult(False, reason) for _ in range(tried)]
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __str__(self):
+        return f"[Plan {', '.join(str(move) for move in self.moves)}]"
+
 
 class BuildSettlementMove(Move):
     """Build a settlement in an empty vertex"""
@@ -58,12 +86,13 @@ class BuildSettlementMove(Move):
         Resource.MUD: 1,
         Resource.SHEEP: 1
     }
+    cost_vector = ResourceVector.from_dict(cost)
 
     def __init__(self, vertex: VertexCoord):
         self.vertex = vertex
 
     def validate(self, ctx: MoveContext) -> MoveResult:
-        if not ctx.player().hand.has_resources(self.cost):
+        if not ctx.player().hand.has_resources(self.cost_vector):
             return MoveResult(False, "Not enough resources")
 
         settlement = board.Settlement(ctx.player_id, self.vertex)
@@ -74,12 +103,16 @@ class BuildSettlementMove(Move):
 
     def perform(self, ctx: MoveContext) -> MoveResult:
 
-        ctx.player().hand.take_resources(self.cost)
+        ctx.player().hand.take_resources(self.cost_vector)
         settlement = board.Settlement(ctx.player_id, self.vertex)
         ctx.game.board.add_settlement(settlement)
 
         return MoveResult(True, None)
 
+    def undo(self, ctx: MoveContext) -> None:
+        ctx.game.board.remove_settlement(self.vertex)
+        ctx.player().hand.add_resources(self.cost_vector)
+
     def __str__(self):
         return f"[Build settlement at {self.vertex}]"
 
@@ -91,12 +124,13 @@ class UpgradeSettlementMove(Move):
         Resource.WHEAT: 2,
         Resource.STONE: 3
     }
+    cost_vector = ResourceVector.from_dict(cost)
 
     def __init__(self, vertex: VertexCoord):
         self.vertex = vertex
 
     def validate(self, ctx: MoveContext) -> MoveResult:
-        if not ctx.player().hand.has_resources(self.cost):
+        if not ctx.player().hand.has_resources(self.cost_vector):
             return MoveResult(False, "Not enough resources")
 
         settlement = ctx.game.board.settlements.get(self.vertex)
@@ -112,10 +146,12 @@ class UpgradeSettlementMove(Move):
         return MoveResult(True, None)
 
     def perform(self, ctx: MoveContext) -> MoveResult:
-        settlement = ctx.game.board.settlements[self.vertex]
-        settlement.is_city = True
+        ctx.game.board.upgrade_settlement(self.vertex)
         return MoveResult(True, None)
 
+    def undo(self, ctx: MoveContext) -> None:
+        ctx.game.board.downgrade_settlement(self.vertex)
+
     def __str__(self):
         return f"[Upgrade settlement at {self.vertex}]"
 
@@ -127,12 +163,13 @@ class BuildRoadMove(Move):
         Resource.WOOD: 1,
         Resource.MUD: 1,
     }
+    cost_vector = ResourceVector.from_dict(cost)
 
     def __init__(self, edge: EdgeCoord):
         self.edge = edge
 
     def validate(self, ctx: MoveContext) -> MoveResult:
-        if not ctx.player().hand.has_resources(self.cost):
+        if not ctx.player().hand.has_resources(self.cost_vector):
             return MoveResult(False, "Not enough resources")
 
         road = board.Road(ctx.player_id, self.edge)
@@ -142,12 +179,16 @@ class BuildRoadMove(Move):
         return MoveResult(True, None)
 
     def perform(self, ctx: MoveContext) -> MoveResult:
-        ctx.player().hand.take_resources(self.cost)
+        ctx.player().hand.take_resources(self.cost_vector)
         road = board.Road(ctx.player_id, self.edge)
         ctx.game.board.add_road(road)
 
         return MoveResult(True, None)
 
+    def undo(self, ctx: MoveContext) -> None:
+        ctx.game.board.remove_road(self.edge)
+        ctx.player().hand.add_resources(self.cost_vector)
+
     def __str__(self):
         return f"[Build Road at {self.edge}]"
 
@@ -161,27 +202,48 @@ class ProposeTradeMove(Move):
     def __init__(self, offering: ResourceSet, wants: ResourceSet):
         self.offering = offering
         self.wants = wants
+        self._offering_vector = ResourceVector.from_dict(offering)
+        self._wants_vector = ResourceVector.from_dict(wants)
+        # The player who accepted, once the trade has happened
+        self.partner = None
 
     def validate(self, ctx: MoveContext):
-        if not ctx.player().hand.has_resources(self.offering):
+        if not ctx.player().hand.has_resources(self._offering_vector):
             return MoveResult(False, "Does not have offered resources")
         return MoveResult(True, None)
 
     def perform(self, ctx: MoveContext) -> MoveResult:
         agent_items = list(ctx.game.agents.items())
         # Propose in a random order
-        random.shuffle(agent_items)
-        for player_id, agent in ctx.game.agents.items():
+        ctx.game.rng.shuffle(agent_items)
+        for player_id in ctx.game.agents:
+            ctx.game.ask_agent(player_id, 'expect_trade_offer', self.offering, self.wants)
+        for player_id in ctx.game.agents:
             player = ctx.game.players[player_id]
-            if agent.would_accept_trade(self.offering, self.wants) and player.hand.has_resources(self.wants):
-                player.hand.take_resources(self.wants)
-                ctx.player().hand.add_resources(self.wants)
-                player.hand.add_resources(self.offering)
-                ctx.player().hand.take_resources(self.offering)
+            accepts = ctx.game.ask_agent(player_id, 'would_accept_trade', self.offering, self.wants, default=False)
+            if accepts and player.hand.has_resources(self._wants_vector):
+                self.trade_with(ctx, player_id)
                 return MoveResult(True, None)
 
         return MoveResult(False, "Nobody wanted to trade")
 
+    def trade_with(self, ctx: MoveContext, partner_id: int):
+        """Swaps resources with a player who has agreed to the trade"""
+        partner = ctx.game.players[partner_id]
+        partner.hand.take_resources(self._wants_vector)
+        ctx.player().hand.add_resources(self._wants_vector)
+        partner.hand.add_resources(self._offering_vector)
+        ctx.player().hand.take_resources(self._offering_vector)
+        self.partner = partner_id
+
+    def undo(self, ctx: MoveContext) -> None:
+        partner = ctx.game.players[self.partner]
+        partner.hand.take_resources(self._offering_vector)
+        ctx.player().hand.add_resources(self._offering_vector)
+        partner.hand.add_resources(self._wants_vector)
+        ctx.player().hand.take_resources(self._wants_vector)
+        self.partner = None
+
     def __str__(self):
         return f"[Trade {self.wants} for {self.offering}]"
 
@@ -192,30 +254,38 @@ class ExchangeMove(Move):
     offering: ResourceSet
     wants: Resource
 
+    # How many of a resource the bank takes for one of another
+    rate = 4
+
     def __init__(self, offering: ResourceSet, wants: Resource):
         self.offering = offering
         self.wants = wants
+        self._offering_vector = ResourceVector.from_dict(offering)
 
     def validate(self, ctx: MoveContext) -> MoveResult:
         if len(self.offering) != 1:
             return MoveResult(False, "Can't offer more than one type of resource")
 
-        if not ctx.player().hand.has_resources(self.offering):
+        if not ctx.player().hand.has_resources(self._offering_vector):
             return MoveResult(False, "Does not have offered resources")
 
         (offering, offering_qty) = next(iter(self.offering.items()))
 
         # TODO implement ports
 
-        if offering_qty != 4:
+        if offering_qty != self.rate:
             return MoveResult(False, 'Invalid Exchange')
 
         return MoveResult(True, None)
 
     def perform(self, ctx: MoveContext) -> MoveResult:
-        ctx.player().hand.take_resources(self.offering)
+        ctx.player().hand.take_resources(self._offering_vector)
         ctx.player().hand.add_resource(self.wants, 1)
         return MoveResult(True, None)
+
+    def undo(self, ctx: MoveContext) -> None:
+        ctx.player().hand.take_resources(ResourceVector.single(self.wants))
+        ctx.player().hand.add_resources(self._offering_vector)
     
     def __str__(self):
         return f"[Exchange {self.offering} for {self.wants}]"
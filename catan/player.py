@@ -1,6 +1,6 @@
-from typing import Dict
+from typing import Callable, Dict, Optional, Union
 
-from catan.resources import Resource
+from catan.resources import Resource, ResourceSet, ResourceVector
 
 
 class Player:
@@ -9,41 +9,39 @@ class Player:
         self.hand = Hand()
 
 
-ResourceSet = Dict[Resource, int]
-
-
 class Hand:
     def __init__(self):
-        self.resources = {
-            Resource.WHEAT: 0,
-            Resource.STONE: 0,
-            Resource.MUD: 0,
-            Resource.WOOD: 0,
-            Resource.SHEEP: 0
-        }
+        self.vector = ResourceVector()
+        # Called with the old and new contents after every change made through the methods below
+        self.listener: Optional[Callable[[ResourceVector, ResourceVector], None]] = None
+
+    @property
+    def resources(self) -> ResourceSet:
+        """A snapshot of the hand as a dict. Changing it won't change the hand."""
+        return self.vector.to_dict()
 
     def add_resource(self, resource: Resource, quantity: int = 1):
-        self.resources[resource] += quantity
+        self._set(self.vector + ResourceVector.single(resource, quantity))
 
-    def add_resources(self, resources: Dict[Resource, int]):
-        for resource, quantity in resources.items():
-            self.add_resource(resource, quantity)
+    def add_resources(self, resources: Union[ResourceVector, Dict[Resource, int]]):
+        self._set(self.vector + ResourceVector.of(resources))
 
-    def take_resources(self, demanded_resources: Dict[Resource, int]) -> None:
-        if self.has_resources(demanded_resources):
-            for resource, quantity in demanded_resources.items():
-                self.resources[resource] -= quantity
+    def take_resources(self, demanded_resources: Union[ResourceVector, Dict[Resource, int]]) -> None:
+        demanded = ResourceVector.of(demanded_resources)
+        if self.vector.covers(demanded):
+            self._set(self.vector - demanded)
         else:
             raise NotEnoughResourcesError()
 
-    def has_resources(self, resources: Dict[Resource, int]) -> bool:
-        for resource, quantity in resources.items():
-            if self.resources[resource] < quantity:
-                return False
-        return True
+    def _set(self, vector: ResourceVector):
+        old, self.vector = self.vector, vector
+        if self.listener is not None:
+            self.listener(old, vector)
+
+    def has_resources(self, resources: Union[ResourceVector, Dict[Resource, int]]) -> bool:
+        return self.vector.covers(ResourceVector.of(resources))
 
 
 class NotEnoughResourcesError(Exception):
     def __init__(self):
         super().__init__("Not enough resources")
-
@@ -0,0 +1,263 @@
+"""A compact binary record of played games, and replaying games from it without their agents.
+
+A record file is any number of games written one after another. Each game is a header describing the board, then
+an append-only stream of entries (starting pieces, dice rolls and successful moves), then an end entry. Every entry
+is a one-byte opcode followed by a fixed-size payload, so a reader only ever needs to look at the next few bytes.
+Trades and exchanges store their counts in a byte each, unless one of them doesn't fit, in which case the move is
+written as a "wide" entry with four bytes per count instead.
+
+To record a game, create a GameRecorder, call `begin` with the game before its first turn, pass the recorder as
+(or from) the game's event callback, and call `end` once the game is over.
+"""
+import struct
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, List, Tuple, Optional, Callable, Any
+
+from catan import board, game, moves
+from catan.resources import Resource, ResourceSet
+from agents.agents import Agent
+from game_events import RollEvent, PlayedMoveEvent
+from hexagons.hexagons import HexCoord, VertexCoord, EdgeCoord
+
+MAGIC = b'CTN1'
+
+TILE_TYPES = list(board.TileType)
+RESOURCES = list(Resource)
+
+# Entry opcodes
+SETTLEMENT = 1
+CITY = 2
+ROAD = 3
+ROLL = 4
+BUILD_SETTLEMENT = 5
+UPGRADE_SETTLEMENT = 6
+BUILD_ROAD = 7
+TRADE = 8
+EXCHANGE = 9
+END = 10
+WIDE_TRADE = 11
+WIDE_EXCHANGE = 12
+
+_HEADER = struct.Struct('<4sBH')
+_TILE = struct.Struct('<bbBB')
+# Player, then a coordinate's q, r and corner/side
+_PLACE = struct.Struct('<Bbbb')
+_ROLL = struct.Struct('<BB')
+# Player, partner, five offered counts, five wanted counts
+_TRADE = struct.Struct('<BB5B5B')
+# Player, five offered counts, wanted resource
+_EXCHANGE = struct.Struct('<B5BB')
+# The same, for counts that don't fit in a byte
+_WIDE_TRADE = struct.Struct('<BB5I5I')
+_WIDE_EXCHANGE = struct.Struct('<B5IB')
+# Winner (-1 for none), number of turns
+_END = struct.Struct('<bI')
+
+_PAYLOADS = {
+    SETTLEMENT: _PLACE,
+    CITY: _PLACE,
+    ROAD: _PLACE,
+    ROLL: _ROLL,
+    BUILD_SETTLEMENT: _PLACE,
+    UPGRADE_SETTLEMENT: _PLACE,
+    BUILD_ROAD: _PLACE,
+    TRADE: _TRADE,
+    EXCHANGE: _EXCHANGE,
+    END: _END,
+    WIDE_TRADE: _WIDE_TRADE,
+    WIDE_EXCHANGE: _WIDE_EXCHANGE,
+}
+
+
+def _encode_resources(resources: ResourceSet) -> Tuple[int, ...]:
+    return tuple(resources.get(resource, 0) for resource in RESOURCES)
+
+
+def _decode_resources(counts) -> ResourceSet:
+    return {resource: count for resource, count in zip(RESOURCES, counts) if count}
+
+
+class GameRecorder:
+    """Writes the games it is shown to a binary stream."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.turns = 0
+
+    def _write(self, opcode: int, *payload):
+        self.stream.write(bytes((opcode,)) + _PAYLOADS[opcode].pack(*payload))
+
+    def begin(self, the_game: 'game.Game'):
+        """Writes the board layout and the pieces already on it"""
+        the_board = the_game.board
+        self.turns = 0
+        self.stream.write(_HEADER.pack(MAGIC, the_game.num_players, len(the_board.tiles)))
+        for tile in the_board.tiles.values():
+            self.stream.write(_TILE.pack(
+                tile.coords.q, tile.coords.r, TILE_TYPES.index(tile.type), tile.number or 0))
+
+        for settlement in the_board.settlements.values():
+            coords = settlement.coords
+            self._write(SETTLEMENT, settlement.owner, coords.tile.q, coords.tile.r, coords.vertex)
+        for road in the_board.roads.values():
+            self._write(ROAD, road.owner, road.coords.tile.q, road.coords.tile.r, road.coords.edge)
+        for settlement in the_board.settlements.values():
+            if settlement.is_city:
+                coords = settlement.coords
+                self._write(CITY, settlement.owner, coords.tile.q, coords.tile.r, coords.vertex)
+
+    def __call__(self, event: Any):
+        if isinstance(event, RollEvent):
+            self.turns += 1
+            self._write(ROLL, event.player_id, event.roll)
+        elif isinstance(event, PlayedMoveEvent):
+            self.record_move(event.player_id, event.move)
+
+    def record_move(self, player_id: int, move: 'moves.Move'):
+        if isinstance(move, moves.BuildSettlementMove):
+            self._write(BUILD_SETTLEMENT, player_id, move.vertex.tile.q, move.vertex.tile.r, move.vertex.vertex)
+        elif isinstance(move, moves.UpgradeSettlementMove):
+            self._write(UPGRADE_SETTLEMENT, player_id, move.vertex.tile.q, move.vertex.tile.r, move.vertex.vertex)
+        elif isinstance(move, moves.BuildRoadMove):
+            self._write(BUILD_ROAD, player_id, move.edge.tile.q, move.edge.tile.r, move.edge.edge)
+        elif isinstance(move, moves.ProposeTradeMove):
+            counts = _encode_resources(move.offering) + _encode_resources(move.wants)
+            self._write(TRADE if max(counts) <= 0xff else WIDE_TRADE, player_id, move.partner, *counts)
+        elif isinstance(move, moves.ExchangeMove):
+            counts = _encode_resources(move.offering)
+            self._write(
+                EXCHANGE if max(counts) <= 0xff else WIDE_EXCHANGE, player_id, *counts, RESOURCES.index(move.wants))
+        else:
+            raise ValueError(f'Cannot record move {move}')
+
+    def end(self, winner: Optional[int]):
+        self._write(END, -1 if winner is None else winner, self.turns)
+
+
+@dataclass
+class GameRecord:
+    """One recorded game, as read back from a stream"""
+    num_players: int
+    tiles: List[board.Tile]
+    # (opcode, payload tuple) pairs, in the order they happened
+    entries: List[Tuple[int, tuple]] = field(default_factory=list)
+    winner: Optional[int] = None
+    turns: int = 0
+
+    def new_board(self) -> board.Board:
+        """The board as it was before the first turn"""
+        the_board = board.Board()
+        for tile in self.tiles:
+            the_board.add_tile(tile)
+
+        for opcode, payload in self.entries:
+            if opcode == SETTLEMENT:
+                owner, q, r, vertex = payload
+                the_board.add_settlement(
+                    board.Settlement(owner, VertexCoord(HexCoord(q, r), vertex)), allow_free_placement=True)
+            elif opcode == ROAD:
+                owner, q, r, edge = payload
+                the_board.add_road(board.Road(owner, EdgeCoord(HexCoord(q, r), edge)), free_placement=True)
+            elif opcode == CITY:
+                _, q, r, vertex = payload
+                the_board.upgrade_settlement(VertexCoord(HexCoord(q, r), vertex))
+        return the_board
+
+    def replay(self, game_event_callback: Optional[Callable[[Any], None]] = None) -> 'game.Game':
+        """Reconstructs the game by applying the recorded rolls and moves directly, without any agents.
+
+        The callback sees the same RollEvents and PlayedMoveEvents the original game produced."""
+        agents = {player_id: _ReplayAgent() for player_id in range(self.num_players)}
+        the_game = game.Game(self.new_board(), agents, game_event_callback)
+
+        first_roll = True
+        for opcode, payload in self.entries:
+            if opcode == ROLL:
+                player_id, roll = payload
+                if not first_roll:
+                    the_game.turn_number += 1
+                first_roll = False
+                the_game.next_to_play = player_id
+                the_game.rolled(player_id, roll)
+            elif opcode in _MOVE_DECODERS:
+                player_id = payload[0]
+                move = _MOVE_DECODERS[opcode](payload)
+                ctx = moves.MoveContext(the_game, player_id)
+                if opcode in (TRADE, WIDE_TRADE):
+                    move.trade_with(ctx, payload[1])
+                else:
+                    move.perform(ctx)
+                the_game.event(PlayedMoveEvent(player_id, move))
+
+        if self.winner is None and not first_roll:
+            # Like Game.tick, move on past the last turn unless it was won
+            the_game.turn_number += 1
+            the_game.next_to_play = (the_game.next_to_play + 1) % the_game.num_players
+
+        return the_game
+
+
+_MOVE_DECODERS = {
+    BUILD_SETTLEMENT: lambda p: moves.BuildSettlementMove(VertexCoord(HexCoord(p[1], p[2]), p[3])),
+    UPGRADE_SETTLEMENT: lambda p: moves.UpgradeSettlementMove(VertexCoord(HexCoord(p[1], p[2]), p[3])),
+    BUILD_ROAD: lambda p: moves.BuildRoadMove(EdgeCoord(HexCoord(p[1], p[2]), p[3])),
+    TRADE: lambda p: moves.ProposeTradeMove(_decode_resources(p[2:7]), _decode_resources(p[7:12])),
+    EXCHANGE: lambda p: moves.ExchangeMove(_decode_resources(p[1:6]), RESOURCES[p[6]]),
+}
+_MOVE_DECODERS[WIDE_TRADE] = _MOVE_DECODERS[TRADE]
+_MOVE_DECODERS[WIDE_EXCHANGE] = _MOVE_DECODERS[EXCHANGE]
+
+
+class _ReplayAgent(Agent):
+    """Stands in for the original agents, whose decisions are already in the record"""
+
+    def play_turn(self):
+        raise RuntimeError('Replayed games are not played by agents')
+
+    def would_accept_trade(self, offering, wants):
+        raise RuntimeError('Replayed games are not played by agents')
+
+
+class RecordFormatError(Exception):
+    pass
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise RecordFormatError('Record ended in the middle of a game')
+    return data
+
+
+def read_games(stream: BinaryIO) -> Iterator[GameRecord]:
+    """Reads games from a stream one at a time, so only one game is ever held in memory"""
+    while True:
+        header = stream.read(_HEADER.size)
+        if not header:
+            return
+        if len(header) != _HEADER.size:
+            raise RecordFormatError('Record ended in the middle of a game')
+
+        magic, num_players, num_tiles = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise RecordFormatError(f'Not a game record (found {magic!r})')
+
+        tiles = []
+        for q, r, tile_type, number in _TILE.iter_unpack(_read_exactly(stream, _TILE.size * num_tiles)):
+            tiles.append(board.Tile(HexCoord(q, r), TILE_TYPES[tile_type], number or None))
+
+        record = GameRecord(num_players, tiles)
+        while True:
+            opcode = _read_exactly(stream, 1)[0]
+            payload_format = _PAYLOADS.get(opcode)
+            if payload_format is None:
+                raise RecordFormatError(f'Unknown entry type {opcode}')
+
+            payload = payload_format.unpack(_read_exactly(stream, payload_format.size))
+            if opcode == END:
+                winner, record.turns = payload
+                record.winner = None if winner < 0 else winner
+                break
+            record.entries.append((opcode, payload))
+
+        yield record
@@ -1,4 +1,5 @@
 from enum import Enum, auto
+from typing import Dict, Union
 
 
 class Resource(Enum):
@@ -8,3 +9,91 @@ class Resource(Enum):
     WOOD = auto()
     SHEEP = auto()
 
+
+ResourceSet = Dict[Resource, int]
+
+_LANE_BITS = 32
+_LANE_MASK = (1 << (_LANE_BITS - 1)) - 1
+_LANE_SHIFTS = {resource: i * _LANE_BITS for i, resource in enumerate(Resource)}
+# The top bit of every lane. It's kept clear in stored values and used to detect borrows when comparing.
+_GUARD_BITS = sum(1 << (shift + _LANE_BITS - 1) for shift in _LANE_SHIFTS.values())
+
+
+def _check_quantity(resource: Resource, quantity: int):
+    # Anything outside a lane would borrow from or carry into the lanes of other resources
+    if not 0 <= quantity <= _LANE_MASK:
+        raise ValueError(f'{quantity} {resource.name} is not a quantity a ResourceVector can hold')
+
+
+class ResourceVector:
+    """An immutable quantity of each resource, packed into one integer with a fixed-width lane per resource.
+
+    Because every lane sits in the same integer, adding, subtracting and comparing whole sets of resources are
+    single integer operations rather than a loop over a dict. Quantities must stay between 0 and 2^31 - 1, which
+    building a vector checks; subtracting more than is present is not checked, so compare with `covers` first.
+
+    Anywhere a ResourceVector is accepted, a ResourceSet dict works too.
+    """
+    __slots__ = ('bits',)
+
+    def __init__(self, bits: int = 0):
+        self.bits = bits
+
+    @classmethod
+    def from_dict(cls, resources: ResourceSet) -> 'ResourceVector':
+        bits = 0
+        for resource, quantity in resources.items():
+            _check_quantity(resource, quantity)
+            bits += quantity << _LANE_SHIFTS[resource]
+        return cls(bits)
+
+    @classmethod
+    def single(cls, resource: Resource, quantity: int = 1) -> 'ResourceVector':
+        _check_quantity(resource, quantity)
+        return cls(quantity << _LANE_SHIFTS[resource])
+
+    @classmethod
+    def of(cls, resources: Union['ResourceVector', ResourceSet]) -> 'ResourceVector':
+        if isinstance(resources, ResourceVector):
+            return resources
+        return cls.from_dict(resources)
+
+    def to_dict(self) -> ResourceSet:
+        return {resource: (self.bits >> shift) & _LANE_MASK for resource, shift in _LANE_SHIFTS.items()}
+
+    def covers(self, other: 'ResourceVector') -> bool:
+        """Whether there's at least as much of every resource here as in `other`"""
+        # A lane that would go negative borrows from, and so clears, its guard bit
+        return ((self.bits | _GUARD_BITS) - other.bits) & _GUARD_BITS == _GUARD_BITS
+
+    def total(self) -> int:
+        return sum((self.bits >> shift) & _LANE_MASK for shift in _LANE_SHIFTS.values())
+
+    def __getitem__(self, resource: Resource) -> int:
+        return (self.bits >> _LANE_SHIFTS[resource]) & _LANE_MASK
+
+    def __add__(self, other: 'ResourceVector') -> 'ResourceVector':
+        return ResourceVector(self.bits + other.bits)
+
+    def __sub__(self, other: 'ResourceVector') -> 'ResourceVector':
+        return ResourceVector(self.bits - other.bits)
+
+    def __ge__(self, other: 'ResourceVector') -> bool:
+        return self.covers(other)
+
+    def __le__(self, other: 'ResourceVector') -> bool:
+        return other.covers(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, ResourceVector):
+            return NotImplemented
+        return self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __repr__(self):
+        return f'ResourceVector({ {resource.name: quantity for resource, quantity in self.to_dict().items() if quantity} })'
@@ -0,0 +1,49 @@
+"""Immutable copies of a game's state, for showing it somewhere other than the thread playing it."""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+from catan import game
+from catan.board import Tile, Settlement, Road
+from catan.resources import Resource
+from hexagons.hexagons import HexCoord, VertexCoord, EdgeCoord
+
+
+@dataclass(frozen=True)
+class BoardSnapshot:
+    """The parts of a Board needed to draw it"""
+    tiles: Mapping[HexCoord, Tile]
+    settlements: Mapping[VertexCoord, Settlement]
+    roads: Mapping[EdgeCoord, Road]
+
+
+@dataclass(frozen=True)
+class PlayerSnapshot:
+    id: int
+    resources: Mapping[Resource, int]
+    victory_points: int
+
+
+@dataclass(frozen=True)
+class GameSnapshot:
+    turn_number: int
+    next_to_play: int
+    board: BoardSnapshot
+    players: Tuple[PlayerSnapshot, ...]
+
+    @classmethod
+    def of(cls, the_game: 'game.Game') -> 'GameSnapshot':
+        """Must be called from the thread playing the game, so that nothing changes while it is copied"""
+        the_board = the_game.board
+        board_snapshot = BoardSnapshot(
+            # Boards replace their tiles dict rather than changing it, so it can be shared
+            MappingProxyType(the_board.tiles),
+            # Pieces are replaced rather than changed too, so only the dicts holding them need copying
+            MappingProxyType(dict(the_board.settlements)),
+            MappingProxyType(dict(the_board.roads)),
+        )
+        players = tuple(
+            PlayerSnapshot(player_id, MappingProxyType(player.hand.resources), the_game.get_victory_points(player_id))
+            for player_id, player in sorted(the_game.players.items())
+        )
+        return cls(the_game.turn_number, the_game.next_to_play, board_snapshot, players)
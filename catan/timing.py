@@ -0,0 +1,132 @@
+"""Where the time in a game goes.
+
+A Game given a GameTimings records how long each part of every turn took into latency histograms. Games without
+one skip all of this, so leaving it off costs no more than a couple of attribute checks per move.
+"""
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+# Bucket i counts latencies of at least 2**(i - 1) and less than 2**i nanoseconds (bucket 0 counts zeroes)
+BUCKETS = 64
+
+clock = time.perf_counter_ns
+
+
+class LatencyHistogram:
+    """Latencies in nanoseconds, counted in power-of-two buckets"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def record(self, nanoseconds: int):
+        self.counts[min(nanoseconds.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += nanoseconds
+        if self.min is None or nanoseconds < self.min:
+            self.min = nanoseconds
+        if self.max is None or nanoseconds > self.max:
+            self.max = nanoseconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        for bucket, count in enumerate(other.counts):
+            self.counts[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> int:
+        """An upper bound on the given percentile (0 to 1), accurate to within a factor of two"""
+        if not self.count:
+            return 0
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** bucket - 1 if bucket else 0, self.max)
+        return self.max
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __str__(self):
+        return (f'n={self.count} mean={_format_ns(self.mean)} p50<={_format_ns(self.percentile(0.5))} '
+                f'p99<={_format_ns(self.percentile(0.99))} max={_format_ns(self.max or 0)}')
+
+
+def _format_ns(nanoseconds: float) -> str:
+    if nanoseconds >= 1e9:
+        return f'{nanoseconds / 1e9:.2f}s'
+    if nanoseconds >= 1e6:
+        return f'{nanoseconds / 1e6:.2f}ms'
+    if nanoseconds >= 1e3:
+        return f'{nanoseconds / 1e3:.1f}us'
+    return f'{nanoseconds:.0f}ns'
+
+
+class GameTimings:
+    """Latency histograms for each part of a turn.
+
+    - `roll`: rolling the dice and paying out resources
+    - `think[player_id]`: the time an agent spends in `play_turn` deciding on each move (between yields)
+    - `validate[move type]` and `perform[move type]`: the two halves of executing a move, by the move's class name
+
+    Timings from several games can be combined with `merge`, for instance from each game of a tournament.
+    """
+
+    def __init__(self):
+        self.roll = LatencyHistogram()
+        self.think: Dict[int, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.validate: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.perform: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        # The kind of agent in each seat, so thinking time can also be reported by agent type
+        self.agent_types: Dict[int, str] = {}
+
+    def merge(self, other: 'GameTimings'):
+        self.roll.merge(other.roll)
+        for ours, theirs in ((self.think, other.think), (self.validate, other.validate),
+                             (self.perform, other.perform)):
+            for key, histogram in theirs.items():
+                ours[key].merge(histogram)
+        self.agent_types.update(other.agent_types)
+
+    def think_by_agent_type(self) -> Dict[str, LatencyHistogram]:
+        by_type: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        for player_id, histogram in self.think.items():
+            by_type[self.agent_types.get(player_id, str(player_id))].merge(histogram)
+        return dict(by_type)
+
+    @classmethod
+    def combined(cls, timings: Iterable['GameTimings']) -> 'GameTimings':
+        result = cls()
+        for game_timings in timings:
+            result.merge(game_timings)
+        return result
+
+    def __str__(self):
+        lines = [f'roll and dispense: {self.roll}']
+        for player_id in sorted(self.think):
+            lines.append(f'think, player {player_id} ({self.agent_types.get(player_id, "?")}): '
+                         f'{self.think[player_id]}')
+        for move_type in sorted(set(self.validate) | set(self.perform)):
+            lines.append(f'{move_type} validate: {self.validate.get(move_type, LatencyHistogram())}')
+            lines.append(f'{move_type} perform: {self.perform.get(move_type, LatencyHistogram())}')
+        return '\n'.join(lines)
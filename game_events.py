@@ -1,11 +1,20 @@
-from attr import dataclass
+"""Events describing what happens in a game.
 
-from catan.moves import Move
+RollEvent and PlayedMoveEvent describe turns as the players see them. The rest are deltas: each describes a single
+change to the board or to a player's hand, so that anything following a game can keep up with it by doing work in
+proportion to what changed rather than looking over the whole game. Subscribe to them through Game.events.
+"""
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Type, TYPE_CHECKING
 
+from attr import dataclass
 
-@dataclass
-class GameUpdateEvent:
-    game: 'game.Game'
+from catan.resources import ResourceSet
+from hexagons.hexagons import VertexCoord, EdgeCoord
+
+if TYPE_CHECKING:
+    # catan.moves imports the game, which imports this module
+    from catan import moves
 
 
 @dataclass
@@ -17,4 +26,101 @@ class RollEvent:
 @dataclass
 class PlayedMoveEvent:
     player_id: int
-    move: Move
+    move: 'moves.Move'
+
+
+@dataclass
+class SettlementBuiltEvent:
+    player_id: int
+    vertex: VertexCoord
+
+
+@dataclass
+class CityUpgradedEvent:
+    player_id: int
+    vertex: VertexCoord
+
+
+@dataclass
+class RoadBuiltEvent:
+    player_id: int
+    edge: EdgeCoord
+
+
+@dataclass
+class SettlementRemovedEvent:
+    """Only happens when a move is taken back (see Game.unmake_move)"""
+    player_id: int
+    vertex: VertexCoord
+
+
+@dataclass
+class CityDowngradedEvent:
+    """Only happens when a move is taken back (see Game.unmake_move)"""
+    player_id: int
+    vertex: VertexCoord
+
+
+@dataclass
+class RoadRemovedEvent:
+    """Only happens when a move is taken back (see Game.unmake_move)"""
+    player_id: int
+    edge: EdgeCoord
+
+
+@dataclass
+class ResourcesChangedEvent:
+    player_id: int
+    # How much of each resource was gained (positive) or lost (negative). Unchanged resources are left out.
+    change: ResourceSet
+
+
+@dataclass
+class LongestRoadEvent:
+    # The new holder of the Longest Road and the length of their road, or None and 0 if nobody holds it any more
+    player_id: Optional[int]
+    length: int
+
+
+class EventBus:
+    """Passes events on to the subscribers that want them"""
+
+    def __init__(self):
+        self._subscribers: Dict[Type, List[Callable[[Any], None]]] = defaultdict(list)
+        self._everything: List[Callable[[Any], None]] = []
+        self._watchers: Dict[Type, List[Callable[[], None]]] = defaultdict(list)
+
+    def watch(self, event_type: Type, callback: Callable[[], None]):
+        """Calls `callback` once, as soon as anyone wants events of the given type. Publishers can use this to avoid
+        keeping track of changes until someone is interested in them."""
+        if self.wants(event_type):
+            callback()
+        else:
+            self._watchers[event_type].append(callback)
+
+    def subscribe(self, callback: Callable[[Any], None], *event_types: Type) -> Callable[[], None]:
+        """Calls `callback` with every event of the given types, or with every event if no types are given.
+
+        Returns a function that unsubscribes the callback again."""
+        lists = [self._subscribers[event_type] for event_type in event_types] or [self._everything]
+        for subscribers in lists:
+            subscribers.append(callback)
+
+        for watched in list(event_types or self._watchers):
+            for watcher in self._watchers.pop(watched, ()):
+                watcher()
+
+        def unsubscribe():
+            for subscribers in lists:
+                subscribers.remove(callback)
+        return unsubscribe
+
+    def wants(self, event_type: Type) -> bool:
+        """Whether anyone would receive an event of this type, so that events nobody wants needn't be made"""
+        return bool(self._everything) or bool(self._subscribers.get(event_type))
+
+    def publish(self, event: Any):
+        for callback in self._subscribers.get(type(event), ()):
+            callback(event)
+        for callback in self._everything:
+            callback(event)
@@ -0,0 +1,61 @@
+"""Hands a running game over to the GUI without either side waiting on the other.
+
+The game thread publishes snapshots and events into a GameFeed, and the GUI takes whatever has arrived whenever it
+gets round to it. Only the newest snapshot is kept, and only so many events, so however fast the game runs the feed
+never holds more than a bounded amount of memory.
+"""
+import collections
+import math
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from catan import game
+from catan.snapshot import GameSnapshot
+
+DEFAULT_MAX_EVENTS = 500
+DEFAULT_SNAPSHOTS_PER_SECOND = 30
+
+
+class GameFeed:
+    def __init__(
+            self,
+            max_events: int = DEFAULT_MAX_EVENTS,
+            snapshots_per_second: float = DEFAULT_SNAPSHOTS_PER_SECOND):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[GameSnapshot] = None
+        self._events = collections.deque(maxlen=max_events)
+        self._dropped_events = 0
+        self.min_interval = 1 / snapshots_per_second
+        self._last_published = -math.inf
+
+    def event(self, event: Any):
+        """Passes on a game event. If the GUI has fallen behind, the oldest events it hasn't seen are dropped."""
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._dropped_events += 1
+            self._events.append(event)
+
+    def publish(self, the_game: 'game.Game', force: bool = False) -> bool:
+        """Publishes a snapshot of the game, unless one was published too recently. Returns whether it did.
+
+        Use `force` for states the GUI must not miss, like the last one before the game stops or pauses."""
+        now = time.monotonic()
+        if not force and now - self._last_published < self.min_interval:
+            return False
+
+        snapshot = GameSnapshot.of(the_game)
+        with self._lock:
+            self._snapshot = snapshot
+        self._last_published = now
+        return True
+
+    def take(self) -> Tuple[Optional[GameSnapshot], List[Any], int]:
+        """Everything published since the last call: the newest snapshot (or None if there isn't a new one), the
+        events, and how many events were dropped because they weren't taken in time"""
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+            events = list(self._events)
+            self._events.clear()
+            dropped, self._dropped_events = self._dropped_events, 0
+        return snapshot, events, dropped
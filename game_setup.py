@@ -1,5 +1,6 @@
 from catan.board import *
 import random
+from typing import Type
 from hexagons import hexagons
 
 
@@ -30,20 +31,20 @@ def random_vertex(coords) -> hexagons.VertexCoord:
     return hexagons.VertexCoord(tile, random.randint(0, 6)).normalize()
 
 
-def new_board():
-    board = Board()
+def new_board(board_type: Type[Board] = Board):
+    board = board_type()
 
     tile_places = [hexagons.HexCoord(x, y) for x in range(-4, 5) for y in range(-5, 5) if hexagons.hex_distance((0, 0), (x, y)) < 4]
     for place in tile_places:
-        board.tiles[place] = random_tile(place)
+        board.add_tile(random_tile(place))
 
     return board
 
 
-def new_board_started():
-    board = new_board()
+def new_board_started(num_players: int = 4, board_type: Type[Board] = Board):
+    board = new_board(board_type)
     tiles = list(board.tiles.keys())
-    for player in range(4):
+    for player in range(num_players):
         # Both settlements
         for _ in range(2):
             while True:
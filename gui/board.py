@@ -1,12 +1,22 @@
 import math
 from tkinter import Frame, Canvas, Button, ALL, SUNKEN
+from typing import Dict, Tuple, List
 
 from catan import board
 from gui.colors import TILE_COLORS, PLAYER_COLORS
 from hexagons import hexagons
 
+SETTLEMENT_SIZE = 10
+CITY_SIZE = 15
+
 
 class BoardFrame(Frame):
+    """Draws a board onto a canvas.
+
+    The canvas keeps the items it drew last time, so each call to draw_board only creates, changes or deletes the
+    items for the parts of the board that changed since. The tiles are drawn once and left alone unless the tiles
+    themselves change, as they do when a new game starts."""
+
     def __init__(self, master=None):
         super().__init__(
             master,
@@ -26,99 +36,177 @@ class BoardFrame(Frame):
         self.tile_radius = 50
         self.debug = False
 
+        # What is currently drawn, and the canvas items drawing it
+        self._tile_items: Dict[hexagons.HexCoord, Tuple[board.Tile, List[int]]] = {}
+        self._road_items: Dict[hexagons.EdgeCoord, Tuple[int, int]] = {}
+        # Settlements are drawn by their owner and whether they are a city
+        self._settlement_items: Dict[hexagons.VertexCoord, Tuple[Tuple[int, bool], int]] = {}
+        self._drawn_debug = False
+
+        # Pixel positions of coordinates, which only change if the tile radius or offset do
+        self._pixels: Dict[object, Tuple[float, float]] = {}
+        self._pixels_layout = (self.tile_offset, self.tile_radius)
+
     def toggle_debug(self):
         self.debug = not self.debug
 
-    def draw_hex_raw(self, center, radius, color='red'):
+    def draw_hex_raw(self, center, radius, color='red') -> int:
         xys = []
         for corner in hexagons.pixel_corners(center, radius):
             xys.append(corner[0])
             xys.append(corner[1])
 
-        self.canvas.create_polygon(*xys, outline='gray', fill=color, width=4)
+        return self.canvas.create_polygon(*xys, outline='gray', fill=color, width=4, tags='tile')
+
+    def _cached_pixels(self, coords, compute):
+        layout = (self.tile_offset, self.tile_radius)
+        if layout != self._pixels_layout:
+            self._pixels.clear()
+            self._pixels_layout = layout
+
+        pixels = self._pixels.get(coords)
+        if pixels is None:
+            pixels = self._pixels[coords] = compute(coords)
+        return pixels
 
     def hex_pixel_coords(self, coords: hexagons.HexCoord):
+        return self._cached_pixels(coords, self._hex_pixel_coords)
+
+    def _hex_pixel_coords(self, coords: hexagons.HexCoord):
         x = self.tile_radius * (math.sqrt(3) * coords.q + math.sqrt(3)/2 * coords.r) + self.tile_offset[0]
         y = self.tile_radius * (3.0 / 2 * coords.r) + self.tile_offset[1]
         return x, y
 
     def vertex_pixel_coords(self, vertex: hexagons.VertexCoord):
+        return self._cached_pixels(vertex, self._vertex_pixel_coords)
+
+    def _vertex_pixel_coords(self, vertex: hexagons.VertexCoord):
         return vertex.pos(self.hex_pixel_coords(vertex.tile), self.tile_radius)
 
-    def draw_hex(self, pos, color=None):
-        self.draw_hex_raw(pos, self.tile_radius, color=color)
+    def draw_hex(self, pos, color=None) -> int:
+        return self.draw_hex_raw(pos, self.tile_radius, color=color)
 
-    def draw_tile(self, tile: board.Tile):
+    def draw_tile(self, tile: board.Tile) -> List[int]:
+        """Draws a tile, returning the canvas items that make it up"""
         color = TILE_COLORS[tile.type]
 
         center_pos = self.hex_pixel_coords(tile.coords)
 
-        self.draw_hex(
+        items = [self.draw_hex(
             center_pos,
-            color=color)
+            color=color)]
 
         if tile.number:
             num_circle_radius = 15
 
-            self.canvas.create_oval(
+            items.append(self.canvas.create_oval(
                 center_pos[0] - num_circle_radius,
                 center_pos[1] - num_circle_radius,
                 center_pos[0] + num_circle_radius,
                 center_pos[1] + num_circle_radius,
                 fill='white',
-                outline='gray'
-            )
+                outline='gray',
+                tags='tile'
+            ))
 
-            self.canvas.create_text(center_pos[0], center_pos[1], text=str(tile.number))
+            items.append(self.canvas.create_text(center_pos[0], center_pos[1], text=str(tile.number), tags='tile'))
 
         if self.debug:
-            self.canvas.create_text(center_pos[0], center_pos[1] + 25, text=f'{tile.coords.q}, {tile.coords.r}')
-
-    def draw_board(self, board: board.Board):
-        for tile in board.tiles.values():
-            self.draw_tile(tile)
-
-        for road in board.roads.values():
-            self.draw_road(road)
+            items.append(self.canvas.create_text(
+                center_pos[0], center_pos[1] + 25, text=f'{tile.coords.q}, {tile.coords.r}', tags='tile'))
 
-        for settlement in board.settlements.values():
-            self.draw_settlement(settlement)
+        return items
 
-    def draw_settlement(self, settlement: board.Settlement):
+    def draw_board(self, board: board.Board):
+        self._draw_tiles(board)
+        self._draw_roads(board)
+        self._draw_settlements(board)
+
+    def _draw_tiles(self, board: board.Board):
+        redraw_all = self.debug != self._drawn_debug
+        self._drawn_debug = self.debug
+
+        changed = False
+        for coords in list(self._tile_items):
+            if redraw_all or board.tiles.get(coords) != self._tile_items[coords][0]:
+                self.canvas.delete(*self._tile_items.pop(coords)[1])
+
+        for coords, tile in board.tiles.items():
+            if coords not in self._tile_items:
+                self._tile_items[coords] = (tile, self.draw_tile(tile))
+                changed = True
+
+        if changed:
+            # Tiles go underneath everything else
+            self.canvas.tag_lower('tile')
+
+    def _draw_roads(self, board: board.Board):
+        for coords in [coords for coords in self._road_items if coords not in board.roads]:
+            self.canvas.delete(self._road_items.pop(coords)[1])
+
+        added = False
+        for coords, road in board.roads.items():
+            drawn = self._road_items.get(coords)
+            if drawn is None:
+                self._road_items[coords] = (road.owner, self.draw_road(road))
+                added = True
+            elif drawn[0] != road.owner:
+                self.canvas.itemconfigure(drawn[1], fill=PLAYER_COLORS[road.owner])
+                self._road_items[coords] = (road.owner, drawn[1])
+
+        if added and self._settlement_items:
+            # Roads go underneath settlements
+            self.canvas.tag_raise('settlement')
+
+    def _draw_settlements(self, board: board.Board):
+        for coords in [coords for coords in self._settlement_items if coords not in board.settlements]:
+            self.canvas.delete(self._settlement_items.pop(coords)[1])
+
+        for coords, settlement in board.settlements.items():
+            looks = (settlement.owner, settlement.is_city)
+            drawn = self._settlement_items.get(coords)
+            if drawn is None:
+                self._settlement_items[coords] = (looks, self.draw_settlement(settlement))
+            elif drawn[0] != looks:
+                item = drawn[1]
+                self.canvas.coords(item, *self._settlement_rectangle(settlement))
+                self.canvas.itemconfigure(item, fill=PLAYER_COLORS[settlement.owner])
+                self._settlement_items[coords] = (looks, item)
+
+    def _settlement_rectangle(self, settlement: board.Settlement):
         coords = self.vertex_pixel_coords(settlement.coords)
+        rectangle_size = CITY_SIZE if settlement.is_city else SETTLEMENT_SIZE
+        return (
+            coords[0] - rectangle_size,
+            coords[1] - rectangle_size,
+            coords[0] + rectangle_size,
+            coords[1] + rectangle_size,
+        )
+
+    def draw_settlement(self, settlement: board.Settlement) -> int:
+        return self.canvas.create_rectangle(
+            *self._settlement_rectangle(settlement),
+            fill=PLAYER_COLORS[settlement.owner],
+            tags='settlement'
+        )
 
-        if settlement.is_city:
-            rectangle_size = 15
-            self.canvas.create_rectangle(
-                coords[0] - rectangle_size,
-                coords[1] - rectangle_size,
-                coords[0] + rectangle_size,
-                coords[1] + rectangle_size,
-                fill=PLAYER_COLORS[settlement.owner]
-            )
-        else:
-            rectangle_size = 10
-            self.canvas.create_rectangle(
-                coords[0] - rectangle_size,
-                coords[1] - rectangle_size,
-                coords[0] + rectangle_size,
-                coords[1] + rectangle_size,
-                fill=PLAYER_COLORS[settlement.owner]
-            )
-
-    def draw_road(self, road: board.Road):
+    def draw_road(self, road: board.Road) -> int:
         [v1, v2] = road.coords.vertices()
         c1 = self.vertex_pixel_coords(v1)
         c2 = self.vertex_pixel_coords(v2)
 
-        self.canvas.create_line(
+        return self.canvas.create_line(
             c1[0],
             c1[1],
             c2[0],
             c2[1],
             fill=PLAYER_COLORS[road.owner],
-            width=5
+            width=5,
+            tags='road'
         )
 
     def clear(self):
         self.canvas.delete(ALL)
+        self._tile_items.clear()
+        self._road_items.clear()
+        self._settlement_items.clear()
@@ -1,10 +1,23 @@
 import tkinter
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_MAX_LINES = 1000
+
+
+# The tag names are the same every time, so don't build them for every message
+PLAYER_TAGS = {player_id: f'player_{player_id}' for player_id in range(8)}
+
+
+def player_tag(player_id: int) -> str:
+    return PLAYER_TAGS.get(player_id) or f'player_{player_id}'
 
 
 class EventMessageBuilder:
-    def __init__(self, textbox: tkinter.Text):
-        self.segments = []
-        self.textbox = textbox
+    """Builds up one line of a MessageLog out of differently tagged pieces of text"""
+
+    def __init__(self, log: Optional['MessageLog'] = None):
+        self.segments: List[Tuple[str, Optional[str]]] = []
+        self.log = log
 
     def text(self, msg, tag=None):
         self.segments.append((msg, tag))
@@ -14,16 +27,58 @@ class EventMessageBuilder:
         if not msg:
             msg = 'Player ' + str(player_id)
 
-        return self.text(msg, 'player_' + str(player_id))
+        return self.text(msg, player_tag(player_id))
 
     def insert(self):
+        """Adds the message to its log straight away. To add many messages at once, pass them to MessageLog.add."""
+        self.log.add([self])
+
+
+class MessageLog:
+    """A read-only Text box holding the most recent `max_lines` messages.
+
+    Messages are added in batches, so the box is only unlocked, trimmed and scrolled once however many messages
+    arrive at a time."""
+
+    def __init__(self, textbox: tkinter.Text, max_lines: int = DEFAULT_MAX_LINES):
+        self.textbox = textbox
+        self.max_lines = max_lines
+        self.lines = 0
+
+    def configure_tag(self, tag: str, **options):
+        """Tags are configured once on the box, not per message"""
+        self.textbox.tag_configure(tag, **options)
+
+    def message(self) -> EventMessageBuilder:
+        return EventMessageBuilder(self)
+
+    def add(self, messages: Iterable[EventMessageBuilder]):
+        arguments = []
+        added = 0
+        for message in messages:
+            for text, tag in message.segments:
+                arguments.append(text)
+                arguments.append(tag or ())
+            arguments.append('\n')
+            arguments.append(())
+            added += 1
+        if not added:
+            return
+
         # Tkinter text boxes cannot be written to when disabled, even programmatically
         self.textbox.config(state=tkinter.NORMAL)
 
-        for text, tag in self.segments:
-            self.textbox.insert(tkinter.END, text, tag)
+        self.textbox.insert(tkinter.END, *arguments)
+        self.lines += added
+        if self.lines > self.max_lines:
+            self.textbox.delete('1.0', f'{self.lines - self.max_lines + 1}.0')
+            self.lines = self.max_lines
 
-        self.textbox.insert(tkinter.END, '\n')
         self.textbox.see(tkinter.END)
+        self.textbox.config(state=tkinter.DISABLED)
 
+    def clear(self):
+        self.textbox.config(state=tkinter.NORMAL)
+        self.textbox.delete('1.0', tkinter.END)
         self.textbox.config(state=tkinter.DISABLED)
+        self.lines = 0
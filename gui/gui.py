@@ -1,19 +1,24 @@
 import queue
 from tkinter import *
+from typing import Optional
 
 import game_events
-from catan import game, player
 from catan.player import ResourceSet, Resource
+from catan.snapshot import GameSnapshot, PlayerSnapshot
+from game_feed import GameFeed
 from gui.board import BoardFrame
 from gui.colors import PLAYER_COLORS
-from gui.event_message_builder import EventMessageBuilder
+from gui.event_message_builder import EventMessageBuilder, MessageLog, DEFAULT_MAX_LINES, player_tag
+
+# How often the GUI checks for a new state of the game to show
+REFRESH_MS = 50
 
 
 class App(Frame):
-    def __init__(self, game_queue: queue.Queue, command_queue: queue.Queue, master=None):
+    def __init__(self, game_feed: GameFeed, command_queue: queue.Queue, master=None):
         super().__init__(master)
         self.master = master
-        self.game_queue = game_queue
+        self.game_feed = game_feed
         self.command_queue = command_queue
         self.pack(fill=BOTH, expand=True)
 
@@ -38,34 +43,25 @@ class App(Frame):
 
         self.update()
 
-    def draw_game(self, game: game.Game):
-        self.board.draw_board(game.board)
-        self.game_info.update_game(game)
-        self.turn_counter.configure(text=str(game.turn_number))
+    def draw_game(self, snapshot: GameSnapshot):
+        self.board.draw_board(snapshot.board)
+        self.game_info.update_game(snapshot)
+        self.turn_counter.configure(text=str(snapshot.turn_number))
 
     def clear(self):
         self.board.clear()
 
     def update(self):
-        game_to_draw = None
-        try:
-            # We've likely missed multiple queue updates
-            while True:
-                # We might be getting a lot of games to draw during this update, let's only draw it once.
-                event = self.game_queue.get_nowait()
-                if isinstance(event, game_events.GameUpdateEvent):
-                    game_to_draw = event.game
-
-                self.game_info.show_event(event)
+        # Only the newest snapshot is kept, so however many turns were played since the last update, the game is only
+        # drawn once
+        snapshot, events, dropped = self.game_feed.take()
+        self.game_info.show_events(events, dropped)
 
-        except queue.Empty:
-            pass
+        if snapshot:
+            # The board only redraws what changed since the last frame
+            self.draw_game(snapshot)
 
-        if game_to_draw:
-            self.clear()
-            self.draw_game(game_to_draw)
-
-        self.after(50, self.update)
+        self.after(REFRESH_MS, self.update)
 
 
 class ControlPanel(Frame):
@@ -86,6 +82,21 @@ class ControlPanel(Frame):
         self.step = Button(self, text='Step', command=self.step)
         self.step.pack(fill=X)
 
+        self.turbo = Button(self, text='Turbo', command=self.turbo)
+        self.turbo.pack(fill=X)
+
+        self.skip_to_end = Button(self, text='Skip to end', command=self.skip_to_end)
+        self.skip_to_end.pack(fill=X)
+
+        run_turns = Frame(self)
+        run_turns.pack(fill=X)
+        self.turns_to_run = Spinbox(run_turns, from_=1, to=10000, width=6)
+        self.turns_to_run.delete(0, END)
+        self.turns_to_run.insert(0, '10')
+        self.turns_to_run.pack(side=LEFT)
+        self.run_turns = Button(run_turns, text='Run turns', command=self.run_turns)
+        self.run_turns.pack(side=LEFT, fill=X, expand=True)
+
     def start(self):
         self.command_queue.put(('start', None))
 
@@ -98,9 +109,23 @@ class ControlPanel(Frame):
     def step(self):
         self.command_queue.put(('step', None))
 
+    def turbo(self):
+        self.command_queue.put(('turbo', None))
+
+    def skip_to_end(self):
+        self.command_queue.put(('skip_to_end', None))
+
+    def run_turns(self):
+        try:
+            turns = int(self.turns_to_run.get())
+        except ValueError:
+            return
+        if turns > 0:
+            self.command_queue.put(('run_turns', turns))
+
 
 class GameInfo(Frame):
-    def __init__(self, master=None):
+    def __init__(self, master=None, max_lines: int = DEFAULT_MAX_LINES):
         super().__init__(master)
         self.master = master
         self.player_widgets = []
@@ -114,11 +139,13 @@ class GameInfo(Frame):
         self.messages = Text(self, state=DISABLED)
         self.messages.grid(column=0, row=0, sticky=W+E+N+S)
 
+        # Only the most recent messages are kept, so that long sessions don't slow down
+        self.log = MessageLog(self.messages, max_lines)
         for player_id, color in PLAYER_COLORS.items():
-            self.messages.tag_configure('player_' + str(player_id), foreground=color)
+            self.log.configure_tag(player_tag(player_id), foreground=color)
 
-    def update_game(self, game: game.Game):
-        num_players = len(game.players)
+    def update_game(self, snapshot: GameSnapshot):
+        num_players = len(snapshot.players)
         if len(self.player_widgets) != num_players:
             for i in range(num_players):
                 player = PlayerInfo(self.players_frame)
@@ -126,18 +153,31 @@ class GameInfo(Frame):
                 self.player_widgets.append(player)
 
         for i in range(num_players):
-            game_player = game.players[i]
-            widget = self.player_widgets[i]
-            widget.update_player(game, game_player)
+            self.player_widgets[i].update_player(snapshot.players[i])
 
     def build_message(self) -> EventMessageBuilder:
-        return EventMessageBuilder(self.messages)
+        return self.log.message()
 
-    def show_event(self, event):
+    def message_for(self, event) -> Optional[EventMessageBuilder]:
         if isinstance(event, game_events.RollEvent):
-            self.build_message().player(event.player_id).text(f' rolled {event.roll}').insert()
+            return self.build_message().player(event.player_id).text(f' rolled {event.roll}')
         elif isinstance(event, game_events.PlayedMoveEvent):
-            self.build_message().player(event.player_id).text(f' {event.move}').insert()
+            return self.build_message().player(event.player_id).text(f' {event.move}')
+        return None
+
+    def show_events(self, events, dropped: int = 0):
+        """Adds all of the events to the log in one go"""
+        messages = []
+        if dropped:
+            messages.append(self.build_message().text(f'({dropped} events skipped)'))
+        for event in events:
+            message = self.message_for(event)
+            if message:
+                messages.append(message)
+        self.log.add(messages)
+
+    def show_event(self, event):
+        self.show_events([event])
 
 
 class PlayerInfo(Frame):
@@ -159,13 +199,10 @@ class PlayerInfo(Frame):
         self.resources = ResourcesDisplay(self)
         self.resources.pack()
 
-    def update_player(self, game: game.Game, player: player.Player):
+    def update_player(self, player: PlayerSnapshot):
         self.name.configure(text=f'Player {player.id}', fg=PLAYER_COLORS[player.id])
-
-        vps = game.get_victory_points(player.id)
-        self.victory_points.config(text=f'VPs: {vps}')
-
-        self.resources.show(player.hand.resources)
+        self.victory_points.config(text=f'VPs: {player.victory_points}')
+        self.resources.show(player.resources)
 
 
 class ResourcesDisplay(Frame):
@@ -209,8 +246,8 @@ class ResourcesDisplay(Frame):
         self.wood.config(text=str(resources.get(Resource.WOOD, 0)))
 
 
-def start(game_queue: queue.Queue, command_queue: queue.Queue):
+def start(game_feed: GameFeed, command_queue: queue.Queue):
     root = Tk()
     root.geometry('1800x1000')
-    app = App(game_queue, command_queue, master=root)
+    app = App(game_feed, command_queue, master=root)
     app.mainloop()
@@ -1,10 +1,82 @@
+import itertools
 import math
-from dataclasses import dataclass
-from typing import Tuple, List, Iterable
+import threading
+from collections import defaultdict
+from typing import Tuple, List, Iterable, Dict
 
 
-@dataclass(eq=True, frozen=True)
-class HexCoord:
+class _InternedCoord:
+    """Base for the coordinate types, which are immutable and interned.
+
+    Constructing a coordinate always hands back the one shared instance for those values, so equality is identity
+    and derived results (normalized forms, neighbors, ...) can be cached on the instance the first time they're
+    asked for. Every instance also gets a small integer `id`, dense per coordinate type, for use as an array index.
+
+    Interned coordinates live for the lifetime of the process.
+    """
+    __slots__ = ('id', '_hash')
+    _fields: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._interned = {}
+        cls._ids = itertools.count()
+
+    def __new__(cls, *values):
+        coord = cls._interned.get(values)
+        if coord is not None:
+            return coord
+
+        with _intern_lock:
+            coord = cls._interned.get(values)
+            if coord is None:
+                coord = object.__new__(cls)
+                for name, value in zip(cls._fields, values):
+                    object.__setattr__(coord, name, value)
+                for name in cls.__slots__:
+                    if name.startswith('_cached'):
+                        object.__setattr__(coord, name, None)
+                # Hashes match what the equivalent tuple (and the dataclasses these used to be) would give, so that
+                # set and dict ordering stays reproducible between runs
+                object.__setattr__(coord, '_hash', hash(values))
+                object.__setattr__(coord, 'id', next(cls._ids))
+                cls._interned[values] = coord
+        return coord
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return type(self), self._values()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in zip(self._fields, self._values()))
+        return f'{type(self).__name__}({fields})'
+
+    def _cache(self, name, value):
+        object.__setattr__(self, name, value)
+        return value
+
+
+_intern_lock = threading.Lock()
+
+
+class HexCoord(_InternedCoord):
     """Represents a the coordinates for a Hexagon in an infinitely tiling hexagon-space.
 
     "q" and "r" are close equivalents to "x" and "y", but unlike on the familiar cartesian plane,
@@ -16,21 +88,28 @@ class HexCoord:
 
     Negative q and r values are permitted.
     """
+    __slots__ = ('q', 'r', '_cached_adjacent', '_cached_vertices', '_cached_edges')
+    _fields = ('q', 'r')
     q: int
     r: int
 
+    def __new__(cls, q: int, r: int):
+        return super().__new__(cls, q, r)
+
     def shared_edge(self, other: 'HexCoord'):
         pass
 
-    def adjacent(self) -> Iterable['HexCoord']:
+    def adjacent(self) -> Tuple['HexCoord', ...]:
         """Provides the six hexagons that touch this hexagon"""
-        for i in range(6):
-            yield self.through_side(i)
+        if self._cached_adjacent is None:
+            return self._cache('_cached_adjacent', tuple(self.add(HEX_SIDE_OFFSETS[i]) for i in range(6)))
+        return self._cached_adjacent
 
-    def vertices(self) -> Iterable['VertexCoord']:
+    def vertices(self) -> Tuple['VertexCoord', ...]:
         """Provides the six corners of this hexagon"""
-        for i in range(6):
-            yield VertexCoord(self, i).normalize()
+        if self._cached_vertices is None:
+            return self._cache('_cached_vertices', tuple(VertexCoord(self, i).normalize() for i in range(6)))
+        return self._cached_vertices
 
     def add(self, other: 'HexCoord'):
         """Shifts these coordinates by the coordinates of another hexagon"""
@@ -38,15 +117,16 @@ class HexCoord:
 
     def through_side(self, side: int) -> 'HexCoord':
         """Provides the hexagon on the "other side" of a given edge"""
-        return self.add(HEX_SIDE_OFFSETS[side])
+        return self.adjacent()[side % 6]
 
     def edge(self, side: int) -> 'EdgeCoord':
         """Provides the coordinates of a particular edge on this hexagon (shared with one other hexagon)"""
         return EdgeCoord(self, side).normalize()
 
-    def edges(self) -> Iterable['EdgeCoord']:
-        for i in range(6):
-            yield EdgeCoord(self, i).normalize()
+    def edges(self) -> Tuple['EdgeCoord', ...]:
+        if self._cached_edges is None:
+            return self._cache('_cached_edges', tuple(EdgeCoord(self, i).normalize() for i in range(6)))
+        return self._cached_edges
 
 
 HEX_SIDE_OFFSETS = {
@@ -59,15 +139,19 @@ HEX_SIDE_OFFSETS = {
 }
 
 
-@dataclass(eq=True, frozen=True)
-class VertexCoord:
+class VertexCoord(_InternedCoord):
     """Represents the coordinates of a single 'corner' of a hexagon in hexagon-space.
 
     Every vertex is shared by three hexagons. The VertexCoord can be normalized to
     decide which hexagon it "belongs" to for the purposes of identification."""
+    __slots__ = ('tile', 'vertex', '_cached_normalized', '_cached_edges')
+    _fields = ('tile', 'vertex')
     tile: HexCoord
     vertex: int
 
+    def __new__(cls, tile: HexCoord, vertex: int):
+        return super().__new__(cls, tile, vertex)
+
     def pos(self, center: Tuple[float, float], radius: float) -> Tuple[float, float]:
         return pixel_corner(center, radius, self.vertex)
 
@@ -78,52 +162,65 @@ class VertexCoord:
         This is because a hexagon has six vertices, but each vertex is shared by three hexagons. 6 / 3 = 2 unique
         vertices per hexagon.
         """
+        if self._cached_normalized is not None:
+            return self._cached_normalized
 
         vertex = self.vertex % 6
         if vertex == 2:
-            return VertexCoord(self.tile.through_side(2), 0)
+            normalized = VertexCoord(self.tile.through_side(2), 0)
         elif vertex == 3:
-            return VertexCoord(self.tile.through_side(3), 1)
+            normalized = VertexCoord(self.tile.through_side(3), 1)
         elif vertex == 4:
-            return VertexCoord(self.tile.through_side(3), 0)
+            normalized = VertexCoord(self.tile.through_side(3), 0)
         elif vertex == 5:
-            return VertexCoord(self.tile.through_side(4), 1)
+            normalized = VertexCoord(self.tile.through_side(4), 1)
         else:
-            return VertexCoord(self.tile, vertex)
+            normalized = VertexCoord(self.tile, vertex)
+        return self._cache('_cached_normalized', normalized)
 
-    def edges(self) -> List['EdgeCoord']:
+    def edges(self) -> Tuple['EdgeCoord', ...]:
         """Provides the three edges that lead away from this corner"""
+        if self._cached_edges is not None:
+            return self._cached_edges
+
         us = self.normalize()
         if us.vertex == 0:
-            return [
+            edges = (
                 us.tile.edge(0),
                 us.tile.edge(5),
                 us.tile.through_side(0).edge(4)
-            ]
-        elif us.vertex == 1:
-            return [
+            )
+        else:
+            edges = (
                 us.tile.edge(0),
                 us.tile.edge(1),
                 us.tile.through_side(0).edge(2)
-            ]
+            )
+        return self._cache('_cached_edges', edges)
 
 
-@dataclass(eq=True, frozen=True)
-class EdgeCoord:
+class EdgeCoord(_InternedCoord):
     """Represents the coordinates of a single 'edge' of a hexagon in hexagon-space.
 
     Each edge belongs to two hexagons. An EdgeCoord can be normalized to decide which of the two hexagons
     it "belongs" to for the purposes of identification.
     """
+    __slots__ = ('tile', 'edge', '_cached_normalized', '_cached_vertices')
+    _fields = ('tile', 'edge')
     tile: HexCoord
     edge: int
 
-    def vertices(self) -> List[VertexCoord]:
+    def __new__(cls, tile: HexCoord, edge: int):
+        return super().__new__(cls, tile, edge)
+
+    def vertices(self) -> Tuple[VertexCoord, ...]:
         """Provides the two vertices that are on either end of this edge."""
-        return [
-            VertexCoord(self.tile, self.edge).normalize(),
-            VertexCoord(self.tile, self.edge + 1).normalize()
-        ]
+        if self._cached_vertices is None:
+            return self._cache('_cached_vertices', (
+                VertexCoord(self.tile, self.edge).normalize(),
+                VertexCoord(self.tile, self.edge + 1).normalize()
+            ))
+        return self._cached_vertices
 
     def swap_side(self) -> 'EdgeCoord':
         """Provides a (likely denormalized) alternative view of the edge which "belongs" to the hexagon on the other
@@ -137,17 +234,115 @@ class EdgeCoord:
 
         When addressing edges, the hexagon only "owns" edges 0, 1, and 2. This is because a hexagon has six edges and
         every edge is shared by two hexagons. 6 / 2 = 3 unique edges per hexagon"""
+        if self._cached_normalized is not None:
+            return self._cached_normalized
+
         edge = self.edge % 6
-        owned_edges = [0, 1, 2]
-        if edge in owned_edges:
-            return EdgeCoord(self.tile, edge)
+        if edge < 3:
+            normalized = EdgeCoord(self.tile, edge)
         else:
-            return EdgeCoord(self.tile, edge).swap_side()
+            normalized = EdgeCoord(self.tile, edge).swap_side()
+        return self._cache('_cached_normalized', normalized)
 
     def between_hexes(self) -> List[HexCoord]:
         return [self.tile, self.swap_side().tile]
 
 
+class BoardTopology:
+    """Precomputed adjacency between the hexagons, vertices and edges of a fixed set of hexagons.
+
+    Walking the coordinate types directly allocates and normalizes new coordinates on every call. For a board whose
+    layout doesn't change, the answers are the same every time, so they are computed once here and handed out as
+    tuples. Only the hexagons passed in are considered "on the board" when reporting the hexes touching a vertex
+    or edge.
+
+    Coordinates that aren't part of the board are still answered correctly, just without the benefit of the index.
+    """
+
+    def __init__(self, hexes: Iterable[HexCoord]):
+        self.hexes = frozenset(hexes)
+
+        self._hex_vertices: Dict[HexCoord, Tuple[VertexCoord, ...]] = {}
+        self._vertex_hexes: Dict[VertexCoord, List[HexCoord]] = defaultdict(list)
+        for hex in self.hexes:
+            vertices = tuple(hex.vertices())
+            self._hex_vertices[hex] = vertices
+            for vertex in vertices:
+                self._vertex_hexes[vertex].append(hex)
+
+        self._vertex_edges: Dict[VertexCoord, Tuple[EdgeCoord, ...]] = {}
+        self._vertex_neighbors: Dict[VertexCoord, Tuple[VertexCoord, ...]] = {}
+        self._edge_vertices: Dict[EdgeCoord, Tuple[VertexCoord, ...]] = {}
+        self._edge_hexes: Dict[EdgeCoord, Tuple[HexCoord, ...]] = {}
+        for vertex in self._vertex_hexes:
+            edges = tuple(vertex.edges())
+            self._vertex_edges[vertex] = edges
+            for edge in edges:
+                if edge not in self._edge_vertices:
+                    self._edge_vertices[edge] = tuple(edge.vertices())
+                    self._edge_hexes[edge] = self._hexes_on_board(edge.between_hexes())
+
+            self._vertex_neighbors[vertex] = tuple(
+                other for edge in edges for other in self._edge_vertices[edge] if other != vertex
+            )
+
+        self._vertex_hexes = {vertex: tuple(hexes) for vertex, hexes in self._vertex_hexes.items()}
+
+    def _hexes_on_board(self, hexes: Iterable[HexCoord]) -> Tuple[HexCoord, ...]:
+        return tuple(hex for hex in hexes if hex in self.hexes)
+
+    @property
+    def vertices(self) -> Iterable[VertexCoord]:
+        """Every vertex touching at least one hexagon on the board"""
+        return self._vertex_hexes.keys()
+
+    @property
+    def edges(self) -> Iterable[EdgeCoord]:
+        """Every edge leading away from a vertex on the board"""
+        return self._edge_vertices.keys()
+
+    def hex_vertices(self, hex: HexCoord) -> Tuple[VertexCoord, ...]:
+        vertices = self._hex_vertices.get(hex)
+        if vertices is None:
+            return tuple(hex.vertices())
+        return vertices
+
+    def vertex_edges(self, vertex: VertexCoord) -> Tuple[EdgeCoord, ...]:
+        edges = self._vertex_edges.get(vertex)
+        if edges is None:
+            return tuple(vertex.edges())
+        return edges
+
+    def vertex_neighbors(self, vertex: VertexCoord) -> Tuple[VertexCoord, ...]:
+        """The vertices one edge away from this vertex"""
+        neighbors = self._vertex_neighbors.get(vertex)
+        if neighbors is None:
+            vertex = vertex.normalize()
+            return tuple(other for edge in vertex.edges() for other in edge.vertices() if other != vertex)
+        return neighbors
+
+    def vertex_hexes(self, vertex: VertexCoord) -> Tuple[HexCoord, ...]:
+        """The hexagons on the board that this vertex is a corner of"""
+        hexes = self._vertex_hexes.get(vertex)
+        if hexes is None:
+            # Every corner of every hexagon is indexed, so this is either denormalized or off the board
+            return self._vertex_hexes.get(vertex.normalize(), ())
+        return hexes
+
+    def edge_vertices(self, edge: EdgeCoord) -> Tuple[VertexCoord, ...]:
+        vertices = self._edge_vertices.get(edge)
+        if vertices is None:
+            return tuple(edge.vertices())
+        return vertices
+
+    def edge_hexes(self, edge: EdgeCoord) -> Tuple[HexCoord, ...]:
+        """The hexagons on the board on either side of this edge"""
+        hexes = self._edge_hexes.get(edge)
+        if hexes is None:
+            return self._hexes_on_board(edge.between_hexes())
+        return hexes
+
+
 def hex_distance(coord_a: HexCoord, coord_b: HexCoord) -> int:
     a_q = coord_a[0]
     a_r = coord_a[1]
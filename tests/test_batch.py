@@ -0,0 +1,157 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from catan import game
+from catan.batch import *
+from catan.longest_road import LongestRoadTracker, LONGEST_ROAD_POINTS, MIN_LENGTH
+from agents.agents import MCTSAgent
+
+LINEUP = [RandomAgent, RandomAgent, InformedRandomAgent, InformedRandomAgent]
+
+
+@pytest.fixture(scope='module')
+def batch():
+    batch = BatchGames.new(20, LINEUP, seed=3)
+    for _ in range(80):
+        batch.tick()
+    return batch
+
+
+class TestBatchGames:
+    def test_layout_matches_standard_board(self, batch):
+        assert (batch.layout.num_hexes, batch.layout.num_vertices, batch.layout.num_edges) == (37, 96, 132)
+
+    def test_legality_matches_board(self, batch):
+        rows = np.arange(batch.num_games)
+        for player in range(batch.num_players):
+            settlement_mask = batch.settlement_mask(rows, player)
+            road_mask = batch.road_mask(rows, player)
+            for game_index in rows:
+                board = batch.board(game_index)
+                assert set(np.array(batch.layout.vertices)[settlement_mask[game_index]]) == \
+                    board.legal_builds.settlement_vertices(player)
+                assert set(np.array(batch.layout.edges)[road_mask[game_index]]) == \
+                    board.legal_builds.road_edges(player)
+
+    def test_victory_points_and_payouts_match_board(self, batch):
+        for game_index in range(batch.num_games):
+            board = batch.board(game_index)
+            for player in range(batch.num_players):
+                longest_road = LONGEST_ROAD_POINTS if batch.longest_road[game_index] == player else 0
+                assert batch.victory_points[game_index, player] == board.victory_points(player) + longest_road
+
+            for roll in range(2, 13):
+                expected = np.zeros((batch.num_players, len(RESOURCES)))
+                for payout in board.payouts_for_roll(roll):
+                    expected[payout.owner, RESOURCES.index(payout.resource)] += payout.amount
+                assert (batch.income[game_index, roll] == expected).all()
+
+    def test_hands_never_go_negative(self, batch):
+        assert (batch.hands >= 0).all()
+
+    def test_round_trips_boards(self):
+        random.seed(0)
+        boards = [game_setup.new_board_started() for _ in range(3)]
+        batch = BatchGames.from_boards(boards, LINEUP)
+
+        for i, board in enumerate(boards):
+            rebuilt = batch.board(i)
+            assert {v: s.owner for v, s in rebuilt.settlements.items()} == \
+                {v: s.owner for v, s in board.settlements.items()}
+            assert {e: r.owner for e, r in rebuilt.roads.items()} == {e: r.owner for e, r in board.roads.items()}
+            assert {h: (t.type, t.number) for h, t in rebuilt.tiles.items()} == \
+                {h: (t.type, t.number) for h, t in board.tiles.items()}
+
+    def test_players_run_out_of_roads(self):
+        random.seed(0)
+        board = game_setup.new_board_started()
+        while board.legal_builds.road_edges(0):
+            board.add_road(Road(0, sorted(board.legal_builds.road_edges(0), key=repr)[0]))
+        batch = BatchGames.from_boards([board], LINEUP)
+        rows = np.arange(1)
+
+        assert board.road_count(0) == batch.road_counts[0, 0] == MAX_ROADS
+        assert not batch.road_mask(rows, 0).any()
+        assert not batch._road_legal_at(rows, np.arange(1), 0, free=True).any()
+        assert batch.road_mask(rows, 1).any()
+
+    def test_finds_the_same_longest_roads_as_the_tracker(self, batch):
+        assert (batch.longest_road >= 0).any()
+        for game_index in range(batch.num_games):
+            tracker = LongestRoadTracker(batch.board(game_index))
+            for player in range(batch.num_players):
+                assert batch._longest_road_in(game_index, player) == tracker.recount(player)
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_longest_road_changes_hands_as_in_a_game(self, seed):
+        random.seed(seed)
+        board = game_setup.new_board_started()
+        tracker = LongestRoadTracker(board)
+        board.add_listener(tracker)
+        batch = BatchGames.from_boards([board], LINEUP, seed=seed)
+        rows = np.arange(1)
+
+        holders = set()
+        for step in range(120):
+            player = step % batch.num_players
+            if random.random() < 0.2:
+                vertices, found = batch._choose(batch.settlement_mask(rows, player))
+                if found[0]:
+                    batch._build_settlements(rows, vertices, player)
+                    board.add_settlement(Settlement(player, batch.layout.vertices[vertices[0]]))
+            edges, found = batch._choose(batch.road_mask(rows, player))
+            if found[0]:
+                batch._build_roads(rows, edges, player)
+                batch._roads_built(rows, edges, player)
+                board.add_road(Road(player, batch.layout.edges[edges[0]]))
+
+            holder = batch.longest_road[0]
+            assert (None if holder < 0 else holder) == tracker.holder
+            for seat in range(batch.num_players):
+                assert batch.victory_points[0, seat] == board.victory_points(seat) + tracker.points(seat)
+            holders.add(tracker.holder)
+        assert holders - {None}
+
+    def test_boards_start_with_the_longest_road_awarded(self):
+        random.seed(0)
+        board = game_setup.new_board_started()
+        for _ in range(MIN_LENGTH):
+            board.add_road(Road(1, sorted(board.legal_builds.road_edges(1), key=repr)[0]))
+        tracker = LongestRoadTracker(board)
+        assert tracker.holder == 1
+
+        batch = BatchGames.from_boards([board], LINEUP)
+        assert batch.longest_road[0] == 1
+        assert batch.victory_points[0, 1] == board.victory_points(1) + LONGEST_ROAD_POINTS
+
+    def test_closing_a_loop_counts_every_road(self):
+        random.seed(0)
+        board = game_setup.new_board()
+        for side in range(5):
+            board.add_road(Road(0, HexCoord(0, 0).edge(side)), free_placement=True)
+            board.add_road(Road(1, HexCoord(2, 0).edge(side)), free_placement=True)
+        batch = BatchGames.from_boards([board], LINEUP)
+        rows = np.arange(1)
+        assert batch.longest_road[0] == -1
+
+        edges = np.array([batch.layout.edge_index[HexCoord(0, 0).edge(5)]])
+        batch._build_roads(rows, edges, 0)
+        batch._roads_built(rows, edges, 0)
+        assert batch.road_lengths[0, 0] == 6
+        assert batch.longest_road[0] == 0
+
+    def test_runs_to_completion(self):
+        result = run_batch(LINEUP, 50, seed=0)
+
+        assert (result.winners >= 0).all()
+        assert result.turns.min() > 0
+        # The informed agents should win far more often than the random ones
+        rates = result.seat_win_rates(4)
+        assert rates[2] + rates[3] > rates[0] + rates[1]
+
+    def test_rejects_agents_it_has_no_policy_for(self):
+        with pytest.raises(ValueError, match='MCTSAgent'):
+            run_batch([MCTSAgent, RandomAgent, RandomAgent, RandomAgent], 2, seed=0)
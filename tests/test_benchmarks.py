@@ -0,0 +1,56 @@
+import pytest
+from benchmarks.suite import *
+
+
+class TestBenchmarks:
+    @pytest.mark.parametrize(
+        'name', ['can_build_settlement', 'legal_sets', 'legal_moves', 'longest_road/5_roads', 'hand_arithmetic',
+                 'new_board_started'])
+    def test_benchmarks_do_repeatable_work(self, name):
+        first = run_benchmark(name, repeat=1)
+        second = run_benchmark(name, repeat=1)
+
+        assert first.skipped is None
+        assert first.ops == second.ops > 0
+        assert first.ops_per_second > 0
+
+    def test_results_round_trip_through_json(self, tmp_path):
+        results = [BenchmarkResult('fast', 100, 0.5), BenchmarkResult('gui', skipped='no display')]
+        save_results(results, str(tmp_path / 'results.json'))
+
+        loaded = load_results(str(tmp_path / 'results.json'))
+        assert loaded == {result.name: result for result in results}
+
+
+class TestCompare:
+    def test_flags_only_slowdowns_beyond_the_tolerance(self):
+        baseline = {
+            'same': BenchmarkResult('same', 100, 1.0),
+            'slower': BenchmarkResult('slower', 100, 1.0),
+            'faster': BenchmarkResult('faster', 100, 1.0),
+        }
+        current = {
+            'same': BenchmarkResult('same', 100, 1.1),
+            'slower': BenchmarkResult('slower', 100, 2.0),
+            'faster': BenchmarkResult('faster', 100, 0.5),
+        }
+        comparisons = compare(baseline, current)
+
+        assert [c.name for c in comparisons if c.is_regression(DEFAULT_TOLERANCE)] == ['slower']
+        report, regressed = format_comparisons(comparisons, DEFAULT_TOLERANCE)
+        assert regressed
+        assert 'REGRESSION' in report
+
+    def test_fails_benchmarks_that_went_missing(self):
+        baseline = {
+            'gui': BenchmarkResult('gui', 10, 1.0),
+            'gone': BenchmarkResult('gone', 10, 1.0),
+            'never_ran': BenchmarkResult('never_ran', skipped='no display'),
+        }
+        current = {'gui': BenchmarkResult('gui', skipped='no display')}
+
+        comparisons = compare(baseline, current)
+        assert [(c.name, c.missing) for c in comparisons] == [('gui', 'skipped: no display'), ('gone', 'missing')]
+        report, regressed = format_comparisons(comparisons, DEFAULT_TOLERANCE)
+        assert regressed
+        assert report.count('MISSING') == 2
@@ -1,11 +1,245 @@
+import random
+
 import pytest
 from catan.board import *
+from catan.bitboard import BitboardBoard
+
+
+@pytest.fixture(params=[Board, BitboardBoard])
+def board(request):
+    board = request.param()
+    for q in range(-2, 3):
+        for r in range(-2, 3):
+            coords = HexCoord(q, r)
+            board.tiles[coords] = Tile(coords, TileType.WHEAT, 6)
+    return board
 
 
-@pytest.fixture()
-def board():
-    pass
+ORIGIN = HexCoord(0, 0)
 
 
 class TestBoard:
-    pass
+    def test_settlements_need_a_road_unless_placed_freely(self, board):
+        settlement = Settlement(0, VertexCoord(ORIGIN, 0))
+        assert not board.can_build_settlement(settlement)
+        assert board.can_build_settlement(settlement, allow_free_placement=True)
+
+    def test_settlements_cannot_be_adjacent(self, board):
+        board.add_settlement(Settlement(0, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
+
+        neighbor = VertexCoord(ORIGIN, 1)
+        assert not board.can_build_settlement(Settlement(1, neighbor), allow_free_placement=True)
+        assert board.can_build_settlement(Settlement(1, VertexCoord(ORIGIN, 2).normalize()), allow_free_placement=True)
+
+    def test_occupied_vertex_raises(self, board):
+        board.add_settlement(Settlement(0, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
+        with pytest.raises(IllegalMoveError):
+            board.add_settlement(Settlement(1, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
+
+    def test_settlement_on_own_road(self, board):
+        board.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+
+        assert board.can_build_settlement(Settlement(0, VertexCoord(ORIGIN, 0)))
+        assert not board.can_build_settlement(Settlement(1, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
+
+    def test_roads_must_connect_to_own_roads(self, board):
+        board.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+
+        assert board.can_build_road(Road(0, ORIGIN.edge(1)))
+        assert not board.can_build_road(Road(1, ORIGIN.edge(1)))
+        assert not board.can_build_road(Road(0, ORIGIN.edge(3)))
+        assert not board.can_build_road(Road(1, ORIGIN.edge(0)), free_placement=True)
+
+    def test_roads_cannot_touch_enemy_settlements(self, board):
+        board.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+        board.add_settlement(Settlement(1, VertexCoord(ORIGIN, 2).normalize()), allow_free_placement=True)
+
+        assert not board.can_build_road(Road(0, ORIGIN.edge(1)))
+        assert board.can_build_road(Road(0, ORIGIN.edge(5)))
+
+    def test_roads_need_land(self, board):
+        sea = HexCoord(10, 10)
+        assert not board.can_build_road(Road(0, sea.edge(0)), free_placement=True)
+        assert board.can_build_road(Road(0, HexCoord(2, 2).edge(0)), free_placement=True)
+
+    def test_players_run_out_of_roads(self, board):
+        edges = [edge for edge in board.topology.edges if board.topology.edge_hexes(edge)]
+        board.add_road(Road(0, edges[0]), free_placement=True)
+        # Keep the legal build sets up to date as the roads go down
+        assert board.legal_builds.road_edges(0)
+        for edge in edges[1:]:
+            if board.road_count(0) < MAX_ROADS and board.can_build_road(Road(0, edge), free_placement=True):
+                board.add_road(Road(0, edge), free_placement=True)
+
+        assert board.road_count(0) == MAX_ROADS
+        assert not any(board.can_build_road(Road(0, edge), free_placement=True) for edge in edges)
+        assert board.buildable_road_edges(0) == []
+        assert not board.legal_builds.road_edges(0)
+        assert board.can_build_road(Road(1, edges[-1]), free_placement=True)
+
+        board.remove_road(edges[0])
+        assert board.road_count(0) == MAX_ROADS - 1
+        assert board.legal_builds.road_edges(0) == set(board.buildable_road_edges(0)) != set()
+
+    def test_payouts_for_roll(self, board):
+        board.add_tile(Tile(HexCoord(1, 0), TileType.STONE, 8))
+        board.add_tile(Tile(HexCoord(0, 1), TileType.DESERT, None))
+        # Corner 1 of the origin touches the origin, (1, 0) and (0, 1)
+        board.add_settlement(Settlement(0, VertexCoord(ORIGIN, 1)), allow_free_placement=True)
+
+        assert board.payouts_for_roll(6) == [Payout(0, Resource.WHEAT, 1)]
+        assert board.payouts_for_roll(8) == [Payout(0, Resource.STONE, 1)]
+        assert not board.payouts_for_roll(5)
+
+        board.upgrade_settlement(VertexCoord(ORIGIN, 1))
+        assert board.payouts_for_roll(6) == [Payout(0, Resource.WHEAT, 2)]
+        assert board.payouts_for_roll(8) == [Payout(0, Resource.STONE, 2)]
+
+    def test_victory_points(self, board):
+        board.add_settlement(Settlement(0, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
+        board.add_settlement(Settlement(0, VertexCoord(HexCoord(2, 2), 0)), allow_free_placement=True)
+        board.upgrade_settlement(VertexCoord(ORIGIN, 0))
+
+        assert board.victory_points(0) == 3
+        assert board.victory_points(1) == 0
+        assert board.count_victory_points(0) == 3
+
+    def test_cities_placed_directly_are_worth_two(self, board):
+        board.add_settlement(Settlement(0, VertexCoord(ORIGIN, 0), is_city=True), allow_free_placement=True)
+
+        assert board.victory_points(0) == board.count_victory_points(0) == 2
+        assert board.payouts_for_roll(6) == [Payout(0, Resource.WHEAT, 2)] * 3
+
+
+class TestLegalBuildTracker:
+    def test_matches_full_recheck_as_board_changes(self, board):
+        rng = random.Random(0)
+        tracker = board.legal_builds
+        for player_id in range(3):
+            # Start tracking before anything is built, so every later change must be applied incrementally
+            tracker.settlement_vertices(player_id)
+            tracker.road_edges(player_id)
+
+        vertices = list(board.topology.vertices)
+        edges = list(board.topology.edges)
+        for _ in range(200):
+            player_id = rng.randrange(3)
+            if rng.random() < 0.3:
+                settlement = Settlement(player_id, rng.choice(vertices))
+                if board.can_build_settlement(settlement, allow_free_placement=True):
+                    board.add_settlement(settlement, allow_free_placement=True)
+            else:
+                road = Road(player_id, rng.choice(edges))
+                if board.can_build_road(road, free_placement=True):
+                    board.add_road(road, free_placement=True)
+
+            for player_id in range(3):
+                assert tracker.settlement_vertices(player_id) == set(
+                    vertex for vertex in vertices if board.can_build_settlement(Settlement(player_id, vertex)))
+                assert tracker.road_edges(player_id) == set(
+                    edge for edge in edges if board.can_build_road(Road(player_id, edge)))
+
+
+class TestBoardClone:
+    def test_changes_do_not_leak_between_clones(self, board):
+        board.add_settlement(Settlement(0, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
+        clone = board.clone()
+
+        clone.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+        clone.upgrade_settlement(VertexCoord(ORIGIN, 0))
+        board.add_settlement(Settlement(1, VertexCoord(HexCoord(2, 2), 0)), allow_free_placement=True)
+
+        assert ORIGIN.edge(0) not in board.roads
+        assert not board.settlements[VertexCoord(ORIGIN, 0)].is_city
+        assert board.victory_points(0) == 1
+        assert clone.victory_points(0) == 2
+        assert VertexCoord(HexCoord(2, 2), 0) not in clone.settlements
+        assert clone.tiles is board.tiles
+
+    def test_clone_keeps_legal_build_tracking(self, board):
+        board.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+        before = set(board.legal_builds.road_edges(0))
+        clone = board.clone()
+        clone.add_road(Road(0, ORIGIN.edge(1)))
+
+        assert board.legal_builds.road_edges(0) == before
+        assert clone.legal_builds.road_edges(0) == set(
+            edge for edge in clone.topology.edges if clone.can_build_road(Road(0, edge)))
+
+    def test_removing_pieces_restores_indexes(self, board):
+        vertex = VertexCoord(ORIGIN, 1)
+        board.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+        settlement_vertices = set(board.legal_builds.settlement_vertices(0))
+        road_edges = set(board.legal_builds.road_edges(0))
+
+        board.add_settlement(Settlement(0, vertex))
+        board.upgrade_settlement(vertex)
+        board.add_road(Road(0, ORIGIN.edge(1)))
+        board.remove_road(ORIGIN.edge(1))
+        board.downgrade_settlement(vertex)
+        board.remove_settlement(vertex)
+
+        assert board.victory_points(0) == 0
+        assert not board.payouts_for_roll(6)
+        assert board.legal_builds.settlement_vertices(0) == settlement_vertices
+        assert board.legal_builds.road_edges(0) == road_edges
+
+
+class TestBitboardBoard:
+    def test_agrees_with_the_dict_board(self):
+        rng = random.Random(4)
+        boards = [Board(), BitboardBoard()]
+        for q in range(-2, 3):
+            for r in range(-2, 3):
+                for board in boards:
+                    board.add_tile(Tile(HexCoord(q, r), TileType.WHEAT, 6))
+        dict_board, bitboard = boards
+        # A clone shares its pieces until it changes them, so build on one to check it copies its masks
+        bitboard = bitboard.clone()
+
+        vertices = list(dict_board.topology.vertices)
+        edges = list(dict_board.topology.edges)
+        for _ in range(150):
+            player_id = rng.randrange(3)
+            free = rng.random() < 0.2
+            if rng.random() < 0.3:
+                piece = Settlement(player_id, rng.choice(vertices))
+                if dict_board.can_build_settlement(piece, free):
+                    for board in (dict_board, bitboard):
+                        board.add_settlement(piece, free)
+            else:
+                piece = Road(player_id, rng.choice(edges))
+                if dict_board.can_build_road(piece, free):
+                    for board in (dict_board, bitboard):
+                        board.add_road(piece, free)
+
+            for player_id in range(3):
+                for free in (False, True):
+                    assert [bitboard.can_build_settlement(Settlement(player_id, v), free) for v in vertices] == \
+                        [dict_board.can_build_settlement(Settlement(player_id, v), free) for v in vertices]
+                    assert [bitboard.can_build_road(Road(player_id, e), free) for e in edges] == \
+                        [dict_board.can_build_road(Road(player_id, e), free) for e in edges]
+                assert bitboard.buildable_settlement_vertices(player_id) == \
+                    dict_board.buildable_settlement_vertices(player_id)
+                assert bitboard.buildable_road_edges(player_id) == dict_board.buildable_road_edges(player_id)
+
+    def test_clones_stay_bitboards_with_their_own_masks(self):
+        board = BitboardBoard()
+        board.add_tile(Tile(ORIGIN, TileType.WHEAT, 6))
+        board.add_road(Road(0, ORIGIN.edge(0)), free_placement=True)
+        clone = board.clone()
+        clone.add_settlement(Settlement(1, VertexCoord(ORIGIN, 2).normalize()), allow_free_placement=True)
+
+        assert isinstance(clone, BitboardBoard)
+        assert not clone.can_build_road(Road(0, ORIGIN.edge(1)))
+        assert board.can_build_road(Road(0, ORIGIN.edge(1)))
+
+    def test_pieces_off_the_layout_fall_back_to_the_dict_rules(self):
+        board = BitboardBoard()
+        board.add_tile(Tile(ORIGIN, TileType.WHEAT, 6))
+        far_away = VertexCoord(HexCoord(5, 5), 0)
+        board.add_settlement(Settlement(0, far_away), allow_free_placement=True)
+        neighbor = board.topology.vertex_neighbors(far_away)[0]
+
+        assert not board.can_build_settlement(Settlement(1, neighbor), allow_free_placement=True)
+        assert board.can_build_settlement(Settlement(1, VertexCoord(ORIGIN, 0)), allow_free_placement=True)
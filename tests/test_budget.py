@@ -0,0 +1,203 @@
+import random
+import threading
+import time
+
+import pytest
+import game_setup
+from catan.game import *
+from catan.budget import *
+from catan.moves import *
+from agents.agents import Agent, InformedRandomAgent
+
+
+class SlowAgent(Agent):
+    """Exchanges with the bank, taking `delays[i]` seconds to decide on its i-th move of each turn"""
+
+    def __init__(self, *delays):
+        self.delays = delays
+        self.results = []
+
+    def play_turn(self):
+        for delay in self.delays:
+            time.sleep(delay)
+            result = yield ExchangeMove({Resource.WOOD: 4}, Resource.STONE)
+            self.results.append(result)
+
+    def would_accept_trade(self, offering, wants):
+        return False
+
+
+class BrokenAgent(SlowAgent):
+    def play_turn(self):
+        yield from super().play_turn()
+        raise KeyError('oops')
+
+
+class WatchingAgent(SlowAgent):
+    """Takes `delays[i]` seconds over its i-th turn, and remembers which game and RNG it could see at the end"""
+
+    def __init__(self, *delays):
+        super().__init__()
+        self.turn_delays = list(delays)
+        self.seen = []
+
+    def play_turn(self):
+        time.sleep(self.turn_delays.pop(0))
+        self.seen.append((self.game, self.rng))
+        yield ExchangeMove({Resource.WOOD: 4}, Resource.STONE)
+
+
+class SlowTrader(SlowAgent):
+    """Accepts every trade, taking `delay` seconds to answer, and remembers which threads it answered in"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.threads = []
+
+    def would_accept_trade(self, offering, wants):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(self.delay)
+        return True
+
+
+def new_game(agent, budget):
+    random.seed(3)
+    agents = {0: agent, 1: InformedRandomAgent()}
+    the_game = Game(game_setup.new_board_started(2), agents, budget=budget)
+    the_game.players[0].hand.add_resources({Resource.WOOD: 40})
+    return the_game
+
+
+def stones(the_game):
+    return the_game.players[0].hand.resources.get(Resource.STONE, 0)
+
+
+class TestTimeBudget:
+    def test_agents_within_budget_play_normally(self):
+        agent = SlowAgent(0, 0)
+        the_game = new_game(agent, TimeBudget(per_move=1, per_turn=2))
+        before = stones(the_game)
+        the_game.tick(the_game.agents)
+        the_game.close()
+
+        assert stones(the_game) == before + 2
+        usage = the_game.budget_usage[0]
+        assert (usage.turns, usage.moves, usage.overruns) == (1, 2, 0)
+
+    def test_forfeit_ends_the_turn(self):
+        agent = SlowAgent(0, 0.3, 0)
+        the_game = new_game(agent, TimeBudget(per_move=0.1, policy=OverrunPolicy.FORFEIT_TURN))
+        before = stones(the_game)
+        the_game.tick(the_game.agents)
+        the_game.close()
+
+        assert stones(the_game) == before + 1
+        assert the_game.budget_usage[0].move_overruns == 1
+        assert not the_game.budget_usage[0].disqualified
+
+    def test_skip_turns_down_only_the_late_move(self):
+        agent = SlowAgent(0, 0.2, 0)
+        the_game = new_game(agent, TimeBudget(per_move=0.1, per_turn=2, policy=OverrunPolicy.SKIP_MOVE))
+        before = stones(the_game)
+        the_game.tick(the_game.agents)
+        the_game.close()
+
+        assert stones(the_game) == before + 2
+        assert [result.successful for result in agent.results] == [True, False, True]
+        assert the_game.budget_usage[0].move_overruns == 1
+
+    def test_turn_budget(self):
+        agent = SlowAgent(0.1, 0.1, 0.1, 0.1)
+        the_game = new_game(agent, TimeBudget(per_turn=0.25, policy=OverrunPolicy.SKIP_MOVE))
+        before = stones(the_game)
+        the_game.tick(the_game.agents)
+        the_game.close()
+
+        assert stones(the_game) == before + 2
+        assert the_game.budget_usage[0].turn_overruns == 1
+
+    def test_disqualified_agents_stop_playing(self):
+        agent = SlowAgent(0.2)
+        the_game = new_game(agent, TimeBudget(per_move=0.1, policy=OverrunPolicy.DISQUALIFY))
+        before = stones(the_game)
+        for _ in range(3):
+            the_game.tick(the_game.agents)
+        the_game.close()
+
+        assert stones(the_game) == before
+        usage = the_game.budget_usage[0]
+        assert usage.disqualified
+        assert usage.turns == 1
+
+    def test_agents_that_run_over_are_left_with_copies(self):
+        agent = WatchingAgent(0.3, 0)
+        the_game = new_game(agent, TimeBudget(per_move=0.1))
+        hand = the_game.players[0].hand.vector
+        the_game.tick(the_game.agents)
+        the_game.tick(the_game.agents)
+        # Let the agent finish the turn it ran over on, so its next one is in time
+        time.sleep(0.4)
+        the_game.tick(the_game.agents)
+        the_game.close()
+
+        (late_game, late_rng), (next_game, next_rng) = agent.seen
+        assert late_game is not the_game
+        assert late_game.players[0].hand.vector == hand
+        assert late_game.board.roads == the_game.board.roads
+        assert late_rng is not random
+        # Everything is back to normal for the next turn
+        assert (next_game, next_rng) == (the_game, random)
+        assert 'rng' not in vars(agent)
+
+    def test_turns_given_up_on_before_they_start_are_never_played(self):
+        agent = WatchingAgent(0.5, 0, 0)
+        the_game = new_game(agent, TimeBudget(per_move=0.1))
+        # The agent's first turn runs over, and so does its second, since it's still thinking about the first
+        for _ in range(4):
+            the_game.tick(the_game.agents)
+        time.sleep(0.6)
+        the_game.tick(the_game.agents)
+        the_game.close()
+
+        # The second turn never started, so it never saw the real game in the middle of someone else's turn
+        (late_game, _), (next_game, next_rng) = agent.seen
+        assert late_game is not the_game
+        assert (next_game, next_rng) == (the_game, random)
+        assert the_game.budget_usage[0].turns == 3
+
+    def trade(self, trader):
+        the_game = Game(game_setup.new_board_started(2), {0: trader, 1: SlowAgent()}, budget=TimeBudget(per_move=0.1))
+        the_game.players[0].hand.add_resources({Resource.STONE: 1})
+        the_game.players[1].hand.add_resources({Resource.WOOD: 1})
+        start = time.monotonic()
+        result = the_game.do_move(1, ProposeTradeMove({Resource.WOOD: 1}, {Resource.STONE: 1}))
+        seconds = time.monotonic() - start
+        the_game.close()
+        return the_game, result, seconds
+
+    def test_agents_answer_trades_in_their_own_thread(self):
+        trader = SlowTrader(0)
+        the_game, result, _ = self.trade(trader)
+
+        assert result.successful
+        assert trader.threads == ['agent-0']
+        assert the_game.budget_usage[0].overruns == 0
+
+    def test_slow_answers_to_trades_are_turned_down(self):
+        trader = SlowTrader(0.5)
+        the_game, result, seconds = self.trade(trader)
+
+        assert not result.successful
+        assert seconds < 0.4
+        assert the_game.budget_usage[0].move_overruns == 1
+
+    def test_agent_errors_reach_the_game(self):
+        the_game = new_game(BrokenAgent(0), TimeBudget(per_move=1))
+        with pytest.raises(KeyError):
+            the_game.tick(the_game.agents)
+        the_game.close()
+
+    def test_skipping_needs_a_turn_budget(self):
+        with pytest.raises(ValueError):
+            TimeBudget(per_move=1, policy=OverrunPolicy.SKIP_MOVE)
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+import game_setup
+from catan.game import *
+from catan.moves import *
+from game_events import *
+from agents.agents import InformedRandomAgent
+
+
+@pytest.fixture()
+def the_game():
+    random.seed(1)
+    agents = {player_id: InformedRandomAgent() for player_id in range(4)}
+    return Game(game_setup.new_board_started(), agents)
+
+
+class TestEventBus:
+    def test_subscribers_only_get_the_types_they_asked_for(self):
+        bus = EventBus()
+        rolls, everything = [], []
+        bus.subscribe(rolls.append, RollEvent)
+        bus.subscribe(everything.append)
+
+        bus.publish(RollEvent(0, 5))
+        bus.publish(RoadBuiltEvent(1, None))
+
+        assert rolls == [RollEvent(0, 5)]
+        assert everything == [RollEvent(0, 5), RoadBuiltEvent(1, None)]
+
+    def test_unsubscribe(self):
+        bus = EventBus()
+        rolls = []
+        unsubscribe = bus.subscribe(rolls.append, RollEvent)
+        unsubscribe()
+        bus.publish(RollEvent(0, 5))
+
+        assert rolls == []
+        assert not bus.wants(RollEvent)
+
+    def test_watchers_are_told_about_the_first_subscriber(self):
+        bus = EventBus()
+        calls = []
+        bus.watch(RollEvent, lambda: calls.append('rolls'))
+        bus.subscribe(print, RoadBuiltEvent)
+        assert calls == []
+
+        bus.subscribe(print, RollEvent)
+        bus.subscribe(print, RollEvent)
+        assert calls == ['rolls']
+
+
+class TestGameEvents:
+    def test_board_changes(self, the_game):
+        events = []
+        the_game.events.subscribe(events.append, SettlementBuiltEvent, CityUpgradedEvent, RoadBuiltEvent)
+        the_game.players[0].hand.add_resources({resource: 10 for resource in Resource})
+
+        edge = next(iter(sorted(the_game.board.legal_builds.road_edges(0), key=repr)))
+        vertex = next(s.coords for s in the_game.board.settlements.values() if s.owner == 0)
+        assert the_game.do_move(0, BuildRoadMove(edge)).successful
+        assert the_game.do_move(0, UpgradeSettlementMove(vertex)).successful
+
+        assert events == [RoadBuiltEvent(0, edge), CityUpgradedEvent(0, vertex)]
+
+    def test_unmaking_moves_publishes_the_reverse_changes(self, the_game):
+        events = []
+        the_game.events.subscribe(events.append, RoadBuiltEvent, RoadRemovedEvent)
+        the_game.players[0].hand.add_resources({resource: 10 for resource in Resource})
+
+        edge = next(iter(sorted(the_game.board.legal_builds.road_edges(0), key=repr)))
+        the_game.make_move(0, BuildRoadMove(edge))
+        the_game.unmake_move()
+
+        assert events == [RoadBuiltEvent(0, edge), RoadRemovedEvent(0, edge)]
+
+    def test_resource_changes_add_up_to_the_hands(self, the_game):
+        totals = {player_id: {resource: 0 for resource in Resource} for player_id in the_game.players}
+
+        def add_change(event):
+            for resource, amount in event.change.items():
+                totals[event.player_id][resource] += amount
+        the_game.events.subscribe(add_change, ResourcesChangedEvent)
+
+        for _ in range(40):
+            the_game.tick(the_game.agents)
+
+        for player_id, player in the_game.players.items():
+            hand = player.hand.resources
+            assert totals[player_id] == {resource: hand.get(resource, 0) for resource in Resource}
+
+    def test_callback_still_only_gets_rolls_and_moves(self):
+        random.seed(1)
+        received = []
+        agents = {player_id: InformedRandomAgent() for player_id in range(4)}
+        the_game = Game(game_setup.new_board_started(), agents, received.append)
+        the_game.events.subscribe(lambda event: None)
+        for _ in range(20):
+            the_game.tick(agents)
+
+        assert received
+        assert {type(event) for event in received} <= {RollEvent, PlayedMoveEvent}
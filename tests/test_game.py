@@ -0,0 +1,154 @@
+import random
+
+import pytest
+import game_setup
+from catan.game import *
+from catan.moves import *
+from agents.agents import InformedRandomAgent
+
+
+@pytest.fixture()
+def the_game():
+    random.seed(1)
+    agents = {player_id: InformedRandomAgent() for player_id in range(4)}
+    the_game = Game(game_setup.new_board_started(), agents, debug=True)
+    for player in the_game.players.values():
+        player.hand.add_resources({resource: 10 for resource in Resource})
+    return the_game
+
+
+def snapshot(the_game):
+    board = the_game.board
+    return (
+        {coords: (s.owner, s.is_city) for coords, s in board.settlements.items()},
+        {coords: road.owner for coords, road in board.roads.items()},
+        {player_id: player.hand.resources for player_id, player in the_game.players.items()},
+        {roll: sorted(board.payouts_for_roll(roll), key=repr) for roll in range(2, 13)},
+        [the_game.get_victory_points(player_id) for player_id in the_game.players],
+    )
+
+
+class TestMakeUnmake:
+    def test_unmaking_every_move_restores_the_game(self, the_game):
+        before = snapshot(the_game)
+        board = the_game.board
+
+        made = 0
+        for _ in range(30):
+            player_id = random.randrange(4)
+            options = [BuildRoadMove(edge) for edge in board.legal_builds.road_edges(player_id)]
+            options += [BuildSettlementMove(v) for v in board.legal_builds.settlement_vertices(player_id)]
+            options += [UpgradeSettlementMove(s.coords) for s in board.settlements.values()
+                        if s.owner == player_id and not s.is_city]
+            options.append(ExchangeMove({Resource.WOOD: 4}, Resource.STONE))
+            if the_game.make_move(player_id, random.choice(options)).successful:
+                made += 1
+
+        assert made == len(the_game.journal) > 0
+        assert snapshot(the_game) != before
+
+        while the_game.journal:
+            the_game.unmake_move()
+
+        assert snapshot(the_game) == before
+
+
+class PlanningAgent(InformedRandomAgent):
+    """Plays the plans it is given, and remembers what it was sent back"""
+
+    def __init__(self, *plans):
+        self.plans = list(plans)
+        self.sent_back = []
+
+    def play_turn(self):
+        for plan in self.plans:
+            self.sent_back.append((yield plan))
+
+
+class TestMovePlan:
+    def plays(self, the_game, plan):
+        agent = PlanningAgent(plan)
+        the_game.agents[0] = agent
+        played = []
+        the_game.events.subscribe(lambda event: played.append(event.move), PlayedMoveEvent)
+        the_game.tick(the_game.agents)
+        return agent.sent_back, played
+
+    def test_every_move_is_played_in_order(self, the_game):
+        edges = sorted(the_game.board.legal_builds.road_edges(0), key=repr)[:1]
+        plan = MovePlan([BuildRoadMove(edges[0]), ExchangeMove({Resource.WOOD: 4}, Resource.STONE)])
+
+        sent_back, played = self.plays(the_game, plan)
+
+        assert [[result.successful for result in results] for results in sent_back] == [[True, True]]
+        assert played == plan.moves
+        assert the_game.board.roads[edges[0]].owner == 0
+
+    def test_stops_at_the_first_failure(self, the_game):
+        impossible = ExchangeMove({Resource.WOOD: 40}, Resource.STONE)
+        plan = MovePlan([ExchangeMove({Resource.WOOD: 4}, Resource.STONE), impossible,
+                         ExchangeMove({Resource.SHEEP: 4}, Resource.STONE)])
+
+        sent_back, played = self.plays(the_game, plan)
+
+        assert [result.successful for result in sent_back[0]] == [True, False]
+        assert played == plan.moves[:1]
+
+    def test_carries_on_after_failures_if_asked(self, the_game):
+        impossible = ExchangeMove({Resource.WOOD: 40}, Resource.STONE)
+        plan = MovePlan([impossible, ExchangeMove({Resource.SHEEP: 4}, Resource.STONE)], stop_on_failure=False)
+
+        sent_back, played = self.plays(the_game, plan)
+
+        assert [result.successful for result in sent_back[0]] == [False, True]
+        assert played == plan.moves[1:]
+
+    def test_subclasses_are_played_as_plans(self, the_game):
+        class LabelledPlan(MovePlan):
+            pass
+
+        plan = LabelledPlan([ExchangeMove({Resource.WOOD: 4}, Resource.STONE)])
+        sent_back, played = self.plays(the_game, plan)
+
+        assert [result.successful for result in sent_back[0]] == [True]
+        assert played == plan.moves
+
+    def test_plans_and_single_moves_can_be_mixed(self, the_game):
+        agent = PlanningAgent(ExchangeMove({Resource.WOOD: 4}, Resource.STONE), MovePlan([]),
+                              MovePlan([ExchangeMove({Resource.SHEEP: 4}, Resource.STONE)]))
+        the_game.agents[0] = agent
+        the_game.tick(the_game.agents)
+
+        single, empty, planned = agent.sent_back
+        assert single.successful
+        assert empty == []
+        assert [result.successful for result in planned] == [True]
+
+
+class TestLegalMoves:
+    def validated(self, the_game, player_id):
+        """The moves legal_moves should find, by validating every candidate"""
+        board = the_game.board
+        candidates = [BuildSettlementMove(vertex) for vertex in board.topology.vertices]
+        candidates += [UpgradeSettlementMove(vertex) for vertex in board.topology.vertices]
+        candidates += [BuildRoadMove(edge) for edge in board.topology.edges]
+        candidates += [ExchangeMove({offered: 4}, wanted) for offered in Resource for wanted in Resource
+                       if offered != wanted]
+        context = MoveContext(the_game, player_id)
+        return sorted(str(move) for move in candidates if move.validate(context).successful)
+
+    def test_matches_validating_every_candidate_as_the_game_goes(self, the_game):
+        checked = 0
+        for _ in range(40):
+            for player_id in the_game.players:
+                assert sorted(str(move) for move in the_game.legal_moves(player_id)) == \
+                    self.validated(the_game, player_id)
+                checked += len(the_game.legal_moves(player_id))
+            if not the_game.tick(the_game.agents):
+                break
+        assert checked > 0
+
+    def test_nothing_is_affordable_with_an_empty_hand(self, the_game):
+        the_game.players[0].hand.take_resources(the_game.players[0].hand.vector)
+
+        assert the_game.legal_moves(0) == []
@@ -1,3 +1,6 @@
+import copy
+import pickle
+
 import pytest
 from hexagons.hexagons import *
 
@@ -12,6 +15,25 @@ class TestHexCoord:
         assert coord.through_side(side) == expected
 
 
+    def test_coordinates_are_interned(self):
+        assert HexCoord(3, -2) is HexCoord(3, -2)
+        assert HexCoord(3, -2).add(HexCoord(0, 0)) is HexCoord(3, -2)
+        assert HexCoord(3, -2).id != HexCoord(-2, 3).id
+
+    def test_coordinates_are_immutable(self):
+        with pytest.raises(AttributeError):
+            HexCoord(0, 0).q = 1
+
+    def test_pickling_keeps_identity(self):
+        vertex = VertexCoord(HexCoord(1, 2), 1)
+        assert pickle.loads(pickle.dumps(vertex)) is vertex
+        assert copy.deepcopy({vertex: 1}) == {vertex: 1}
+
+    def test_hash_matches_tuple(self):
+        assert hash(HexCoord(1, 2)) == hash((1, 2))
+        assert hash(EdgeCoord(HexCoord(1, 2), 0)) == hash(((1, 2), 0))
+
+
 class TestVertexCoord:
     def test_normalize_wraps_vertex_number(self):
         result = VertexCoord(HexCoord(0, 0), 6).normalize()
@@ -32,3 +54,34 @@ class TestEdgeCoord:
         edge = EdgeCoord(HexCoord(100, 100), 13)
         assert edge.normalize().edge == 1
 
+
+
+class TestBoardTopology:
+    @pytest.fixture()
+    def topology(self):
+        return BoardTopology([HexCoord(0, 0), HexCoord(1, 0), HexCoord(0, 1)])
+
+    def test_matches_coordinate_methods(self, topology):
+        for vertex in topology.vertices:
+            assert topology.vertex_edges(vertex) == tuple(vertex.edges())
+            for edge in topology.vertex_edges(vertex):
+                assert topology.edge_vertices(edge) == tuple(edge.vertices())
+
+    def test_vertex_neighbors(self, topology):
+        vertex = VertexCoord(HexCoord(0, 0), 0)
+        neighbors = topology.vertex_neighbors(vertex)
+        assert len(neighbors) == 3
+        assert vertex not in neighbors
+        assert VertexCoord(HexCoord(0, 0), 1) in neighbors
+
+    def test_hexes_touching(self, topology):
+        # Corner 1 of the origin is shared by all three hexes
+        assert set(topology.vertex_hexes(VertexCoord(HexCoord(0, 0), 1))) == topology.hexes
+        assert topology.edge_hexes(HexCoord(0, 0).edge(0)) == (HexCoord(0, 0), HexCoord(1, 0))
+        assert topology.edge_hexes(HexCoord(0, 0).edge(3)) == (HexCoord(0, 0),)
+
+    def test_answers_for_coordinates_off_the_board(self, topology):
+        far = HexCoord(10, 10)
+        assert topology.hex_vertices(far) == tuple(far.vertices())
+        assert topology.vertex_hexes(VertexCoord(far, 0)) == ()
+        assert topology.edge_hexes(far.edge(0)) == ()
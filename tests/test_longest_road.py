@@ -0,0 +1,175 @@
+import random
+
+import pytest
+import game_setup
+from catan.board import *
+from catan.bitboard import BitboardBoard
+from catan.game import Game
+from catan.longest_road import *
+from agents.agents import InformedRandomAgent
+from game_events import LongestRoadEvent
+
+
+@pytest.fixture(params=[Board, BitboardBoard])
+def board(request):
+    board = request.param()
+    for q in range(-3, 4):
+        for r in range(-3, 4):
+            coords = HexCoord(q, r)
+            board.tiles[coords] = Tile(coords, TileType.WHEAT, 6)
+    return board
+
+
+@pytest.fixture()
+def tracker(board):
+    tracker = LongestRoadTracker(board)
+    board.add_listener(tracker)
+    return tracker
+
+
+ORIGIN = HexCoord(0, 0)
+FAR_AWAY = HexCoord(2, 0)
+
+
+def build_around(board, player_id, hex, count):
+    """Builds roads along `count` of the hex's sides, one after another"""
+    for side in range(count):
+        board.add_road(Road(player_id, hex.edge(side)), free_placement=True)
+
+
+def between(board, first, second):
+    """The vertex where two edges meet"""
+    [vertex] = set(board.topology.edge_vertices(first)) & set(board.topology.edge_vertices(second))
+    return vertex
+
+
+def anywhere(board):
+    """Lets settlements go on any empty vertex. The usual rules keep them off the ends of other players' roads, so
+    this is the only way for one to cut through a road."""
+    board.can_build_settlement = lambda settlement, allow_free_placement=False: (
+        settlement.coords not in board.settlements)
+
+
+class TestLongestRoadTracker:
+    def test_five_roads_in_a_row_take_the_longest_road(self, board, tracker):
+        build_around(board, 0, ORIGIN, 4)
+        assert tracker.length(0) == 4
+        assert tracker.holder is None
+
+        board.add_road(Road(0, ORIGIN.edge(4)), free_placement=True)
+        assert tracker.length(0) == 5
+        assert tracker.holder == 0
+        assert tracker.points(0) == LONGEST_ROAD_POINTS
+        assert tracker.points(1) == 0
+
+    def test_closing_a_loop_counts_every_road_once(self, board, tracker):
+        build_around(board, 0, ORIGIN, 6)
+        assert tracker.length(0) == tracker.recount(0) == 6
+
+    def test_branches_only_count_one_way(self, board, tracker):
+        build_around(board, 0, ORIGIN, 3)
+        # A spur off the middle of the road
+        vertex = between(board, ORIGIN.edge(0), ORIGIN.edge(1))
+        [spur] = [edge for edge in board.topology.vertex_edges(vertex)
+                  if edge not in (ORIGIN.edge(0), ORIGIN.edge(1))]
+        board.add_road(Road(0, spur), free_placement=True)
+
+        assert tracker.length(0) == tracker.recount(0) == 3
+
+    def test_an_enemy_settlement_breaks_the_road(self, board, tracker):
+        anywhere(board)
+        build_around(board, 0, ORIGIN, 5)
+        assert tracker.holder == 0
+
+        board.add_settlement(Settlement(1, between(board, ORIGIN.edge(1), ORIGIN.edge(2))))
+        assert tracker.length(0) == tracker.recount(0) == 3
+        assert tracker.holder is None
+
+    def test_each_side_of_a_break_only_counts_its_own_roads(self, board, tracker):
+        anywhere(board)
+        build_around(board, 0, ORIGIN, 5)
+        board.add_settlement(Settlement(1, between(board, ORIGIN.edge(0), ORIGIN.edge(1))))
+        assert tracker.length(0) == 4
+
+        board.remove_road(ORIGIN.edge(4))
+        board.remove_road(ORIGIN.edge(3))
+        assert tracker.length(0) == tracker.recount(0) == 2
+
+    def test_an_own_settlement_does_not_break_the_road(self, board, tracker):
+        build_around(board, 0, ORIGIN, 5)
+        board.add_settlement(
+            Settlement(0, between(board, ORIGIN.edge(1), ORIGIN.edge(2))), allow_free_placement=True)
+        assert tracker.length(0) == 5
+        assert tracker.holder == 0
+
+    def test_a_tie_leaves_the_holder_alone(self, board, tracker):
+        build_around(board, 0, ORIGIN, 5)
+        build_around(board, 1, FAR_AWAY, 5)
+        assert tracker.holder == 0
+
+        board.add_road(Road(1, FAR_AWAY.edge(5)), free_placement=True)
+        assert tracker.holder == 1
+
+    def test_listener_hears_when_the_holder_changes(self, board, tracker):
+        anywhere(board)
+        changes = []
+        tracker.listener = lambda old, new: changes.append((old, new))
+
+        build_around(board, 0, ORIGIN, 5)
+        build_around(board, 1, FAR_AWAY, 5)
+        board.add_settlement(Settlement(1, between(board, ORIGIN.edge(1), ORIGIN.edge(2))))
+
+        assert changes == [(None, 0), (0, 1)]
+
+    def test_tracks_random_building_and_taking_back(self, board, tracker):
+        anywhere(board)
+        random.seed(3)
+        holders = []
+        placed = []
+        for _ in range(50):
+            player_id = random.choice([player for player in range(3) if board.road_count(player) < MAX_ROADS])
+            holders.append(tracker.holder)
+            if random.random() < 0.2:
+                vertex = random.choice([vertex for vertex in board.topology.vertices
+                                        if vertex not in board.settlements])
+                board.add_settlement(Settlement(player_id, vertex))
+                placed.append(('settlement', vertex))
+            else:
+                edges = board.buildable_road_edges(player_id) or [
+                    edge for edge in board.topology.edges if board.can_build_road(Road(player_id, edge), True)]
+                edge = random.choice(edges)
+                board.add_road(Road(player_id, edge), free_placement=True)
+                placed.append(('road', edge))
+
+            for player in range(3):
+                assert tracker.length(player) == tracker.recount(player)
+
+        assert max(tracker.length(player) for player in range(3)) >= MIN_LENGTH
+
+        while placed:
+            kind, coords = placed.pop()
+            if kind == 'road':
+                board.remove_road(coords)
+            else:
+                board.remove_settlement(coords)
+            assert tracker.holder == holders.pop()
+            for player in range(3):
+                assert tracker.length(player) == tracker.recount(player)
+
+
+class TestGameScoring:
+    def test_the_holder_scores_and_is_announced(self):
+        random.seed(1)
+        agents = {player_id: InformedRandomAgent() for player_id in range(4)}
+        the_game = Game(game_setup.new_board_started(), agents, debug=True)
+        events = []
+        the_game.events.subscribe(events.append, LongestRoadEvent)
+
+        before = the_game.get_victory_points(0)
+        board = the_game.board
+        while the_game.longest_road.length(0) < MIN_LENGTH:
+            board.add_road(Road(0, random.choice(board.buildable_road_edges(0))))
+
+        assert the_game.longest_road.holder == 0
+        assert the_game.get_victory_points(0) == before + LONGEST_ROAD_POINTS
+        assert events == [LongestRoadEvent(0, the_game.longest_road.length(0))]
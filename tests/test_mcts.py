@@ -0,0 +1,107 @@
+import multiprocessing
+import random
+
+import pytest
+import game_setup
+from catan.game import *
+from agents.agents import MCTSAgent, InformedRandomAgent
+from agents import mcts
+
+
+@pytest.fixture()
+def the_game():
+    random.seed(2)
+    agents = {0: MCTSAgent(rollouts=20, max_rollout_turns=20)}
+    agents.update({player_id: InformedRandomAgent() for player_id in range(1, 4)})
+    the_game = Game(game_setup.new_board_started(), agents, debug=True)
+    for player in the_game.players.values():
+        player.hand.add_resources({resource: 5 for resource in Resource})
+    return the_game
+
+
+class TestSearch:
+    def test_search_is_reproducible_and_leaves_the_rng_alone(self, the_game):
+        position = mcts.Position.of(the_game, 0)
+        random.seed(5)
+        first = mcts.search(position, seed=1, rollouts=15, max_rollout_turns=10)
+        assert random.random() == random.Random(5).random()
+
+        second = mcts.search(position, seed=1, rollouts=15, max_rollout_turns=10)
+        assert first.rollouts == 15
+        assert first.stats == second.stats
+        assert first.stats[()][0] == 15
+
+    def test_search_never_touches_the_global_rng(self, the_game, monkeypatch):
+        position = mcts.Position.of(the_game, 0)
+        expected = mcts.search(position, seed=1, rollouts=15, max_rollout_turns=10)
+
+        # As if another thread were drawing from it in the middle of the search
+        def interrupted(*args):
+            raise AssertionError('The search used the global RNG')
+        for name in ('seed', 'getstate', 'setstate', 'random', 'randint', 'choice', 'shuffle', 'getrandbits'):
+            monkeypatch.setattr(random, name, interrupted)
+
+        assert mcts.search(position, seed=1, rollouts=15, max_rollout_turns=10).stats == expected.stats
+
+    def test_search_does_not_change_the_game(self, the_game):
+        hands = {player_id: player.hand.resources for player_id, player in the_game.players.items()}
+        settlements = dict(the_game.board.settlements)
+        mcts.search(mcts.Position.of(the_game, 0), seed=1, rollouts=10, max_rollout_turns=10)
+
+        assert hands == {player_id: player.hand.resources for player_id, player in the_game.players.items()}
+        assert settlements == the_game.board.settlements
+
+    def test_best_sequence_follows_the_most_visited_moves(self):
+        road = ('road', 'a')
+        stats = {
+            (): [10, 5.0],
+            (mcts.END_TURN,): [3, 1.0],
+            (road,): [7, 4.0],
+            (road, mcts.END_TURN): [2, 1.0],
+            (road, ('road', 'b')): [4, 3.0],
+        }
+        assert mcts.best_sequence(stats) == [road, ('road', 'b')]
+
+        stats[(road, mcts.END_TURN)][0] = 5
+        assert mcts.best_sequence(stats) == [road]
+
+
+class TestMCTSAgent:
+    def test_plans_only_legal_moves(self, the_game):
+        agent = the_game.agents[0]
+        planned = agent.plan_turn()
+
+        assert planned
+        for move in planned:
+            assert the_game.do_move(0, move).successful
+
+    def test_searches_every_turn(self, the_game):
+        agent = the_game.agents[0]
+        for _ in range(8):
+            the_game.tick(the_game.agents)
+
+        assert agent.total_rollouts == 20 * 2
+        assert agent.rollouts_per_second > 0
+
+    def test_splits_rollouts_between_workers(self, the_game):
+        agent = MCTSAgent(rollouts=9, workers=2, max_rollout_turns=5)
+        agent.join_game(the_game, 0)
+        try:
+            agent.plan_turn()
+        finally:
+            agent.close()
+        assert agent.last_rollouts == 9
+
+    def test_closing_the_game_shuts_the_workers_down(self, the_game):
+        agent = MCTSAgent(rollouts=4, workers=2, max_rollout_turns=5)
+        the_game.agents[0] = agent
+        agent.join_game(the_game, 0)
+        agent.plan_turn()
+        assert multiprocessing.active_children()
+
+        the_game.close()
+        assert not multiprocessing.active_children()
+
+    def test_needs_a_budget(self):
+        with pytest.raises(ValueError):
+            MCTSAgent(rollouts=None, seconds=None)
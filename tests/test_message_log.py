@@ -0,0 +1,55 @@
+from gui.event_message_builder import *
+
+
+class FakeText:
+    """Just enough of a Tk Text box to follow what a MessageLog writes into it"""
+
+    def __init__(self):
+        self.lines = ['']
+        self.inserts = 0
+        self.state = tkinter.DISABLED
+
+    def config(self, state):
+        self.state = state
+
+    def insert(self, index, *arguments):
+        assert index == tkinter.END and self.state == tkinter.NORMAL
+        self.inserts += 1
+        text = ''.join(arguments[0::2])
+        self.lines[-1:] = (self.lines[-1] + text).split('\n')
+
+    def delete(self, start, end):
+        assert start == '1.0' and self.state == tkinter.NORMAL
+        if end == tkinter.END:
+            self.lines = ['']
+        else:
+            del self.lines[:int(end.split('.')[0]) - 1]
+
+    def see(self, index):
+        pass
+
+
+class TestMessageLog:
+    def test_adds_a_batch_in_one_insert(self):
+        textbox = FakeText()
+        log = MessageLog(textbox)
+        log.add([log.message().player(1).text(' rolled 5'), log.message().text('hello', 'bold')])
+
+        assert textbox.inserts == 1
+        assert textbox.lines == ['Player 1 rolled 5', 'hello', '']
+        assert textbox.state == tkinter.DISABLED
+
+    def test_keeps_only_the_newest_lines(self):
+        textbox = FakeText()
+        log = MessageLog(textbox, max_lines=3)
+        for batch in range(4):
+            log.add([log.message().text(f'{batch}.{i}') for i in range(2)])
+
+        assert textbox.lines == ['2.1', '3.0', '3.1', '']
+        assert log.lines == 3
+
+    def test_empty_batches_do_nothing(self):
+        textbox = FakeText()
+        MessageLog(textbox).add([])
+
+        assert textbox.inserts == 0
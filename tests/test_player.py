@@ -44,3 +44,45 @@ class TestPlayerHand:
         assert hand.has_resources({Resource.MUD: 5})
         assert hand.has_resources({Resource.MUD: 2, Resource.SHEEP: 2})
         assert not hand.has_resources({Resource.MUD: 2, Resource.SHEEP: 20})
+
+
+class TestResourceVector:
+    def test_round_trips_through_dict(self):
+        resources = {Resource.SHEEP: 3, Resource.STONE: 0, Resource.WOOD: 7, Resource.WHEAT: 1, Resource.MUD: 2}
+        assert ResourceVector.from_dict(resources).to_dict() == resources
+
+    def test_covers_compares_every_resource(self):
+        hand = ResourceVector.from_dict({Resource.WOOD: 1, Resource.MUD: 1, Resource.SHEEP: 5})
+
+        assert hand.covers(ResourceVector.from_dict({Resource.WOOD: 1, Resource.MUD: 1}))
+        assert hand >= ResourceVector.from_dict({Resource.SHEEP: 5})
+        assert not hand.covers(ResourceVector.from_dict({Resource.WOOD: 2}))
+        assert not hand.covers(ResourceVector.from_dict({Resource.SHEEP: 1, Resource.STONE: 1}))
+
+    @pytest.mark.parametrize('quantity', [-1, 2 ** 31])
+    def test_rejects_quantities_that_do_not_fit(self, hand, quantity):
+        hand.add_resources({Resource.SHEEP: 2})
+        with pytest.raises(ValueError):
+            ResourceVector.from_dict({Resource.WOOD: quantity})
+        with pytest.raises(ValueError):
+            ResourceVector.single(Resource.WOOD, quantity)
+        with pytest.raises(ValueError):
+            hand.add_resources({Resource.WOOD: quantity})
+
+        assert hand.resources[Resource.WOOD] == 0
+        assert hand.resources[Resource.SHEEP] == 2
+
+    def test_arithmetic(self):
+        a = ResourceVector.from_dict({Resource.WOOD: 2, Resource.STONE: 1})
+        b = ResourceVector.single(Resource.WOOD)
+
+        assert (a - b)[Resource.WOOD] == 1
+        assert (a + b)[Resource.WOOD] == 3
+        assert (a + b - b) == a
+        assert (a + b).total() == 4
+
+    def test_hand_accepts_vectors(self, hand):
+        hand.add_resources(ResourceVector.from_dict({Resource.WHEAT: 3}))
+        hand.take_resources(ResourceVector.single(Resource.WHEAT, 2))
+
+        assert hand.resources[Resource.WHEAT] == 1
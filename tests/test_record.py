@@ -0,0 +1,101 @@
+import io
+import pickle
+
+import pytest
+from catan.record import *
+import random
+
+import game_setup
+from catan import game
+from tournament import play_game, RandomAgent, InformedRandomAgent, DEFAULT_MAX_TURNS
+
+LINEUP = [RandomAgent, RandomAgent, InformedRandomAgent, InformedRandomAgent]
+
+
+def final_state(the_game):
+    settlements = {coords: (s.owner, s.is_city) for coords, s in the_game.board.settlements.items()}
+    roads = {coords: road.owner for coords, road in the_game.board.roads.items()}
+    hands = {player_id: player.hand.resources for player_id, player in the_game.players.items()}
+    return settlements, roads, hands
+
+
+def play_recorded(seed, stream, max_turns=DEFAULT_MAX_TURNS):
+    """Plays and records a game the way play_game does, keeping hold of the game"""
+    recorder = GameRecorder(stream)
+    random.seed(seed)
+    agents = {seat: agent_type() for seat, agent_type in enumerate(LINEUP)}
+    the_game = game.Game(game_setup.new_board_started(), agents, recorder)
+    recorder.begin(the_game)
+    winner = None
+    for _ in range(max_turns):
+        if not the_game.tick(agents):
+            winner = the_game.next_to_play
+            break
+    recorder.end(winner)
+    return the_game, winner
+
+
+class TestGameRecord:
+    def test_replay_reproduces_game(self):
+        stream = io.BytesIO()
+        games = [play_recorded(seed, stream) for seed in range(3)]
+        stream.seek(0)
+
+        records = list(read_games(stream))
+        assert len(records) == len(games)
+        for record, (original, winner) in zip(records, games):
+            assert record.winner == winner
+            replayed = record.replay()
+            assert final_state(replayed) == final_state(original)
+            assert replayed.turn_number == original.turn_number
+            assert replayed.next_to_play == original.next_to_play
+            assert [replayed.get_victory_points(seat) for seat in range(len(LINEUP))] == \
+                [original.get_victory_points(seat) for seat in range(len(LINEUP))]
+
+    def test_records_counts_too_big_for_a_byte(self):
+        stream = io.BytesIO()
+        recorder = GameRecorder(stream)
+        recorder.begin(game.Game(game_setup.new_board_started(), {}))
+        move = moves.ProposeTradeMove({Resource.WOOD: 300}, {Resource.MUD: 70000})
+        move.partner = 1
+        recorder.record_move(0, move)
+        recorder.record_move(0, moves.ExchangeMove({Resource.SHEEP: 2 ** 31 - 1}, Resource.WHEAT))
+        recorder.end(None)
+
+        stream.seek(0)
+        [record] = read_games(stream)
+        trade, exchange = [(opcode, payload) for opcode, payload in record.entries
+                           if opcode in (WIDE_TRADE, WIDE_EXCHANGE)]
+        assert trade == (WIDE_TRADE, (0, 1, *(300 if r == Resource.WOOD else 0 for r in RESOURCES),
+                                      *(70000 if r == Resource.MUD else 0 for r in RESOURCES)))
+        assert exchange == (WIDE_EXCHANGE, (0, *(2 ** 31 - 1 if r == Resource.SHEEP else 0 for r in RESOURCES),
+                                            RESOURCES.index(Resource.WHEAT)))
+
+    def test_replayed_state_matches_original(self):
+        stream = io.BytesIO()
+        recorder = GameRecorder(stream)
+        random.seed(5)
+        board_ = game_setup.new_board_started()
+        agents = {seat: agent_type() for seat, agent_type in enumerate(LINEUP)}
+        original = game.Game(board_, agents, recorder)
+        recorder.begin(original)
+        for _ in range(150):
+            if not original.tick(agents):
+                break
+        recorder.end(None)
+
+        stream.seek(0)
+        [record] = read_games(stream)
+        replayed = record.replay()
+
+        assert final_state(replayed) == final_state(original)
+        assert replayed.turn_number == original.turn_number
+
+    def test_much_smaller_than_pickle(self):
+        outcome = play_game(LINEUP, 0, record=True)
+        [record] = read_games(io.BytesIO(outcome.record))
+        assert len(outcome.record) * 5 < len(pickle.dumps(record.replay().board))
+
+    def test_rejects_other_data(self):
+        with pytest.raises(RecordFormatError):
+            list(read_games(io.BytesIO(b'not a record at all')))
@@ -0,0 +1,256 @@
+import os
+import random
+import json
+import sys
+import threading
+import time
+
+import pytest
+import game_setup
+from catan.game import *
+from catan.moves import *
+from agents.agents import InformedRandomAgent
+from agents.remote import *
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RecordingWriter:
+    """Passes writes through, keeping a copy of each message"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.messages = []
+
+    def write(self, data):
+        self.messages.append(json.loads(data))
+        self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+class PlanningAgent(InformedRandomAgent):
+    def __init__(self):
+        self.plans = []
+        self.sent_back = []
+
+    def play_turn(self):
+        for plan in self.plans:
+            self.sent_back.append((yield plan))
+
+
+class MirrorCheckingAgent(InformedRandomAgent):
+    """Checks that its mirror of the game matches the real game at the start of each turn.
+
+    Trades are asked about ahead of time, while the real game carries on, so they can't be checked the same way."""
+
+    def __init__(self):
+        self.real_game = None
+        self.mismatches = []
+
+    def check(self):
+        mirror, real = self.game, self.real_game
+        if dict(mirror.board.settlements) != dict(real.board.settlements) or mirror.board.roads != real.board.roads:
+            self.mismatches.append('board')
+        for player_id, player in real.players.items():
+            if mirror.players[player_id].hand.resources != player.hand.resources:
+                self.mismatches.append(f'hand {player_id}')
+
+    def play_turn(self):
+        self.check()
+        yield from super().play_turn()
+
+
+def served(agent, **options):
+    """A RemoteAgent connected over pipes to a server for `agent` running in a thread"""
+    to_server_read, to_server_write = os.pipe()
+    to_game_read, to_game_write = os.pipe()
+    server = AgentServer(agent, Connection(os.fdopen(to_server_read, 'rb'), os.fdopen(to_game_write, 'wb')))
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+
+    writer = RecordingWriter(os.fdopen(to_server_write, 'wb'))
+    remote = RemoteAgent(Connection(os.fdopen(to_game_read, 'rb'), writer), **options)
+    return remote, server, thread, writer
+
+
+@pytest.fixture()
+def game_with_remotes():
+    random.seed(8)
+    checkers = [MirrorCheckingAgent(), MirrorCheckingAgent()]
+    remotes = [served(checker) for checker in checkers]
+    agents = {0: remotes[0][0], 1: InformedRandomAgent(), 2: remotes[1][0], 3: InformedRandomAgent()}
+    the_game = Game(game_setup.new_board_started(), agents, debug=True)
+    for checker in checkers:
+        checker.real_game = the_game
+    yield the_game, checkers, remotes
+    for remote, _, thread, _ in remotes:
+        remote.close()
+        thread.join(5)
+
+
+class TestRemoteAgent:
+    def test_remote_agents_play_from_an_up_to_date_mirror(self, game_with_remotes):
+        the_game, checkers, remotes = game_with_remotes
+        played = []
+        the_game.events.subscribe(lambda event: played.append(event.player_id), PlayedMoveEvent)
+        for _ in range(80):
+            if not the_game.tick(the_game.agents):
+                break
+
+        assert {0, 2} <= set(played)
+        for checker in checkers:
+            assert checker.mismatches == []
+
+    def test_full_state_is_only_sent_once(self, game_with_remotes):
+        the_game, _, remotes = game_with_remotes
+        for _ in range(40):
+            the_game.tick(the_game.agents)
+
+        messages = remotes[0][3].messages
+        assert [message['type'] for message in messages].count('hello') == 1
+        assert messages[0]['type'] == 'hello'
+        assert len(messages[0]['delta']['settlements']) >= 8
+        # Afterwards each message only describes what changed: at most a piece or two, and the hands involved
+        for message in messages[1:]:
+            delta = message['delta']
+            assert len(delta.get('settlements', [])) + len(delta.get('roads', [])) <= 4
+
+    def test_trade_questions_are_sent_to_everyone_before_waiting(self, game_with_remotes):
+        the_game, _, remotes = game_with_remotes
+        for player in the_game.players.values():
+            player.hand.add_resources({resource: 5 for resource in Resource})
+
+        move = ProposeTradeMove({Resource.WOOD: 1}, {Resource.SHEEP: 1})
+        the_game.do_move(1, move)
+
+        for _, _, _, writer in remotes:
+            trades = [message for message in writer.messages if message['type'] == 'trade']
+            assert trades
+
+    def test_plans_take_one_round_trip(self):
+        random.seed(3)
+        planner = PlanningAgent()
+        remote, _, thread, writer = served(planner)
+        agents = {0: remote, 1: InformedRandomAgent()}
+        the_game = Game(game_setup.new_board_started(2), agents)
+        the_game.players[0].hand.add_resources({Resource.WOOD: 8, Resource.SHEEP: 4})
+        planner.plans = [MovePlan([ExchangeMove({Resource.WOOD: 4}, Resource.STONE),
+                                   ExchangeMove({Resource.WOOD: 40}, Resource.STONE),
+                                   ExchangeMove({Resource.SHEEP: 4}, Resource.STONE)], stop_on_failure=False)]
+        try:
+            the_game.tick(agents)
+        finally:
+            remote.close()
+            thread.join(5)
+
+        assert [message['type'] for message in writer.messages] == ['hello', 'turn', 'results', 'bye']
+        assert [result.successful for result in planner.sent_back[0]] == [True, False, True]
+
+    def test_legal_moves_are_sent_if_asked_for(self):
+        random.seed(5)
+        remote, _, thread, writer = served(InformedRandomAgent(), send_legal_moves=True)
+        agents = {0: remote, 1: InformedRandomAgent()}
+        the_game = Game(game_setup.new_board_started(2), agents)
+        the_game.players[0].hand.add_resources({resource: 4 for resource in Resource})
+        # Without payouts, the hand at the start of the turn is the one here
+        the_game.rolled = lambda player_id, roll: None
+        expected = sorted(str(move) for move in the_game.legal_moves(0))
+        try:
+            the_game.tick(agents)
+        finally:
+            remote.close()
+            thread.join(5)
+
+        turn = next(message for message in writer.messages if message['type'] == 'turn')
+        assert sorted(str(decode_move(move)) for move in turn['legal']) == expected
+        assert all('legal' in message for message in writer.messages if message['type'] in ('result', 'results'))
+
+    def test_moves_round_trip(self):
+        vertex = VertexCoord(HexCoord(1, -2), 1)
+        edge = EdgeCoord(HexCoord(0, 3), 2)
+        for move in [BuildSettlementMove(vertex), UpgradeSettlementMove(vertex), BuildRoadMove(edge),
+                     ProposeTradeMove({Resource.WOOD: 1}, {Resource.STONE: 2}),
+                     ExchangeMove({Resource.WHEAT: 4}, Resource.MUD)]:
+            decoded = decode_move(json.loads(json.dumps(encode_move(move))))
+            assert type(decoded) == type(move)
+            assert str(decoded) == str(move)
+
+        with pytest.raises(ProtocolError):
+            decode_move({'kind': 'teleport'})
+        with pytest.raises(ProtocolError):
+            decode_move({'kind': 'trade', 'offering': [-1, 0, 0, 0, 0], 'wants': [0, 0, 0, 1, 0]})
+
+    def test_server_over_stdio(self):
+        random.seed(2)
+        env = dict(os.environ, PYTHONPATH=REPO)
+        remote = RemoteAgent.spawn([sys.executable, '-m', 'agents.remote', 'informed', '--stdio'], env=env)
+        try:
+            agents = {0: InformedRandomAgent(), 1: remote}
+            the_game = Game(game_setup.new_board_started(2), agents)
+            for _ in range(20):
+                the_game.tick(agents)
+        finally:
+            remote.close()
+        assert remote.process.returncode == 0
+
+    def test_server_over_a_unix_socket(self, tmp_path):
+        random.seed(4)
+        path = str(tmp_path / 'agent.sock')
+        threading.Thread(target=serve_unix, args=(path, InformedRandomAgent), daemon=True).start()
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+
+        remote = RemoteAgent.connect(path)
+        agents = {0: InformedRandomAgent(), 1: remote}
+        the_game = Game(game_setup.new_board_started(2), agents)
+        try:
+            for _ in range(20):
+                the_game.tick(agents)
+        finally:
+            remote.close()
+
+
+class SlowTrader(InformedRandomAgent):
+    def would_accept_trade(self, offering, wants):
+        time.sleep(0.1)
+        return True
+
+
+class TestShutdown:
+    @pytest.fixture()
+    def thread_errors(self, monkeypatch):
+        errors = []
+        monkeypatch.setattr(threading, 'excepthook', errors.append)
+        return errors
+
+    def test_closing_waits_for_the_server_to_finish_answering(self, thread_errors):
+        random.seed(6)
+        remote, _, thread, writer = served(SlowTrader())
+        Game(game_setup.new_board_started(2), {0: remote, 1: InformedRandomAgent()})
+        # Nobody waits for the answer to this one
+        remote.expect_trade_offer({Resource.WOOD: 1}, {Resource.STONE: 1})
+        remote.close()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert thread_errors == []
+
+    def test_server_stops_quietly_when_the_game_goes_away(self, thread_errors):
+        random.seed(6)
+        remote, _, thread, writer = served(InformedRandomAgent())
+        the_game = Game(game_setup.new_board_started(2), {0: remote, 1: InformedRandomAgent()})
+        the_game.players[0].hand.add_resources({resource: 10 for resource in Resource})
+        # Start the agent's turn, then hang up in the middle of it
+        remote._send('turn')
+        remote.connection.close()
+        thread.join(5)
+
+        assert not thread.is_alive()
+        assert thread_errors == []
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+import game_setup
+from catan.game import *
+from catan.snapshot import GameSnapshot
+from agents.agents import InformedRandomAgent
+from game_feed import GameFeed
+from game_events import RollEvent
+
+
+@pytest.fixture()
+def the_game():
+    random.seed(6)
+    agents = {player_id: InformedRandomAgent() for player_id in range(4)}
+    return Game(game_setup.new_board_started(), agents)
+
+
+class TestGameSnapshot:
+    def test_snapshot_does_not_change_with_the_game(self, the_game):
+        snapshot = GameSnapshot.of(the_game)
+        settlements = dict(snapshot.board.settlements)
+        roads = dict(snapshot.board.roads)
+        resources = [dict(player.resources) for player in snapshot.players]
+
+        for _ in range(100):
+            the_game.tick(the_game.agents)
+
+        assert the_game.board.roads != roads
+        assert dict(snapshot.board.settlements) == settlements
+        assert dict(snapshot.board.roads) == roads
+        assert [dict(player.resources) for player in snapshot.players] == resources
+        assert snapshot.turn_number == 0
+
+    def test_snapshot_cannot_be_changed(self, the_game):
+        snapshot = GameSnapshot.of(the_game)
+
+        with pytest.raises(TypeError):
+            snapshot.board.roads[next(iter(snapshot.board.roads))] = None
+        with pytest.raises(AttributeError):
+            snapshot.turn_number = 5
+
+    def test_snapshot_matches_the_game(self, the_game):
+        for _ in range(50):
+            the_game.tick(the_game.agents)
+        snapshot = GameSnapshot.of(the_game)
+
+        assert snapshot.turn_number == the_game.turn_number
+        assert dict(snapshot.board.settlements) == the_game.board.settlements
+        for player in snapshot.players:
+            assert player.victory_points == the_game.get_victory_points(player.id)
+            assert dict(player.resources) == the_game.players[player.id].hand.resources
+
+
+class TestGameFeed:
+    def test_only_the_newest_snapshot_is_kept(self, the_game):
+        feed = GameFeed(snapshots_per_second=1e9)
+        feed.publish(the_game)
+        the_game.tick(the_game.agents)
+        feed.publish(the_game)
+
+        snapshot, _, _ = feed.take()
+        assert snapshot.turn_number == 1
+        assert feed.take()[0] is None
+
+    def test_snapshots_are_rate_limited_unless_forced(self, the_game):
+        feed = GameFeed(snapshots_per_second=0.001)
+
+        assert feed.publish(the_game)
+        assert not feed.publish(the_game)
+        assert feed.publish(the_game, force=True)
+
+    def test_events_are_bounded(self):
+        feed = GameFeed(max_events=10)
+        for roll in range(25):
+            feed.event(RollEvent(0, roll))
+
+        _, events, dropped = feed.take()
+        assert [event.roll for event in events] == list(range(15, 25))
+        assert dropped == 15
+        assert feed.take() == (None, [], 0)
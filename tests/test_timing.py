@@ -0,0 +1,64 @@
+import pickle
+import random
+
+import game_setup
+from catan.game import *
+from catan.timing import *
+from agents.agents import RandomAgent, InformedRandomAgent
+
+
+def play(timings=None, turns=30):
+    random.seed(4)
+    agents = {0: RandomAgent(), 1: InformedRandomAgent()}
+    the_game = Game(game_setup.new_board_started(2), agents, timings=timings)
+    for _ in range(turns):
+        if not the_game.tick(agents):
+            break
+    return the_game
+
+
+class TestLatencyHistogram:
+    def test_counts_in_power_of_two_buckets(self):
+        histogram = LatencyHistogram()
+        for nanoseconds in [0, 1, 3, 4, 1000]:
+            histogram.record(nanoseconds)
+
+        assert histogram.counts[:4] == [1, 1, 1, 1]
+        assert histogram.counts[10] == 1
+        assert (histogram.count, histogram.total, histogram.min, histogram.max) == (5, 1008, 0, 1000)
+        assert histogram.percentile(0.5) == 3
+        assert histogram.percentile(1.0) == 1000
+
+    def test_merge_and_pickle(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(10)
+        second.record(5000)
+        first.merge(pickle.loads(pickle.dumps(second)))
+
+        assert (first.count, first.min, first.max) == (2, 10, 5000)
+
+
+class TestGameTimings:
+    def test_times_every_part_of_each_turn(self):
+        timings = GameTimings()
+        the_game = play(timings, turns=30)
+        # Nobody wins this early
+        turns = the_game.turn_number
+        assert turns == 30
+
+        assert timings.roll.count == turns
+        assert set(timings.think) == {0, 1}
+        assert timings.agent_types == {0: 'RandomAgent', 1: 'InformedRandomAgent'}
+        # Every move is validated, but only the valid ones are performed
+        for move_type, validated in timings.validate.items():
+            assert validated.count >= timings.perform[move_type].count
+        assert timings.validate['ExchangeMove'].count == turns
+        assert set(timings.think_by_agent_type()) == {'RandomAgent', 'InformedRandomAgent'}
+
+    def test_timing_does_not_change_the_game(self):
+        timed, untimed = play(GameTimings()), play()
+
+        assert timed.board.settlements == untimed.board.settlements
+        assert timed.board.roads == untimed.board.roads
+        assert [p.hand.resources for p in timed.players.values()] == \
+               [p.hand.resources for p in untimed.players.values()]
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+from tournament import *
+
+
+class TestTournament:
+    def test_games_are_reproducible(self):
+        first = run_tournament([InformedRandomAgent, InformedRandomAgent], 3, workers=1, max_turns=100)
+        second = run_tournament([InformedRandomAgent, InformedRandomAgent], 3, workers=1, max_turns=100)
+
+        assert [(o.winner, o.turns) for o in first.outcomes] == [(o.winner, o.turns) for o in second.outcomes]
+
+    def test_generous_budget_does_not_change_games(self):
+        lineup = [InformedRandomAgent, RandomAgent]
+        unlimited = run_tournament(lineup, 3, workers=1, max_turns=100)
+        budgeted = run_tournament(lineup, 3, workers=1, max_turns=100, budget=TimeBudget(per_move=5, per_turn=10))
+
+        assert [(o.winner, o.turns) for o in unlimited.outcomes] == [(o.winner, o.turns) for o in budgeted.outcomes]
+        usage = budgeted.budget_usage()
+        assert usage['RandomAgent'].moves > 0
+        assert usage['RandomAgent'].overruns == 0
+
+    def test_bitboard_plays_the_same_games(self):
+        lineup = [InformedRandomAgent, RandomAgent, InformedRandomAgent]
+        dicts = run_tournament(lineup, 3, workers=1, max_turns=300)
+        bitboards = run_tournament(lineup, 3, workers=1, max_turns=300, board_type=BitboardBoard)
+
+        assert [(o.winner, o.turns) for o in dicts.outcomes] == [(o.winner, o.turns) for o in bitboards.outcomes]
+
+    def test_turn_limit_counts_as_draw(self):
+        result = run_tournament([RandomAgent, RandomAgent], 2, workers=1, max_turns=5)
+
+        assert result.draws == 2
+        assert result.game_lengths() == [5, 5]
+        assert result.seat_win_rates() == {0: 0.0, 1: 0.0}
+
+    def test_does_not_import_gui(self):
+        code = 'import sys, tournament; sys.exit(any(m == "tkinter" or m.startswith("gui") for m in sys.modules))'
+        assert subprocess.run([sys.executable, '-c', code]).returncode == 0
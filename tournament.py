@@ -0,0 +1,317 @@
+"""Headless tournament runner.
+
+Plays many games between a fixed lineup of agents, spread across a process pool, and reports how each agent fared.
+Nothing in here touches the GUI, so it can run on machines without a display.
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Type
+
+from catan import game
+from catan.board import Board
+from catan.bitboard import BitboardBoard
+from catan.record import GameRecorder
+from catan.timing import GameTimings
+from catan.budget import TimeBudget, BudgetUsage, OverrunPolicy
+import game_setup
+from agents.agents import Agent, RandomAgent, InformedRandomAgent, MCTSAgent
+
+# Games that run longer than this are abandoned and counted as draws
+DEFAULT_MAX_TURNS = 2000
+
+AGENT_TYPES = {
+    'random': RandomAgent,
+    'informed': InformedRandomAgent,
+    'mcts': MCTSAgent,
+}
+
+BOARD_TYPES = {
+    'dict': Board,
+    'bitboard': BitboardBoard,
+}
+
+
+@dataclass
+class GameOutcome:
+    seed: int
+    # The seat of the winning player, or None if the game hit the turn limit
+    winner: Optional[int]
+    turns: int
+    seconds: float
+    # The game's binary record, if it was recorded (see catan.record)
+    record: Optional[bytes] = None
+    # How long each part of the game took, if it was timed
+    timings: Optional[GameTimings] = None
+    # How much of their time budget each seat used, if the game had one
+    budget_usage: Dict[int, BudgetUsage] = field(default_factory=dict)
+
+
+@dataclass
+class TournamentResult:
+    lineup: List[str]
+    outcomes: List[GameOutcome] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    @property
+    def games(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def draws(self) -> int:
+        return sum(1 for outcome in self.outcomes if outcome.winner is None)
+
+    @property
+    def total_turns(self) -> int:
+        return sum(outcome.turns for outcome in self.outcomes)
+
+    @property
+    def turns_per_second(self) -> float:
+        if not self.wall_seconds:
+            return 0.0
+        return self.total_turns / self.wall_seconds
+
+    def seat_win_rates(self) -> Dict[int, float]:
+        """The fraction of games won by each seat"""
+        wins = Counter(outcome.winner for outcome in self.outcomes if outcome.winner is not None)
+        return {seat: wins[seat] / self.games for seat in range(len(self.lineup))}
+
+    def agent_win_rates(self) -> Dict[str, float]:
+        """The fraction of the seats occupied by each kind of agent that went on to win.
+
+        An agent type that fills two seats can win at most half of the seat-games it played."""
+        seat_rates = self.seat_win_rates()
+        totals = Counter()
+        seats = Counter(self.lineup)
+        for seat, name in enumerate(self.lineup):
+            totals[name] += seat_rates[seat]
+        return {name: totals[name] / seats[name] for name in seats}
+
+    def timings(self) -> Optional[GameTimings]:
+        """The timings of every timed game, combined"""
+        timed = [outcome.timings for outcome in self.outcomes if outcome.timings is not None]
+        return GameTimings.combined(timed) if timed else None
+
+    def budget_usage(self) -> Dict[str, BudgetUsage]:
+        """The budget usage of each kind of agent, summed over all its seats and games"""
+        totals: Dict[str, BudgetUsage] = {}
+        for outcome in self.outcomes:
+            for seat, usage in outcome.budget_usage.items():
+                total = totals.setdefault(self.lineup[seat], BudgetUsage())
+                total.turns += usage.turns
+                total.moves += usage.moves
+                total.think_seconds += usage.think_seconds
+                total.longest_move = max(total.longest_move, usage.longest_move)
+                total.longest_turn = max(total.longest_turn, usage.longest_turn)
+                total.move_overruns += usage.move_overruns
+                total.turn_overruns += usage.turn_overruns
+        return totals
+
+    def disqualifications(self) -> Counter:
+        return Counter(self.lineup[seat] for outcome in self.outcomes
+                       for seat, usage in outcome.budget_usage.items() if usage.disqualified)
+
+    def game_lengths(self) -> List[int]:
+        return sorted(outcome.turns for outcome in self.outcomes)
+
+    def game_length_summary(self) -> Dict[str, float]:
+        lengths = self.game_lengths()
+        if not lengths:
+            return {}
+
+        summary = {
+            'min': lengths[0],
+            'max': lengths[-1],
+            'mean': statistics.mean(lengths),
+            'median': statistics.median(lengths),
+        }
+        if len(lengths) >= 2:
+            deciles = statistics.quantiles(lengths, n=10, method='inclusive')
+            summary['p10'] = deciles[0]
+            summary['p90'] = deciles[-1]
+        return summary
+
+    def __str__(self):
+        lines = [f'{self.games} games ({self.draws} draws) in {self.wall_seconds:.2f}s, '
+                 f'{self.turns_per_second:.0f} turns/sec']
+        for seat, rate in self.seat_win_rates().items():
+            lines.append(f'  seat {seat} ({self.lineup[seat]}): {rate:.1%}')
+        for name, rate in self.agent_win_rates().items():
+            lines.append(f'  {name}: {rate:.1%} per seat')
+        summary = ', '.join(f'{key}={value:g}' for key, value in self.game_length_summary().items())
+        lines.append(f'  game length: {summary}')
+        disqualifications = self.disqualifications()
+        for name, usage in self.budget_usage().items():
+            lines.append(f'  {name} budget: {usage}, disqualified in {disqualifications[name]} seats')
+        return '\n'.join(lines)
+
+
+def play_game(
+        lineup: Sequence[Type[Agent]],
+        seed: int,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        record: bool = False,
+        timed: bool = False,
+        budget: Optional[TimeBudget] = None,
+        board_type: Type[Board] = Board) -> GameOutcome:
+    """Plays a single game to completion without any GUI, seeding the RNG so it can be reproduced.
+
+    Games played with a time budget are only reproducible if no agent runs over it."""
+    random.seed(seed)
+    start = time.perf_counter()
+
+    board = game_setup.new_board_started(len(lineup), board_type)
+    agents = {seat: agent_type() for seat, agent_type in enumerate(lineup)}
+    recorder = GameRecorder(io.BytesIO()) if record else None
+    timings = GameTimings() if timed else None
+    the_game = game.Game(board, agents, recorder, timings=timings, budget=budget)
+    if recorder:
+        recorder.begin(the_game)
+
+    winner = None
+    turns = 0
+    try:
+        while turns < max_turns:
+            turns += 1
+            if not the_game.tick(agents):
+                winner = the_game.next_to_play
+                break
+    finally:
+        the_game.close()
+
+    outcome = GameOutcome(
+        seed, winner, turns, time.perf_counter() - start, timings=timings, budget_usage=the_game.budget_usage)
+    if recorder:
+        recorder.end(winner)
+        outcome.record = recorder.stream.getvalue()
+    return outcome
+
+
+def _play_game_task(args) -> GameOutcome:
+    lineup, seed, max_turns, record, timed, budget, board_type = args
+    return play_game(lineup, seed, max_turns, record, timed, budget, board_type)
+
+
+def run_tournament(
+        lineup: Sequence[Type[Agent]],
+        games: int,
+        workers: Optional[int] = None,
+        seed: int = 0,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        record_path: Optional[str] = None,
+        timed: bool = False,
+        budget: Optional[TimeBudget] = None,
+        board_type: Type[Board] = Board) -> TournamentResult:
+    """Plays `games` games between the agent types in `lineup`, one agent per seat.
+
+    With `workers` of 1 the games are played in this process, otherwise they are spread across a process pool
+    (`None` uses one worker per CPU). Game `i` is always seeded with `seed + i`, so results don't depend on how
+    the games were distributed.
+
+    If `record_path` is given, every game is recorded there, in order, in the format of catan.record. With `timed`,
+    every game is timed (see catan.timing), and the combined timings are available from the result. With `budget`,
+    agents must make their moves within it (see catan.budget). `board_type` picks the Board backend, which doesn't
+    change how the games go, only how fast they are played."""
+    lineup = list(lineup)
+    result = TournamentResult([agent_type.__name__ for agent_type in lineup])
+    tasks = [(lineup, seed + i, max_turns, record_path is not None, timed, budget, board_type) for i in range(games)]
+
+    record_file = open(record_path, 'wb') if record_path else None
+    start = time.perf_counter()
+    try:
+        if workers == 1:
+            outcomes = map(_play_game_task, tasks)
+            result.outcomes = [_save_record(outcome, record_file) for outcome in outcomes]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Games are short, so hand them out in chunks to keep the IPC overhead down
+                chunksize = max(1, games // ((workers or os.cpu_count() or 1) * 4))
+                outcomes = executor.map(_play_game_task, tasks, chunksize=chunksize)
+                result.outcomes = [_save_record(outcome, record_file) for outcome in outcomes]
+    finally:
+        if record_file:
+            record_file.close()
+    result.wall_seconds = time.perf_counter() - start
+
+    return result
+
+
+def _save_record(outcome: GameOutcome, record_file) -> GameOutcome:
+    """Writes out a game's record as soon as it arrives, rather than keeping every record in memory"""
+    if outcome.record is not None:
+        record_file.write(outcome.record)
+        outcome.record = None
+    return outcome
+
+
+def run_batch_tournament(
+        lineup: Sequence[Type[Agent]],
+        games: int,
+        seed: int = 0,
+        max_turns: int = DEFAULT_MAX_TURNS) -> TournamentResult:
+    """Like `run_tournament`, but plays every game at once in this process with the NumPy batch engine."""
+    # NumPy is only needed here, so don't require it for regular tournaments
+    from catan import batch
+
+    batch_result = batch.run_batch(lineup, games, seed, max_turns)
+    result = TournamentResult([agent_type.__name__ for agent_type in lineup])
+    result.outcomes = [
+        GameOutcome(seed, int(winner) if winner >= 0 else None, int(turns), 0.0)
+        for winner, turns in zip(batch_result.winners, batch_result.turns)
+    ]
+    result.wall_seconds = batch_result.seconds
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a headless tournament between agents')
+    parser.add_argument('agents', nargs='+', choices=sorted(AGENT_TYPES), help='The agent in each seat, in order')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None, help='Defaults to one per CPU')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-turns', type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument('--batch', action='store_true', help='Use the NumPy batch engine instead of a process pool')
+    parser.add_argument('--record', metavar='PATH', help='Record every game to this file (not with --batch)')
+    parser.add_argument('--timings', action='store_true',
+                        help='Report where the time in each turn went (not with --batch)')
+    parser.add_argument('--move-budget', type=float, metavar='SECONDS', help='Time limit for each move (not with --batch)')
+    parser.add_argument('--turn-budget', type=float, metavar='SECONDS', help='Time limit for each turn (not with --batch)')
+    parser.add_argument('--overrun', choices=[policy.value for policy in OverrunPolicy],
+                        default=OverrunPolicy.FORFEIT_TURN.value, help='What happens to agents that run over')
+    parser.add_argument('--board', choices=sorted(BOARD_TYPES), default='dict',
+                        help='How the board is stored (not with --batch)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    lineup = [AGENT_TYPES[name] for name in args.agents]
+    budget = None
+    if args.move_budget is not None or args.turn_budget is not None:
+        budget = TimeBudget(args.move_budget, args.turn_budget, OverrunPolicy(args.overrun))
+    if args.batch:
+        from catan import batch
+        unsupported = sorted(set(name for name in args.agents if AGENT_TYPES[name] not in batch.POLICIES))
+        if unsupported:
+            parser.error(f'--batch cannot play {", ".join(unsupported)}')
+        for option, used in [('--record', args.record is not None), ('--timings', args.timings),
+                             ('--move-budget/--turn-budget', budget is not None), ('--board', args.board != 'dict')]:
+            if used:
+                parser.error(f'{option} cannot be used with --batch')
+        print(run_batch_tournament(lineup, args.games, args.seed, args.max_turns))
+    else:
+        result = run_tournament(
+            lineup, args.games, args.workers, args.seed, args.max_turns, args.record, args.timings, budget,
+            BOARD_TYPES[args.board])
+        print(result)
+        if args.timings:
+            print(result.timings())
+
+
+if __name__ == '__main__':
+    main()